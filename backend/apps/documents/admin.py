@@ -1,13 +1,56 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import Document
+from .models import Category, CategoryKeyword, Document, DocumentExport, ProcessingJob, UploadSession
 
 # Register your models here.
 @admin.register(Document)
 class DocumentAdmin(admin.ModelAdmin):
-    list_display    = ['title','category','file_type','user','created_at']
-    list_filter     = ['category','file_type','created_at']
+    list_display    = ['title','category','file_type','status','user','created_at']
+    list_filter     = ['category','file_type','status','created_at']
     search_fields   = ['title', 'user__email', 'user__username']
     ordering        = ['-created_at']
     
-    readonly_fields = ['created_at', 'updated_at']  
\ No newline at end of file
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display    = ['task','status','attempts','created_at','updated_at']
+    list_filter     = ['task','status']
+    ordering        = ['-created_at']
+    
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display    = ['file_name','user','received','file_size','status','updated_at']
+    list_filter     = ['status']
+    ordering        = ['-created_at']
+    
+    readonly_fields = ['created_at', 'updated_at']
+
+
+@admin.register(DocumentExport)
+class DocumentExportAdmin(admin.ModelAdmin):
+    list_display    = ['user','status','size','document_count','built_at']
+    list_filter     = ['status']
+    ordering        = ['-updated_at']
+    
+    exclude         = ['manifest']
+    readonly_fields = ['created_at', 'updated_at', 'built_at']
+
+
+
+class CategoryKeywordInline(admin.TabularInline):
+    model           = CategoryKeyword
+    extra           = 1
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    """Edition de la taxonomie : prise en compte par tous les processus sans redemarrage"""
+    
+    list_display    = ['code','label','position']
+    ordering        = ['position', 'code']
+    inlines         = [CategoryKeywordInline]
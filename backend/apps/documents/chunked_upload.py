@@ -0,0 +1,84 @@
+"""
+
+Upload en plusieurs morceaux (sessions UploadSession).
+
+Protocole :
+    1. POST   /api/documents/upload/sessions/                 titre, nom, taille, empreinte SHA-256
+    2. PUT    /api/documents/upload/sessions/<id>/?offset=N   corps brut : octets a partir de N
+       (GET sur la meme URL donne l'offset a reprendre apres une coupure)
+    3. POST   /api/documents/upload/sessions/<id>/complete/   verification de l'empreinte et
+       creation du document, traite ensuite comme un upload classique
+
+Les morceaux sont ecrits directement dans un fichier partiel par blocs : la memoire
+utilisee ne depend ni de la taille du morceau ni de celle du fichier. A la fin, le
+fichier assemble est deplace (sans copie) dans le stockage des documents.
+
+"""
+
+import os
+from django.core.files import File
+from .filetypes import SNIFF_SIZE, detect_file_type
+from .upload_handlers import compute_content_hash
+
+# taille des blocs lus dans le corps de la requete
+CHUNK_READ_SIZE = 64 * 1024
+
+
+class AssembledFile(File):
+    """Fichier assemble sur disque : le stockage le deplace au lieu de le recopier"""
+
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name=name)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def write_chunk(session, offset, stream, length):
+    """Ecrit `length` octets du flux a partir de `offset` dans le fichier partiel
+
+    Retourne le nombre d'octets effectivement ecrits : si la connexion est coupee en
+    cours de morceau, les octets deja recus sont conserves et l'upload reprend apres.
+    """
+
+    path = session.temp_path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written = 0
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+        f.seek(offset)
+        while written < length:
+            try:
+                data = stream.read(min(CHUNK_READ_SIZE, length - written))
+            except OSError:
+                break
+            if not data:
+                break
+            f.write(data)
+            written += len(data)
+        # un morceau renvoye apres une coupure ne doit pas laisser d'octets au-dela de l'offset
+        f.truncate(offset + written)
+    return written
+
+
+def assembled_file_hash(session):
+    """SHA-256 du fichier assemble, lu par blocs"""
+
+    with open(session.temp_path, 'rb') as f:
+        return compute_content_hash(File(f))
+
+
+def assembled_file_type(session):
+    """Code court du type du fichier assemble, deduit de son contenu"""
+
+    with open(session.temp_path, 'rb') as f:
+        return detect_file_type(f.read(SNIFF_SIZE), session.file_name)
+
+
+def discard(session):
+    """Supprime le fichier partiel de la session"""
+
+    try:
+        os.remove(session.temp_path)
+    except FileNotFoundError:
+        pass
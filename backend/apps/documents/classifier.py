@@ -0,0 +1,255 @@
+"""
+
+Moteur de classification par mots-cles.
+
+La taxonomie (categories et mots-cles en base, voir taxonomy.py) est compilee une seule
+fois en une expression reguliere unique (arbre de prefixes des mots-cles, bornes de mots,
+sans accents) : le texte est parcouru en une passe quel que soit le nombre de mots-cles.
+Le matcher compile est garde en cache tant que la version de la taxonomie ne change pas.
+
+Moteurs de classification (DOCUMENT_CLASSIFIER['BACKEND']) :
+    - 'keyword' : categorie au plus grand nombre d'occurrences de mots-cles (KeywordClassifier)
+    - 'tfidf'   : modele TF-IDF + Bayes naif entraine sur les documents classes (voir tfidf.py)
+Chaque moteur expose scores(textes) -> matrice (textes x categories) calculee pour
+tout le lot en une passe vectorisee, et predict(textes) -> categories. Les mots-cles
+trouves sont enregistres sur le document quel que soit le moteur.
+
+"""
+
+import re
+import threading
+import unicodedata
+from collections import Counter
+from django.conf import settings
+import numpy as np
+from scipy import sparse
+
+DEFAULT_CATEGORY = 'autres'
+
+_COMBINING_MARKS = re.compile(r'[\u0300-\u036f]')
+
+
+def fold_text(text):
+    """Met le texte en minuscules et supprime les accents (équation -> equation)"""
+
+    text = text.lower()
+    if text.isascii():
+        return text
+    return _COMBINING_MARKS.sub('', unicodedata.normalize('NFKD', text))
+
+
+def trie_pattern(words):
+    """Expression reguliere equivalente a l'alternance des mots, factorisee par prefixes
+
+    Le moteur d'expressions regulieres n'essaie alors qu'une branche par caractere
+    au lieu de tester chaque mot-cle a chaque position du texte.
+    """
+
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        is_word_end = '' in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not is_word_end:
+            return branches[0]
+        alternation = '(?:' + '|'.join(branches) + ')'
+        return alternation + '?' if is_word_end else alternation
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """Taxonomie compilee : compte tous les mots-cles de toutes les categories en une passe"""
+
+    def __init__(self, categories):
+        # mots-cles par categorie, dans l'ordre de la taxonomie (hors categorie par defaut)
+        self.categories = {
+            category: list(keywords)
+            for category, keywords in categories.items()
+            if category != DEFAULT_CATEGORY
+        }
+
+        # mot-cle d'origine -> forme normalisee recherchee dans le texte
+        self.folded = {
+            keyword: fold_text(keyword).strip()
+            for keywords in self.categories.values()
+            for keyword in keywords
+        }
+
+        alternatives = {folded for folded in self.folded.values() if folded}
+        if alternatives:
+            self.pattern = re.compile(r'(?<!\w)' + trie_pattern(alternatives) + r'(?!\w)')
+        else:
+            self.pattern = None
+
+        # forme normalisee -> colonne, et poids de chaque forme par categorie (scores d'un lot
+        # en un produit matriciel, equivalents a score())
+        self.columns = {folded: index for index, folded in enumerate(sorted(alternatives))}
+        self.membership = np.zeros((len(self.columns), len(self.categories)))
+        for index, keywords in enumerate(self.categories.values()):
+            for keyword in dict.fromkeys(keywords):
+                if self.folded[keyword]:
+                    self.membership[self.columns[self.folded[keyword]], index] += 1
+
+    def resolve_keyword(self, keyword):
+        """Mot-cle de la taxonomie correspondant a la saisie (sans tenir compte des accents ni de la casse)"""
+
+        folded = fold_text(keyword).strip()
+        for original, folded_keyword in self.folded.items():
+            if folded_keyword == folded:
+                return original
+        return keyword.strip()
+
+    def count(self, text):
+        """Nombre d'occurrences de chaque mot-cle normalise dans le texte"""
+
+        if not text or self.pattern is None:
+            return Counter()
+        return Counter(self.pattern.findall(fold_text(text)))
+
+    def score(self, counts):
+        """Scores par categorie : {categorie: {'score': n, 'keywords': {mot-cle: n}}}"""
+
+        category_scores = {}
+        for category, keywords in self.categories.items():
+            found_keywords = {}
+            for keyword in keywords:
+                count = counts.get(self.folded[keyword], 0)
+                if count > 0:
+                    found_keywords[keyword] = count
+            if found_keywords:
+                category_scores[category] = {
+                    'score': sum(found_keywords.values()),
+                    'keywords': found_keywords,
+                }
+        return category_scores
+
+    def score_matrix(self, counts):
+        """Scores bruts (textes x categories) a partir des occurrences comptees de chaque texte"""
+
+        indptr, indices, data = [0], [], []
+        for text_counts in counts:
+            indices.extend(self.columns[folded] for folded in text_counts)
+            data.extend(text_counts.values())
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(counts), len(self.columns)), dtype=np.float64)
+        return np.asarray(matrix @ self.membership)
+
+    def keywords_for(self, category, counts):
+        """{mot-cle: occurrences} des mots-cles de la categorie trouves dans le texte"""
+
+        found_keywords = {}
+        for keyword in self.categories.get(category, ()):
+            count = counts.get(self.folded[keyword], 0)
+            if count > 0:
+                found_keywords[keyword] = count
+        return found_keywords
+
+    def classify(self, text):
+        """Retourne (categorie, {mot-cle: occurrences}) pour le texte"""
+
+        return self.classify_counts(self.count(text))
+
+    def classify_counts(self, counts):
+        """Retourne (categorie, {mot-cle: occurrences}) a partir des occurrences deja comptees"""
+
+        category_scores = self.score(counts)
+        if not category_scores:
+            return DEFAULT_CATEGORY, {}
+        # categorie au score le plus eleve (la premiere de la taxonomie en cas d'egalite)
+        best_category = max(category_scores.items(), key=lambda x: x[1]['score'])
+        return best_category[0], best_category[1]['keywords']
+
+
+_matcher         = None
+_matcher_key     = None
+_matcher_lock    = threading.Lock()
+
+
+def taxonomy_key(categories):
+    """Cle identifiant une taxonomie, pour detecter ses modifications"""
+
+    return tuple((category, tuple(keywords)) for category, keywords in categories.items())
+
+
+def get_matcher():
+    """Retourne le matcher compile pour la taxonomie courante (recompile si elle a change)"""
+
+    # import differe : les processus d'extraction utilisent ce module sans charger les modeles
+    from .taxonomy import get_taxonomy
+
+    global _matcher, _matcher_key
+
+    taxonomy = get_taxonomy()
+    with _matcher_lock:
+        if _matcher is None or _matcher_key is not taxonomy:
+            _matcher = KeywordMatcher(taxonomy.categories)
+            _matcher_key = taxonomy
+        return _matcher
+
+
+def best_categories(categories, scores):
+    """Categorie au score le plus eleve de chaque ligne (categorie par defaut si tout est nul)"""
+
+    if not scores.shape[1]:
+        return [DEFAULT_CATEGORY] * len(scores)
+    best = scores.argmax(axis=1)
+    return [
+        categories[index] if score > 0 else DEFAULT_CATEGORY
+        for index, score in zip(best, scores[np.arange(len(best)), best])
+    ]
+
+
+class KeywordClassifier:
+    """Backend 'keyword' : categorie au plus grand nombre d'occurrences de mots-cles"""
+
+    name = 'keyword'
+    # la categorie se deduit des comptes de mots-cles : la lecture en flux s'arrete des qu'elle est acquise
+    keyword_based = True
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.categories = list(matcher.categories)
+
+    def score_counts(self, counts):
+        """Part des occurrences de mots-cles de chaque categorie, a partir des comptes de chaque texte"""
+
+        scores = self.matcher.score_matrix(counts)
+        totals = scores.sum(axis=1, keepdims=True)
+        return np.divide(scores, totals, out=np.zeros_like(scores), where=totals > 0)
+
+    def scores(self, texts):
+        """Part des occurrences de mots-cles de chaque categorie (textes x categories)"""
+
+        return self.score_counts([self.matcher.count(text or '') for text in texts])
+
+    def predict(self, texts):
+        """Categorie de chaque texte (la premiere de la taxonomie en cas d'egalite)"""
+
+        return best_categories(self.categories, self.scores(list(texts)))
+
+
+def get_classifier():
+    """Moteur de classification configure par DOCUMENT_CLASSIFIER
+
+    Sans modele entraine, le backend 'tfidf' se rabat sur la classification par mots-cles.
+    """
+
+    config = settings.DOCUMENT_CLASSIFIER
+    backend = config.get('BACKEND', 'keyword')
+    if backend == 'tfidf':
+        from .tfidf import get_model
+
+        model = get_model(config['MODEL_DIR'])
+        if model is not None:
+            return model
+    elif backend != 'keyword':
+        raise ValueError(f"Moteur de classification inconnu : {backend}")
+    return KeywordClassifier(get_matcher())
@@ -0,0 +1,310 @@
+"""
+
+Export zip de tous les documents d'un utilisateur, construit en arriere-plan (tache
+'build_export') et servi depuis le disque.
+
+L'archive est accompagnee d'un manifeste (DocumentExport.manifest) : pour chaque document,
+sa date de mise a jour, son empreinte, son fichier stocke et son nom dans l'archive. Une
+nouvelle construction recopie telles quelles (sans decompression ni recompression) les
+entrees des documents inchanges et n'ecrit que les documents ajoutes ou modifies ; les
+documents supprimes disparaissent de l'archive. L'archive est nommee par son ETag : une
+reconstruction ne modifie pas une archive en cours de telechargement.
+
+Le telechargement gere l'ETag (If-None-Match : 304) et les requetes d'intervalle (Range,
+If-Range) : un telechargement interrompu reprend la ou il s'est arrete.
+
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import struct
+import tempfile
+import zipfile
+from contextlib import nullcontext
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from .models import Document, DocumentExport
+from .services import ZIP_CHUNK_SIZE, DocumentProcessingService
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_NAME = 'mes_documents.classes.zip'
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+# bit 3 des options d'une entree : tailles ecrites apres les donnees (archive ecrite en flux)
+DATA_DESCRIPTOR_FLAG = 0x08
+
+
+def documents_state(user_id):
+    """(nombre de documents, derniere mise a jour) : change a chaque ajout, modification ou suppression"""
+
+    state = Document.objects.filter(user_id=user_id).aggregate(count=Count('pk'), updated_at=Max('updated_at'))
+    return state['count'], state['updated_at']
+
+
+def is_up_to_date(export, state=None):
+    """L'archive existe et reflete les documents actuels de l'utilisateur"""
+
+    if not export.archive_path or not os.path.exists(export.archive_path):
+        return False
+    count, updated_at = state or documents_state(export.user_id)
+    return export.document_count == count and export.documents_updated_at == updated_at
+
+
+def archive_name(document, names):
+    """Nom du document dans l'archive (category/nom_du_fichier), rendu unique par l'id du document"""
+
+    name = f"{document.category}/{document.file_name}"
+    while name in names:
+        stem, extension = os.path.splitext(name)
+        name = f"{stem}-{document.pk}{extension}"
+    return name
+
+
+def copy_entry(source, info, target):
+    """Recopie une entree d'une archive dans une autre, sans la decompresser
+
+    zipfile ne sait pas recopier une entree compressee : l'en-tete local et les donnees
+    sont recopies octet pour octet a la fin de l'archive cible, puis l'entree est declaree
+    dans son repertoire central (filelist, NameToInfo et start_dir de ZipFile).
+    """
+
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(zipfile.sizeFileHeader)
+    # longueurs du nom et du champ extra de l'en-tete local (peuvent differer du repertoire central)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    remaining = name_length + extra_length + info.compress_size
+
+    copied = copy.copy(info)
+    target.fp.seek(target.start_dir)
+    copied.header_offset = target.fp.tell()
+    target.fp.write(header)
+    while remaining > 0:
+        chunk = source.fp.read(min(ZIP_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Entree tronquee : {info.filename}")
+        target.fp.write(chunk)
+        remaining -= len(chunk)
+    target.filelist.append(copied)
+    target.NameToInfo[copied.filename] = copied
+    target.start_dir = target.fp.tell()
+
+
+def write_archive(path, entries, previous_path):
+    """Ecrit l'archive `path` ; retourne le nombre d'entrees recopiees de l'archive precedente
+
+    `entries` : (document, nom dans l'archive, entree reutilisable ou non).
+    """
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    reused = 0
+    try:
+        with os.fdopen(fd, 'w+b') as output, \
+             zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target, \
+             (zipfile.ZipFile(previous_path) if previous_path else nullcontext()) as source:
+            for document, name, reusable in entries:
+                info = source.NameToInfo.get(name) if reusable and source is not None else None
+                if info is not None and not info.flag_bits & DATA_DESCRIPTOR_FLAG:
+                    copy_entry(source, info, target)
+                    reused += 1
+                    continue
+                zip_info = DocumentProcessingService.zip_entry(document, name)
+                with open(document.file.path, 'rb') as f, target.open(zip_info, 'w') as entry:
+                    shutil.copyfileobj(f, entry, ZIP_CHUNK_SIZE)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return reused
+
+
+def build_export(user_id):
+    """Construit ou met a jour l'archive des documents d'un utilisateur
+
+    Retourne {'reused', 'written', 'removed'} (entrees recopiees, ecrites, retirees), ou
+    None si l'archive est deja a jour ou en cours de construction par un autre worker.
+    """
+
+    export, _ = DocumentExport.objects.get_or_create(user_id=user_id)
+    state = documents_state(user_id)
+    if is_up_to_date(export, state):
+        return None
+
+    # une seule construction a la fois par utilisateur (une construction abandonnee est reprise)
+    stale_before = timezone.now() - timedelta(seconds=settings.DOCUMENT_PROCESSING_JOB_TIMEOUT)
+    claimed = (
+        DocumentExport.objects
+        .filter(pk=export.pk)
+        .filter(~Q(status=DocumentExport.STATUS_BUILDING) | Q(updated_at__lt=stale_before))
+        .update(status=DocumentExport.STATUS_BUILDING, updated_at=timezone.now())
+    )
+    if not claimed:
+        logger.info(f"Export de l'utilisateur {user_id} deja en construction")
+        return None
+
+    try:
+        previous_path = export.archive_path if export.archive_path and os.path.exists(export.archive_path) else None
+        previous = export.manifest if previous_path else {}
+
+        # documents inchanges d'abord : leur entree est recopiee et garde son nom
+        documents = (
+            Document.objects.filter(user_id=user_id).exclude(file='')
+            .only('file', 'category', 'updated_at', 'content_hash').order_by('pk')
+        )
+        candidates, names = [], set()
+        for document in documents.iterator():
+            if not os.path.exists(document.file.path):
+                continue
+            version = [document.updated_at.isoformat(), document.content_hash, document.file.name]
+            old = previous.get(str(document.pk))
+            name = old[3] if old is not None and old[:3] == version else None
+            if name is not None:
+                names.add(name)
+            candidates.append((document, version, name))
+
+        manifest, entries = {}, []
+        for document, version, name in candidates:
+            reusable = name is not None
+            if not reusable:
+                name = archive_name(document, names)
+                names.add(name)
+            manifest[str(document.pk)] = version + [name]
+            entries.append((document, name, reusable))
+
+        export.etag = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:32]
+        if export.archive_path == previous_path:
+            reused = len(entries)  # meme manifeste : archive inchangee
+        else:
+            reused = write_archive(export.archive_path, entries, previous_path)
+    except Exception as e:
+        DocumentExport.objects.filter(pk=export.pk).update(
+            status=DocumentExport.STATUS_FAILED, error=str(e), updated_at=timezone.now(),
+        )
+        raise
+
+    now = timezone.now()
+    DocumentExport.objects.filter(pk=export.pk).update(
+        status                  = DocumentExport.STATUS_READY,
+        manifest                = manifest,
+        etag                    = export.etag,
+        size                    = os.path.getsize(export.archive_path),
+        document_count          = state[0],
+        documents_updated_at    = state[1],
+        error                   = '',
+        built_at                = now,
+        updated_at              = now,
+    )
+    # les telechargements en cours gardent l'ancienne archive ouverte
+    if previous_path and previous_path != export.archive_path:
+        try:
+            os.remove(previous_path)
+        except FileNotFoundError:
+            pass
+
+    result = {
+        'reused': reused,
+        'written': len(entries) - reused,
+        'removed': len(set(previous) - set(manifest)),
+    }
+    logger.info(f"Export de l'utilisateur {user_id} construit : {result}")
+    return result
+
+
+def parse_range(header, size):
+    """Intervalle (debut, fin incluse) demande par l'en-tete Range
+
+    None pour le fichier entier (en-tete absent, invalide ou a plusieurs intervalles),
+    ValueError si l'intervalle est hors du fichier.
+    """
+
+    match = RANGE_PATTERN.match(header.strip()) if header else None
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # suffixe : les `last` derniers octets
+        if int(last) == 0:
+            raise ValueError(header)
+        return max(size - int(last), 0), size - 1
+    start, end = int(first), int(last) if last else size - 1
+    if start >= size:
+        raise ValueError(header)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def iter_file_range(file, start, length, chunk_size=ZIP_CHUNK_SIZE):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def archive_response(request, export):
+    """Telechargement de l'archive : 304 si le client l'a deja, 206 pour un intervalle, 416 hors du fichier"""
+
+    archive = None
+    for _ in range(2):
+        if not export.etag:
+            raise Http404("Aucune archive construite")
+        try:
+            archive = open(export.archive_path, 'rb')
+            break
+        except FileNotFoundError:
+            # remplacee par une construction plus recente entre-temps
+            export.refresh_from_db()
+    if archive is None:
+        raise Http404("Aucune archive construite")
+
+    etag = f'"{export.etag}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        archive.close()
+        response['ETag'] = etag
+        return response
+
+    size = os.fstat(archive.fileno()).st_size
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    # If-Range : l'intervalle n'est valable que pour la meme archive, sinon archive entiere
+    if 'Range' in request.headers and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            archive.close()
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(archive, as_attachment=True, filename=ARCHIVE_NAME, content_type='application/zip')
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_file_range(archive, start, end - start + 1), status=206, content_type='application/zip',
+        )
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Disposition'] = f'attachment; filename="{ARCHIVE_NAME}"'
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,316 @@
+"""
+
+Extraction du texte des documents dans des processus de travail isoles.
+
+PyPDF2, python-docx et python-pptx s'executent dans un pool de processus
+(contexte 'spawn', sans connexions ni etat Django herites). Chaque fichier
+dispose d'un delai maximal : au-dela, le processus est tue et remplace. La
+memoire de chaque processus est bornee (RLIMIT_AS) et un processus est
+recycle apres un nombre de fichiers donne ou si sa memoire a trop grossi,
+pour contenir les fuites des bibliotheques d'extraction.
+
+Configuration :
+    - DOCUMENT_EXTRACTION_WORKERS             : taille du pool (0 : extraction dans le processus appelant)
+    - DOCUMENT_EXTRACTION_TIMEOUT             : delai maximal par fichier (secondes)
+    - DOCUMENT_EXTRACTION_MAX_MEMORY          : memoire maximale par processus (octets)
+    - DOCUMENT_EXTRACTION_MAX_JOBS_PER_WORKER : fichiers traites avant recyclage d'un processus
+
+"""
+
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from django.conf import settings
+from .classifier import KeywordMatcher, taxonomy_key
+from .utils import TEXT_EXTRACTORS, classify_document_stream, iter_text_from_document, read_document_text
+
+try:
+    import resource
+except ImportError:  # pas de limites de ressources hors Unix
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+class ExtractionError(Exception):
+    """Echec de l'extraction dans un processus de travail
+
+    `reason` : type de l'erreur levee dans le processus de travail (fichier illisible,
+    memoire depassee...), ou de cette erreur si le processus lui-meme a echoue.
+    """
+
+    def __init__(self, message, reason=None):
+        super().__init__(message)
+        self.reason = reason or type(self).__name__
+
+
+class ExtractionTimeout(ExtractionError):
+    """Extraction interrompue apres le delai maximal"""
+
+
+class ChunkReader:
+    """Iterateur sur les morceaux d'un document : compte les morceaux lus et le temps passe a les lire"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.count = 0
+        self.seconds = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            chunk = next(self._chunks)
+        finally:
+            self.seconds += time.perf_counter() - start
+        self.count += 1
+        return chunk
+
+
+_worker_matcher = None
+
+
+def extract_and_classify(file_path, file_type, max_chunks, max_chars, decisive_margin, categories):
+    """Lecture en flux et classification d'un fichier (execute dans un processus de travail)
+
+    La taxonomie est transmise avec chaque fichier : le processus n'a pas besoin des settings.
+    Lecture et classification etant entrelacees, le temps de classification est la duree
+    totale moins le temps passe dans l'extracteur.
+    """
+
+    global _worker_matcher
+
+    start = time.perf_counter()
+    key = taxonomy_key(categories)
+    if _worker_matcher is None or _worker_matcher[0] != key:
+        _worker_matcher = (key, KeywordMatcher(categories))
+    reader = ChunkReader(iter_text_from_document(file_path, file_type))
+    category, keywords, text, complete = classify_document_stream(
+        reader,
+        max_chunks      = max_chunks,
+        max_chars       = max_chars,
+        decisive_margin = decisive_margin,
+        matcher         = _worker_matcher[1],
+    )
+    info = {
+        'chunks': reader.count,
+        'classify_seconds': time.perf_counter() - start - reader.seconds,
+    }
+    return category, keywords, text, complete, info
+
+
+def peak_memory():
+    """Memoire residente maximale atteinte par le processus courant, en octets"""
+
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def worker_main(connection, max_memory):
+    """Boucle d'un processus de travail : recoit (fonction, arguments), renvoie (ok, resultat, a recycler)
+
+    En cas d'echec, le resultat est (type de l'erreur, message).
+    """
+
+    if resource is not None and max_memory:
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        func, args = job
+        try:
+            ok, result = True, func(*args)
+        except MemoryError:
+            # l'etat du processus n'est plus fiable apres un echec d'allocation
+            connection.send((False, ('MemoryError', "Memoire maximale d'extraction depassee"), True))
+            break
+        except Exception as e:
+            ok, result = False, (type(e).__name__, str(e))
+        # au-dela de la moitie de la limite, recycler avant le prochain fichier
+        retire = bool(max_memory) and peak_memory() > max_memory // 2
+        connection.send((ok, result, retire))
+        if retire:
+            break
+
+
+class ExtractionWorker:
+    """Un processus de travail et sa connexion"""
+
+    def __init__(self, context, max_memory):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target  = worker_main,
+            args    = (child_connection, max_memory),
+            name    = 'document-extraction',
+            daemon  = True,
+        )
+        self.process.start()
+        child_connection.close()
+        self.jobs = 0
+        self.retired = False
+
+    def run(self, func, args, timeout):
+        try:
+            self.connection.send((func, args))
+            if not self.connection.poll(timeout):
+                raise ExtractionTimeout(f"Extraction interrompue apres {timeout}s")
+            ok, result, self.retired = self.connection.recv()
+        except (EOFError, OSError):
+            self.retired = True
+            raise ExtractionError(f"Processus d'extraction arrete (code {self.process.exitcode})")
+        self.jobs += 1
+        if not ok:
+            reason, message = result
+            raise ExtractionError(f"{reason}: {message}", reason=reason)
+        return result
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class ExtractionPool:
+    """Pool de processus d'extraction avec delai par fichier et recyclage des processus
+
+    Utilisable depuis plusieurs threads : chaque appel a `run` occupe un processus.
+    Les processus sont demarres a la demande.
+    """
+
+    def __init__(self, workers=None, timeout=None, max_memory=None, max_jobs_per_worker=None):
+        self.workers                = workers or settings.DOCUMENT_EXTRACTION_WORKERS
+        self.timeout                = timeout or settings.DOCUMENT_EXTRACTION_TIMEOUT
+        self.max_memory             = max_memory if max_memory is not None else settings.DOCUMENT_EXTRACTION_MAX_MEMORY
+        self.max_jobs_per_worker    = max_jobs_per_worker or settings.DOCUMENT_EXTRACTION_MAX_JOBS_PER_WORKER
+        self._context               = multiprocessing.get_context('spawn')
+        self._slots                 = threading.BoundedSemaphore(self.workers)
+        self._idle                  = []
+        self._lock                  = threading.Lock()
+
+    def run(self, func, *args):
+        """Execute func(*args) dans un processus de travail et retourne son resultat"""
+
+        self._slots.acquire()
+        worker = None
+        try:
+            with self._lock:
+                worker = self._idle.pop() if self._idle else None
+            if worker is None:
+                worker = ExtractionWorker(self._context, self.max_memory)
+            try:
+                return worker.run(func, args, self.timeout)
+            except ExtractionTimeout as e:
+                # processus bloque sur le fichier : le tuer, il sera remplace a la demande
+                logger.warning(f"Processus d'extraction {worker.process.pid} tue : {e}")
+                worker.kill()
+                worker = None
+                raise
+        finally:
+            if worker is not None:
+                if worker.retired or worker.jobs >= self.max_jobs_per_worker:
+                    worker.stop()
+                else:
+                    with self._lock:
+                        self._idle.append(worker)
+            self._slots.release()
+
+    def close(self):
+        """Arrete les processus inactifs"""
+
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def get_extraction_pool():
+    """Pool d'extraction du processus courant selon les settings (None : extraction sans isolation)"""
+
+    global _pool, _pool_key
+
+    if not settings.DOCUMENT_EXTRACTION_WORKERS:
+        return None
+    # un pool par processus : les processus de travail ne sont pas partages apres un fork
+    key = (
+        os.getpid(),
+        settings.DOCUMENT_EXTRACTION_WORKERS,
+        settings.DOCUMENT_EXTRACTION_TIMEOUT,
+        settings.DOCUMENT_EXTRACTION_MAX_MEMORY,
+        settings.DOCUMENT_EXTRACTION_MAX_JOBS_PER_WORKER,
+    )
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None and _pool_key[0] == os.getpid():
+                _pool.close()
+            _pool = ExtractionPool()
+            _pool_key = key
+        return _pool
+
+
+def extract_document(file_path, file_type, max_chunks=None, decisive_margin=None, pool=None):
+    """Lecture et classification d'un fichier, isolees dans le pool d'extraction s'il est active
+
+    Retourne (categorie, mots-cles, texte lu, texte complet lu ou non, mesures) comme
+    classify_document_stream, mesures : {'chunks': morceaux lus, 'classify_seconds': temps
+    de classification dans le processus de travail}. Leve ExtractionError si le processus
+    echoue ou ExtractionTimeout si le delai est depasse.
+    """
+
+    # import differe : ce module est charge par les processus de travail, sans les modeles
+    from .taxonomy import get_taxonomy
+
+    if decisive_margin is None:
+        decisive_margin = settings.DOCUMENT_CLASSIFICATION_DECISIVE_MARGIN
+    args = (
+        file_path,
+        file_type,
+        max_chunks,
+        settings.DOCUMENT_CLASSIFICATION_MAX_CHARS or 0,
+        decisive_margin or 0,
+        get_taxonomy().categories,
+    )
+    if pool is None:
+        pool = get_extraction_pool()
+    # type sans extracteur : rien a lire, inutile de solliciter un processus
+    if pool is None or file_type not in TEXT_EXTRACTORS:
+        return extract_and_classify(*args)
+    return pool.run(extract_and_classify, *args)
+
+
+def extract_text(file_path, file_type, max_chars=None, pool=None):
+    """Texte du fichier (au plus `max_chars` caracteres), lu dans le pool d'extraction s'il est active
+
+    Retourne (texte, texte complet lu ou non) comme read_document_text.
+    """
+
+    if pool is None:
+        pool = get_extraction_pool()
+    if pool is None or file_type not in TEXT_EXTRACTORS:
+        return read_document_text(file_path, file_type, max_chars)
+    return pool.run(read_document_text, file_path, file_type, max_chars)
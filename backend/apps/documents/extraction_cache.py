@@ -0,0 +1,216 @@
+"""
+
+Cache du texte extrait des documents, indexe par empreinte du contenu et
+version des extracteurs.
+
+Configuration : setting DOCUMENT_EXTRACTION_CACHE
+    - BACKEND  : 'disk' (fichiers locaux, eviction LRU bornee en taille),
+                 'django' (un cache de CACHES) ou 'none'
+    - LOCATION : repertoire du cache disque, ou alias du cache Django
+    - MAX_SIZE : taille maximale du cache disque en octets
+    - TIMEOUT  : duree de vie des entrees du cache Django (None : illimitee)
+
+"""
+
+import logging
+import os
+import tempfile
+import threading
+from django.conf import settings
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+# a incrementer quand les extracteurs changent : les anciennes entrees sont ignorees
+EXTRACTOR_VERSION = 1
+
+
+class CacheStats:
+    """Compteurs de succes/echecs du cache pour ce processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def record(self, name, count=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + count)
+
+    def as_dict(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+stats = CacheStats()
+
+
+class DiskExtractionCache:
+    """Cache sur disque local, un fichier texte par entree, eviction des moins recemment lus"""
+
+    def __init__(self, location, max_size):
+        self.location = location
+        self.max_size = max_size
+        self._size = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.location, key[:2], f'{key}.txt')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        # la date de modification sert d'horodatage du dernier acces pour l'eviction LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def set(self, key, text):
+        data = text.encode('utf-8')
+        if len(data) > self.max_size:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # ecriture atomique : les lecteurs concurrents ne voient jamais un fichier partiel
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+
+        with self._lock:
+            # une entree remplacee ne compte que pour la difference de taille
+            try:
+                previous_size = os.stat(path).st_size
+            except FileNotFoundError:
+                previous_size = 0
+            os.replace(temp_path, path)
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data) - previous_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.location):
+            for name in files:
+                if name.endswith('.txt'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # supprimer les entrees les plus anciennes jusqu'a 90% de la taille maximale
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        target = self.max_size * 0.9
+        evicted = 0
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+            evicted += 1
+        stats.record('evictions', evicted)
+
+    def clear(self):
+        with self._lock:
+            for _, _, path in self._entries():
+                os.remove(path)
+            self._size = 0
+
+
+class DjangoExtractionCache:
+    """Cache base sur un backend de CACHES (memcached, redis, base de donnees...)"""
+
+    def __init__(self, alias, timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    def get(self, key):
+        return caches[self.alias].get(f'extraction:{key}')
+
+    def set(self, key, text):
+        caches[self.alias].set(f'extraction:{key}', text, self.timeout)
+
+    def clear(self):
+        caches[self.alias].clear()
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Retourne le cache configure (partage par processus), ou None s'il est desactive"""
+
+    config = settings.DOCUMENT_EXTRACTION_CACHE
+    backend = config.get('BACKEND', 'none')
+    if backend == 'none':
+        return None
+
+    key = (backend, config.get('LOCATION'), config.get('MAX_SIZE'), config.get('TIMEOUT'))
+    with _caches_lock:
+        if key not in _caches:
+            if backend == 'disk':
+                _caches[key] = DiskExtractionCache(config['LOCATION'], config['MAX_SIZE'])
+            elif backend == 'django':
+                _caches[key] = DjangoExtractionCache(config.get('LOCATION', 'default'), config.get('TIMEOUT'))
+            else:
+                raise ValueError(f"Backend de cache d'extraction inconnu : {backend}")
+        return _caches[key]
+
+
+def cache_key(content_hash, file_type):
+    return f'{content_hash}-{file_type}-v{EXTRACTOR_VERSION}'
+
+
+def get_cached_text(content_hash, file_type):
+    """Texte extrait en cache pour ce contenu, ou None"""
+
+    cache = get_extraction_cache()
+    if cache is None or not content_hash:
+        return None
+    try:
+        text = cache.get(cache_key(content_hash, file_type))
+    except Exception as e:
+        logger.warning(f"Lecture du cache d'extraction impossible : {e}")
+        text = None
+    stats.record('hits' if text is not None else 'misses')
+    return text
+
+
+def set_cached_text(content_hash, file_type, text):
+    """Enregistre le texte extrait (les extractions vides ou en echec ne sont pas gardees)"""
+
+    cache = get_extraction_cache()
+    if cache is None or not content_hash or not text:
+        return
+    try:
+        cache.set(cache_key(content_hash, file_type), text)
+    except Exception as e:
+        logger.warning(f"Ecriture dans le cache d'extraction impossible : {e}")
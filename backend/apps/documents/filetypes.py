@@ -0,0 +1,154 @@
+"""
+
+Detection du type des documents a partir des premiers octets du fichier.
+
+Les formats geres sont reconnus directement sur l'en-tete : signature %PDF-
+pour le PDF, archive zip OOXML dont [Content_Types].xml (ou a defaut le nom
+des premiers membres) distingue DOCX et PPTX. libmagic n'est consulte que
+pour les archives zip que l'en-tete ne suffit pas a identifier, avec un
+handle par thread reutilise d'un appel a l'autre. Le resultat est le code
+court attendu par les extracteurs : 'pdf', 'docx', 'pptx' ou 'unknown'.
+
+"""
+
+import os
+import struct
+import threading
+import zlib
+
+try:
+    import magic
+except ImportError:
+    magic = None
+
+# octets lus en tete de fichier pour la detection
+SNIFF_SIZE = 8 * 1024
+
+UNKNOWN = 'unknown'
+
+MIME_TYPES = {
+    'application/pdf': 'pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': 'docx',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation': 'pptx',
+}
+
+CONTENT_TYPES = {file_type: mime for mime, file_type in MIME_TYPES.items()}
+
+EXTENSIONS = {
+    '.pdf': 'pdf',
+    '.docx': 'docx',
+    '.pptx': 'pptx',
+}
+
+# type de contenu de la partie principale declare dans [Content_Types].xml
+OOXML_CONTENT_TYPES = {
+    b'wordprocessingml.document.main+xml': 'docx',
+    b'presentationml.presentation.main+xml': 'pptx',
+}
+
+# repertoire des parties principales dans l'archive
+OOXML_PREFIXES = {
+    b'word/': 'docx',
+    b'ppt/': 'pptx',
+}
+
+ZIP_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+ZIP_SIGNATURE = b'PK\x03\x04'
+
+_local = threading.local()
+
+
+def get_magic():
+    """Handle libmagic du thread courant (None si python-magic n'est pas installe)
+
+    Un handle libmagic ne doit pas etre partage entre threads : chacun garde le sien.
+    """
+
+    if magic is None:
+        return None
+    handle = getattr(_local, 'magic', None)
+    if handle is None:
+        handle = _local.magic = magic.Magic(mime=True)
+    return handle
+
+
+def iter_zip_members(header):
+    """(nom, methode, donnees compressees ou None) des membres zip presents dans l'en-tete"""
+
+    offset = 0
+    while header.startswith(ZIP_SIGNATURE, offset) and offset + ZIP_LOCAL_HEADER.size <= len(header):
+        (_, _, flags, method, _, _, _, compressed_size, _,
+         name_length, extra_length) = ZIP_LOCAL_HEADER.unpack_from(header, offset)
+        name_start = offset + ZIP_LOCAL_HEADER.size
+        data_start = name_start + name_length + extra_length
+        name = header[name_start:name_start + name_length]
+        # taille inconnue (bit 3 : taille dans un descripteur apres les donnees) ou hors de l'en-tete
+        if flags & 0x08 or data_start + compressed_size > len(header):
+            yield name, method, None
+            return
+        yield name, method, header[data_start:data_start + compressed_size]
+        offset = data_start + compressed_size
+
+
+def sniff_ooxml(header):
+    """'docx' ou 'pptx' pour une archive OOXML, None si l'en-tete ne suffit pas"""
+
+    for name, method, data in iter_zip_members(header):
+        if name == b'[Content_Types].xml' and data is not None:
+            try:
+                content = zlib.decompress(data, -15) if method == 8 else data
+            except zlib.error:
+                continue
+            for content_type, file_type in OOXML_CONTENT_TYPES.items():
+                if content_type in content:
+                    return file_type
+        for prefix, file_type in OOXML_PREFIXES.items():
+            if name.startswith(prefix):
+                return file_type
+    return None
+
+
+def sniff_header(header):
+    """Code court deduit de la seule signature du fichier, None si elle n'est pas reconnue"""
+
+    # la norme tolere des octets parasites avant la signature PDF
+    if b'%PDF-' in header[:1024]:
+        return 'pdf'
+    if header.startswith(ZIP_SIGNATURE):
+        return sniff_ooxml(header)
+    return None
+
+
+def detect_file_type(header, file_name=None):
+    """Code court ('pdf', 'docx', 'pptx' ou 'unknown') des premiers octets d'un fichier"""
+
+    file_type = sniff_header(header)
+    if file_type is not None:
+        return file_type
+    # hors zip, aucun des types geres ne peut correspondre : inutile d'interroger libmagic,
+    # dont l'analyse des contenus texte est la partie la plus couteuse de la detection
+    if header and not header.startswith(ZIP_SIGNATURE):
+        return UNKNOWN
+
+    handle = get_magic()
+    if handle is not None:
+        try:
+            return MIME_TYPES.get(handle.from_buffer(header), UNKNOWN)
+        except Exception:
+            pass
+
+    # sans libmagic, l'extension fait foi
+    if file_name:
+        return EXTENSIONS.get(os.path.splitext(file_name)[1].lower(), UNKNOWN)
+    return UNKNOWN
+
+
+def get_file_type(file_path):
+    """Determine le type du fichier a partir de ses premiers octets"""
+
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(SNIFF_SIZE)
+    except OSError:
+        return UNKNOWN
+    return detect_file_type(header, file_path)
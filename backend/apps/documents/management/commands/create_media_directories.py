@@ -7,6 +7,7 @@ Usage : python manage.py create_media_directories
 
 from django.core.management.base import BaseCommand
 from django.conf import settings
+from apps.documents.taxonomy import get_taxonomy
 import os
 
 class Command(BaseCommand):
@@ -19,10 +20,14 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR("MEDIA_ROOT n'est pas definie dans settings.py"))
             return
         
-        categories = settings.DOCUMENT_CATEGORIES.keys()
+        categories = get_taxonomy().categories.keys()
+        dir_paths = [os.path.join(media_root, 'documents', category) for category in categories]
         
-        for category in categories:
-            dir_path = os.path.join(media_root, 'documents', category)
+        # repertoire des uploads volumineux, a placer sur le meme disque que MEDIA_ROOT
+        if settings.FILE_UPLOAD_TEMP_DIR:
+            dir_paths.append(settings.FILE_UPLOAD_TEMP_DIR)
+        
+        for dir_path in dir_paths:
             if not os.path.exists(dir_path):
                 os.makedirs(dir_path, exist_ok=True)
                 self.stdout.write(
@@ -0,0 +1,67 @@
+"""
+
+Commande pour indexer le texte complet des documents deja classes (recherche plein texte)
+Usage : python manage.py index_documents [--all] [--user ID] [--batch-size N] [--workers N]
+
+Sans --all, seuls les documents sans contenu indexe sont traites : a lancer une fois
+apres la migration, ou apres une hausse de DOCUMENT_SEARCH_MAX_CHARS avec --all.
+
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from apps.documents.extraction import ExtractionPool
+from apps.documents.models import Document
+from apps.documents.services import DocumentProcessingService
+from multiprocessing.pool import ThreadPool
+import os
+import time
+
+class Command(BaseCommand):
+    help = 'Indexe le texte extrait des documents pour la recherche plein texte'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Reindexer aussi les documents deja indexes")
+        parser.add_argument('--user', type=int, help="Limiter aux documents de cet utilisateur (id)")
+        parser.add_argument('--batch-size', type=int, default=200, help="Documents par lot")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus d'extraction en parallele")
+
+    def handle(self, *args, **options):
+        documents = Document.objects.filter(status=Document.STATUS_DONE).exclude(file='').order_by('pk')
+        if not options['all']:
+            documents = documents.filter(content__isnull=True)
+        if options['user']:
+            documents = documents.filter(user_id=options['user'])
+
+        extraction_pool = ExtractionPool(workers=options['workers']) if settings.DOCUMENT_EXTRACTION_WORKERS else None
+        pool = ThreadPool(options['workers']) if options['workers'] > 1 else None
+
+        def index(document):
+            try:
+                DocumentProcessingService.index_content(document, extraction_pool)
+                return None
+            except Exception as e:
+                return f'Document {document.pk} : {e}'
+
+        indexed = failed = 0
+        last_pk = 0
+        start = time.perf_counter()
+        try:
+            while batch := list(documents.filter(pk__gt=last_pk)[:options['batch_size']]):
+                last_pk = batch[-1].pk
+                errors = pool.map(index, batch) if pool is not None else [index(document) for document in batch]
+                for error in errors:
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(error)
+                indexed += len(batch)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{indexed} documents traites ({indexed / elapsed:.1f} docs/s)')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if extraction_pool is not None:
+                extraction_pool.close()
+
+        self.stdout.write(self.style.SUCCESS(f'{indexed - failed} document(s) indexe(s), {failed} en echec'))
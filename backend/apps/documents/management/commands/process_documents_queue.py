@@ -0,0 +1,32 @@
+"""
+
+Commande pour consommer la file de traitement persistante (backend 'database')
+Usage : python manage.py process_documents_queue [--once] [--max-jobs N] [--sleep S]
+
+"""
+
+from django.core.management.base import BaseCommand
+from apps.documents.tasks import DatabaseBackend
+import time
+
+class Command(BaseCommand):
+    help = 'Traite les documents en attente dans la file ProcessingJob'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="S'arreter quand la file est vide")
+        parser.add_argument('--max-jobs', type=int, default=None, help="Nombre maximum de taches a traiter")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Attente (s) quand la file est vide")
+
+    def handle(self, *args, **options):
+        backend     = DatabaseBackend()
+        processed   = 0
+
+        while options['max_jobs'] is None or processed < options['max_jobs']:
+            if backend.run_next():
+                processed += 1
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'{processed} tache(s) traitee(s)'))
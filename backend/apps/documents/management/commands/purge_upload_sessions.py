@@ -0,0 +1,32 @@
+"""
+
+Commande pour supprimer les uploads en morceaux abandonnes et leurs fichiers partiels
+Usage : python manage.py purge_upload_sessions [--max-age SECONDES]
+
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.documents.chunked_upload import discard
+from apps.documents.models import UploadSession
+
+class Command(BaseCommand):
+    help = 'Supprime les sessions d\'upload inactives depuis DOCUMENT_CHUNKED_UPLOAD_EXPIRY'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age', type=int, default=None, help="Inactivite (s) au-dela de laquelle purger")
+
+    def handle(self, *args, **options):
+        max_age = options['max_age'] if options['max_age'] is not None else settings.DOCUMENT_CHUNKED_UPLOAD_EXPIRY
+        expired = UploadSession.objects.filter(updated_at__lt=timezone.now() - timedelta(seconds=max_age))
+
+        purged = 0
+        for session in expired.iterator():
+            if session.status == UploadSession.STATUS_ACTIVE:
+                discard(session)
+            session.delete()
+            purged += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{purged} session(s) d\'upload supprimee(s)'))
@@ -0,0 +1,19 @@
+"""
+
+Commande pour recalculer les compteurs materialises de statistiques
+Usage : python manage.py rebuild_document_stats [--user ID ...]
+
+"""
+
+from django.core.management.base import BaseCommand
+from apps.documents.stats import rebuild_user_stats
+
+class Command(BaseCommand):
+    help = 'Recalcule les compteurs de documents par utilisateur et par categorie'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Limiter a cet utilisateur (repetable)")
+
+    def handle(self, *args, **options):
+        rebuild_user_stats(options['users'])
+        self.stdout.write(self.style.SUCCESS('Compteurs de statistiques recalcules'))
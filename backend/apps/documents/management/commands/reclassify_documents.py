@@ -0,0 +1,223 @@
+"""
+
+Commande pour reclassifier les documents existants apres une modification de la taxonomie
+Usage : python manage.py reclassify_documents [--user ID] [--category CAT] [--dry-run]
+                                              [--batch-size N] [--workers N] [--checkpoint FICHIER]
+                                              [--from-index]
+
+Les documents sont lus par lots (pagination sur la cle primaire, chaque lot relu en base
+pour voir les fichiers deplaces par les lots precedents), analyses dans un pool de
+processus d'extraction (delai maximal par fichier) puis ecrits avec bulk_update. Avec
+--checkpoint, la derniere cle traitee est enregistree apres chaque lot : relancer la meme commande reprend ou elle s'etait arretee.
+Avec --from-index, le texte deja indexe pour la recherche est reclasse par lots (un seul
+passage vectorise par lot) sans relire les fichiers ; seuls les documents non indexes sont relus.
+
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from apps.documents.extraction import ExtractionPool
+from apps.documents.models import Document, DocumentContent
+from apps.documents.response_cache import bump_generation
+from apps.documents.services import DocumentProcessingService
+from apps.documents.stats import apply_delta
+from apps.documents.utils import classify_documents
+from multiprocessing.pool import ThreadPool
+from functools import partial
+import os
+import time
+
+UPDATE_FIELDS = ['file_type', 'category', 'keywords', 'content_preview', 'file', 'status', 'processing_error', 'updated_at']
+
+
+def analyse_document(job, extraction_pool=None):
+    """Analyse d'un document : (pk, champs mis a jour, erreur)"""
+
+    pk, file_path, content_hash = job
+    try:
+        if not os.path.exists(file_path):
+            return pk, None, "Fichier introuvable"
+        return pk, DocumentProcessingService.analyse_file(file_path, content_hash, extraction_pool), None
+    except Exception as e:
+        return pk, None, str(e)
+
+
+def classify_indexed(batch):
+    """Reclassement des documents du lot a partir de leur texte indexe : (resultats, documents non indexes)"""
+
+    texts = dict(
+        DocumentContent.objects.filter(document__in=batch).values_list('document_id', 'text')
+    )
+    indexed = [document for document in batch if document.pk in texts]
+    max_chars = settings.DOCUMENT_CLASSIFICATION_MAX_CHARS
+    results = classify_documents([texts[document.pk][:max_chars or None] for document in indexed])
+    return (
+        [
+            (document.pk, {'category': result['category'], 'keywords': result['keywords']}, None)
+            for document, result in zip(indexed, results)
+        ],
+        [document for document in batch if document.pk not in texts],
+    )
+
+
+class Command(BaseCommand):
+    help = 'Reclassifie les documents existants avec la taxonomie courante'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help="Limiter aux documents de cet utilisateur (id)")
+        parser.add_argument('--category', help="Limiter aux documents actuellement dans cette categorie")
+        parser.add_argument('--dry-run', action='store_true', help="Afficher les changements sans rien ecrire")
+        parser.add_argument('--batch-size', type=int, default=200, help="Documents par lot")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus d'extraction en parallele")
+        parser.add_argument('--checkpoint', help="Fichier de reprise (derniere cle primaire traitee)")
+        parser.add_argument('--from-index', action='store_true', help="Reclasser le texte indexe sans relire les fichiers")
+
+    def handle(self, *args, **options):
+        last_pk = self.read_checkpoint(options['checkpoint'])
+        if last_pk:
+            self.stdout.write(f'Reprise apres le document {last_pk}')
+
+        # les documents en cours de traitement sont laisses aux workers de la file
+        documents = (
+            Document.objects
+            .filter(status__in=[Document.STATUS_DONE, Document.STATUS_FAILED])
+            .exclude(file='')
+            .order_by('pk')
+        )
+        if options['user']:
+            documents = documents.filter(user_id=options['user'])
+        if options['category']:
+            documents = documents.filter(category=options['category'])
+
+        # un thread par processus d'extraction : chacun attend son fichier en cours
+        extraction_pool = ExtractionPool(workers=options['workers']) if settings.DOCUMENT_EXTRACTION_WORKERS else None
+        analyse = partial(analyse_document, extraction_pool=extraction_pool)
+        pool = ThreadPool(options['workers']) if options['workers'] > 1 else None
+
+        processed = changed = failed = 0
+        start = time.perf_counter()
+        try:
+            while batch := list(documents.filter(pk__gt=last_pk)[:options['batch_size']].iterator()):
+                last_pk = batch[-1].pk
+                results, to_read = classify_indexed(batch) if options['from_index'] else ([], batch)
+                jobs = [(document.pk, document.file.path, document.content_hash) for document in to_read]
+                if pool is not None:
+                    results += pool.map(analyse, jobs)
+                else:
+                    results += [analyse(job) for job in jobs]
+
+                batch_changed, batch_failed = self.apply_results(batch, results, options['dry_run'])
+                processed += len(batch)
+                changed += batch_changed
+                failed += batch_failed
+
+                if not options['dry_run']:
+                    self.write_checkpoint(options['checkpoint'], last_pk)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'{processed} documents traites ({processed / elapsed:.1f} docs/s)')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+            if extraction_pool is not None:
+                extraction_pool.close()
+
+        elapsed = time.perf_counter() - start
+        rate = processed / elapsed if elapsed else 0.0
+        verb = 'changeraient' if options['dry_run'] else 'ont change'
+        self.stdout.write(self.style.SUCCESS(
+            f'{processed} documents en {elapsed:.1f}s ({rate:.1f} docs/s) : '
+            f'{changed} {verb} de categorie, {failed} en echec'
+        ))
+        if options['checkpoint'] and not options['dry_run'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+
+    def apply_results(self, batch, results, dry_run):
+        documents = {document.pk: document for document in batch}
+        updated, moves = [], []
+        changed = failed = 0
+
+        for pk, fields, error in results:
+            document = documents[pk]
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'Document {pk} : {error}')
+                continue
+            previous_category = document.category
+            if fields['category'] != previous_category:
+                changed += 1
+                if dry_run:
+                    self.stdout.write(f'Document {pk} : {previous_category} -> {fields["category"]}')
+                else:
+                    moves.append((document, previous_category))
+            for field, value in fields.items():
+                setattr(document, field, value)
+            document.status = Document.STATUS_DONE
+            document.processing_error = ''
+            document.updated_at = timezone.now()
+            updated.append(document)
+
+        if dry_run or not updated:
+            return changed, failed
+
+        # deplacer les fichiers dont la categorie a change (une seule fois par fichier partage) ;
+        # si l'ecriture en base echoue, les fichiers sont remis a leur place avant de propager
+        # l'erreur pour que les lignes, inchangees, designent toujours des fichiers existants
+        renamed = {}
+        try:
+            for document, previous_category in moves:
+                old_name = document.file.name
+                if old_name not in renamed:
+                    renamed[old_name] = DocumentProcessingService.relocate_file(old_name, document.category)
+                document.file.name = renamed[old_name]
+
+            with transaction.atomic():
+                Document.objects.bulk_update(updated, UPDATE_FIELDS)
+                # les autres documents partageant un fichier deplace suivent le fichier (updated_at :
+                # modification visible de l'export incremental)
+                user_ids = {document.user_id for document in updated}
+                for old_name, new_name in renamed.items():
+                    sharing = Document.objects.filter(file=old_name)
+                    user_ids.update(sharing.values_list('user_id', flat=True))
+                    sharing.update(file=new_name, updated_at=timezone.now())
+                # bulk_update ne declenche pas les signaux : compteurs de statistiques et cache des
+                # reponses a la main
+                if settings.DOCUMENT_STATS_USE_COUNTERS:
+                    for document, previous_category in moves:
+                        apply_delta(document.user_id, previous_category, -1, -document.file_size)
+                        apply_delta(document.user_id, document.category, 1, document.file_size)
+                bump_generation(*user_ids)
+        except BaseException:
+            self.restore_files(renamed)
+            raise
+
+        return changed, failed
+
+    def restore_files(self, renamed):
+        """Remet a leur emplacement d'origine les fichiers deplaces par un lot non ecrit"""
+
+        for old_name, new_name in renamed.items():
+            if new_name == old_name:
+                continue
+            try:
+                DocumentProcessingService.move_file(new_name, old_name)
+            except Exception as e:
+                self.stderr.write(f'Fichier {new_name} non remis en {old_name} : {e}')
+
+    @staticmethod
+    def read_checkpoint(path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            return int(f.read().strip() or 0)
+
+    @staticmethod
+    def write_checkpoint(path, pk):
+        if not path:
+            return
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(str(pk))
+        os.replace(temp_path, path)
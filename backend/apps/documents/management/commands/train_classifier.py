@@ -0,0 +1,70 @@
+"""
+
+Commande pour entrainer le classifieur TF-IDF (backend 'tfidf') sur les documents deja classes
+Usage : python manage.py train_classifier [--output DOSSIER] [--min-df N] [--max-features N]
+                                          [--alpha A] [--test-ratio R]
+
+Le texte d'entrainement est celui indexe pour la recherche (`python manage.py index_documents`
+pour les documents qui n'en ont pas encore). Une part des documents (--test-ratio) est
+reservee a l'evaluation : la precision du modele y est comparee a celle des mots-cles.
+
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.documents.classifier import KeywordClassifier, get_matcher
+from apps.documents.models import Document, DocumentContent
+from apps.documents.tfidf import train
+import time
+import zlib
+
+class Command(BaseCommand):
+    help = 'Entraine le classifieur TF-IDF sur les documents classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help="Dossier du modele (DOCUMENT_CLASSIFIER['MODEL_DIR'] par defaut)")
+        parser.add_argument('--min-df', type=int, default=2, help="Documents minimum contenant un mot pour le garder")
+        parser.add_argument('--max-features', type=int, default=50000, help="Taille maximale du vocabulaire")
+        parser.add_argument('--alpha', type=float, default=0.1, help="Lissage de Laplace")
+        parser.add_argument('--test-ratio', type=float, default=0.2, help="Part des documents reservee a l'evaluation")
+
+    def handle(self, *args, **options):
+        output = options['output'] or settings.DOCUMENT_CLASSIFIER['MODEL_DIR']
+        test_percent = int(options['test_ratio'] * 100)
+        contents = (
+            DocumentContent.objects
+            .filter(document__status=Document.STATUS_DONE)
+            .order_by('document_id')
+            .values_list('document_id', 'text', 'document__category')
+        )
+
+        # repartition stable d'un entrainement a l'autre : par empreinte de la cle primaire
+        def is_test(pk):
+            return zlib.crc32(str(pk).encode()) % 100 < test_percent
+
+        def iter_training():
+            for pk, text, category in contents.iterator(chunk_size=200):
+                if not is_test(pk):
+                    yield text, category
+
+        start = time.perf_counter()
+        try:
+            model = train(iter_training, options['min_df'], options['max_features'], options['alpha'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"{model.info['documents']} documents, {model.info['vocabulary_size']} mots "
+            f"({time.perf_counter() - start:.1f} s)"
+        )
+
+        if test_percent:
+            test_set = [(text, category) for pk, text, category in contents.iterator(chunk_size=200) if is_test(pk)]
+            if test_set:
+                texts, labels = zip(*test_set)
+                for classifier in (KeywordClassifier(get_matcher()), model):
+                    predicted = classifier.predict(texts)
+                    accuracy = sum(p == label for p, label in zip(predicted, labels)) / len(labels)
+                    self.stdout.write(f'Precision {classifier.name} sur {len(labels)} documents : {accuracy:.1%}')
+
+        model.save(output)
+        self.stdout.write(self.style.SUCCESS(f'Modele enregistre dans {output}'))
@@ -0,0 +1,262 @@
+"""
+
+Metriques du traitement des documents, exposees au format texte de Prometheus (GET /metrics).
+
+    - documents_stage_seconds{stage, format}        : duree de chaque etape (reception de l'upload
+                                                      et ecriture temporaire, detection du type,
+                                                      extraction, classification, enregistrement
+                                                      en base, stockage du fichier)
+    - documents_processed_total{status, format}     : documents traites
+    - documents_failures_total{format, reason}      : echecs du traitement (reason : type de l'erreur)
+    - documents_file_size_bytes{format}             : taille des fichiers traites
+    - documents_chunks_read{format}                 : pages, diapositives ou paragraphes lus
+    - documents_extraction_cache_*_total            : succes, echecs et evictions du cache d'extraction
+    - http_db_queries{view}, http_db_query_seconds{view} : requetes SQL par requete HTTP et leur
+                                                      duree cumulee (middleware.QueryBudgetMiddleware)
+    - http_response_cache_total{view, result}       : reponses servies depuis le cache (hit), construites
+                                                      (miss) ou 304 (not_modified), voir response_cache.py
+
+Comme extraction_cache.stats, les valeurs sont propres au processus courant : chaque
+processus du serveur expose les siennes.
+
+Configuration :
+    - METRICS_TOKEN                     : jeton attendu dans l'en-tete `Authorization: Bearer`
+                                          (sans jeton : reserve aux comptes staff connectes)
+    - DOCUMENT_SLOW_PROCESSING_SECONDS  : duree de traitement au-dela de laquelle un document est
+                                          journalise avec la duree de ses etapes (0 : desactive)
+
+"""
+
+import bisect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from . import extraction_cache
+from .filetypes import EXTENSIONS, UNKNOWN
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (10_000, 100_000, 500_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000, 100_000_000, 500_000_000)
+CHUNK_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+class Metric:
+    """Famille de series d'une metrique, une serie par combinaison de valeurs des labels"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"Labels attendus pour {self.name} : {', '.join(self.labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(list(zip(self.labels, key)), value))
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, labels, value):
+        return [f'{self.name}{format_labels(labels)} {format_value(value)}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=SECONDS_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        # premier intervalle dont la borne superieure (le) contient la valeur, le dernier pour +Inf
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[2] if series else 0
+
+    def _render_series(self, labels, series):
+        counts, total, count = series
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            bucket_labels = format_labels(labels + [('le', format_value(bound))])
+            lines.append(f'{self.name}_bucket{bucket_labels} {format_value(cumulative)}')
+        lines.append(f'{self.name}_sum{format_labels(labels)} {format_value(total)}')
+        lines.append(f'{self.name}_count{format_labels(labels)} {format_value(count)}')
+        return lines
+
+
+stage_seconds = Histogram(
+    'documents_stage_seconds', "Duree des etapes du traitement des documents en secondes", ('stage', 'format'),
+)
+processed_total = Counter(
+    'documents_processed_total', "Documents traites par statut final", ('status', 'format'),
+)
+failures_total = Counter(
+    'documents_failures_total', "Echecs du traitement des documents par type d'erreur", ('format', 'reason'),
+)
+file_size_bytes = Histogram(
+    'documents_file_size_bytes', "Taille des fichiers traites en octets", ('format',), buckets=SIZE_BUCKETS,
+)
+chunks_read = Histogram(
+    'documents_chunks_read', "Pages, diapositives ou paragraphes lus par extraction", ('format',), buckets=CHUNK_BUCKETS,
+)
+http_db_queries = Histogram(
+    'http_db_queries', "Requetes SQL par requete HTTP", ('view',), buckets=QUERY_BUCKETS,
+)
+http_db_query_seconds = Histogram(
+    'http_db_query_seconds', "Duree cumulee des requetes SQL par requete HTTP en secondes", ('view',),
+)
+http_response_cache_total = Counter(
+    'http_response_cache_total', "Reponses du cache des reponses par resultat", ('view', 'result'),
+)
+
+REGISTRY = [
+    stage_seconds, processed_total, failures_total, file_size_bytes, chunks_read,
+    http_db_queries, http_db_query_seconds, http_response_cache_total,
+]
+
+
+def render():
+    """Toutes les metriques du processus au format texte de Prometheus"""
+
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    cache_stats = extraction_cache.stats.as_dict()
+    for name in ('hits', 'misses', 'evictions'):
+        metric = f'documents_extraction_cache_{name}_total'
+        lines.extend([
+            f'# HELP {metric} Cache du texte extrait : {name}',
+            f'# TYPE {metric} counter',
+            f'{metric} {format_value(cache_stats[name])}',
+        ])
+    return '\n'.join(lines) + '\n'
+
+
+def format_for_name(file_name):
+    """Format deduit de l'extension d'un nom de fichier, avant toute detection sur le contenu"""
+
+    return EXTENSIONS.get(os.path.splitext(file_name or '')[1].lower(), UNKNOWN)
+
+
+@contextmanager
+def time_stage(stage, file_type=UNKNOWN):
+    """Mesure la duree d'une etape isolee (hors traitement d'un document)"""
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=stage, format=file_type)
+
+
+class StageTimer:
+    """Durees des etapes du traitement d'un document
+
+    Les durees sont cumulees par etape puis publiees une seule fois (`publish`) : une
+    etape repetee (classification par mots-cles puis par le modele) compte pour une
+    observation. Le format peut etre renseigne pendant la mesure (detection du type).
+    """
+
+    def __init__(self, file_type=UNKNOWN):
+        self.file_type = file_type
+        self.timings = {}
+        self.started_at = time.perf_counter()
+
+    def add(self, stage, seconds):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    def publish(self):
+        timings, self.timings = self.timings, {}
+        for stage, seconds in timings.items():
+            stage_seconds.observe(seconds, stage=stage, format=self.file_type)
+        return timings
+
+
+def record_document(document, timer):
+    """Publie les metriques d'un document traite et journalise les traitements lents"""
+
+    processed_total.inc(status=document.status, format=timer.file_type)
+    file_size_bytes.observe(document.file_size, format=timer.file_type)
+    seconds = timer.elapsed()
+    timings = timer.publish()
+
+    threshold = settings.DOCUMENT_SLOW_PROCESSING_SECONDS
+    if threshold and seconds >= threshold:
+        stages = ', '.join(f'{stage}={value:.3f}s' for stage, value in timings.items())
+        logger.warning(
+            f"Traitement lent du document {document.pk} ({timer.file_type}, {document.file_size} octets, "
+            f"statut {document.status}) : {seconds:.3f}s [{stages}]"
+        )
@@ -0,0 +1,60 @@
+"""
+
+Instrumentation des requetes SQL de chaque requete HTTP.
+
+QueryBudgetMiddleware compte les requetes SQL executees pendant une requete HTTP (sur la
+connexion du thread qui la traite, sans DEBUG) et leur duree cumulee. Les valeurs
+alimentent les metriques http_db_queries et http_db_query_seconds par vue ; une requete
+qui depasse DB_QUERY_BUDGET requetes ou DB_QUERY_TIME_BUDGET secondes est journalisee.
+Les requetes executees pendant l'envoi d'une reponse en flux (zip) ne sont pas comptees.
+
+"""
+
+import logging
+import time
+from django.conf import settings
+from django.db import connection
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """Wrapper d'execution (connection.execute_wrapper) : nombre et duree des requetes SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryBudgetMiddleware:
+    """Compte les requetes SQL de chaque requete HTTP et journalise celles qui depassent le budget"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match is not None else 'unresolved'
+        metrics.http_db_queries.observe(counter.count, view=view)
+        metrics.http_db_query_seconds.observe(counter.seconds, view=view)
+
+        max_queries, max_seconds = settings.DB_QUERY_BUDGET, settings.DB_QUERY_TIME_BUDGET
+        if (max_queries and counter.count > max_queries) or (max_seconds and counter.seconds > max_seconds):
+            logger.warning(
+                f"Budget SQL depasse : {request.method} {request.path} ({view}) : {counter.count} requetes "
+                f"en {counter.seconds:.3f}s (budget {max_queries} requetes, {max_seconds}s)"
+            )
+        return response
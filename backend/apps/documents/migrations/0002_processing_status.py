@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+def mark_existing_documents_done(apps, schema_editor):
+    # les documents existants ont ete traites de maniere synchrone a l'upload
+    Document = apps.get_model('documents', 'Document')
+    Document.objects.update(status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='processing_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='status',
+            field=models.CharField(choices=[('pending', 'En attente'), ('processing', 'En cours de traitement'), ('done', 'Traite'), ('failed', 'Echec')], default='pending', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_documents_done, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ProcessingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task', models.CharField(max_length=100)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminee'), ('failed', 'Echec')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='processingjob_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.5 on 2026-10-18 17:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def build_counters(apps, schema_editor):
+    Document = apps.get_model('documents', 'Document')
+    DocumentCategoryStat = apps.get_model('documents', 'DocumentCategoryStat')
+    rows = Document.objects.order_by().values('user_id', 'category').annotate(
+        document_count=Count('id'), total_size=Sum('file_size')
+    )
+    DocumentCategoryStat.objects.bulk_create([
+        DocumentCategoryStat(
+            user_id=row['user_id'],
+            category=row['category'],
+            document_count=row['document_count'],
+            total_size=row['total_size'] or 0,
+        )
+        for row in rows
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_processing_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentCategoryStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100)),
+                ('document_count', models.BigIntegerField(default=0)),
+                ('total_size', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='document_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'category'), name='unique_user_category_stat')],
+            },
+        ),
+        migrations.RunPython(build_counters, migrations.RunPython.noop),
+    ]
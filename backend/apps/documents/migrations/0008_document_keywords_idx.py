@@ -0,0 +1,20 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:25
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0007_document_content'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['keywords'], name='document_keywords_idx', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# taxonomie precedemment definie dans settings.DOCUMENT_CATEGORIES / Document.CATEGORY_CHOICES
+INITIAL_TAXONOMY = [
+    ('math', 'Mathématiques', ['mathématiques', 'calcul', 'équation', 'algèbre', 'géométrie', 'statistiques']),
+    ('algo', 'Algorithme', ['algorithme', 'programmation', 'code', 'python', 'javascript', 'développement']),
+    ('histoire', 'Histoire', ['histoire', 'historique', 'guerre', 'révolution', 'siècle', 'chronologie']),
+    ('autres', 'Autres', []),  # categorie par defaut
+]
+
+
+def seed_taxonomy(apps, schema_editor):
+    Category = apps.get_model('documents', 'Category')
+    CategoryKeyword = apps.get_model('documents', 'CategoryKeyword')
+    TaxonomyVersion = apps.get_model('documents', 'TaxonomyVersion')
+
+    for position, (code, label, keywords) in enumerate(INITIAL_TAXONOMY):
+        category = Category.objects.create(code=code, label=label, position=position)
+        CategoryKeyword.objects.bulk_create([
+            CategoryKeyword(category=category, keyword=keyword, position=index)
+            for index, keyword in enumerate(keywords)
+        ])
+    TaxonomyVersion.objects.create(pk=1, version=1)
+
+
+def remove_taxonomy(apps, schema_editor):
+    apps.get_model('documents', 'Category').objects.all().delete()
+    apps.get_model('documents', 'TaxonomyVersion').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0008_document_keywords_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.SlugField(max_length=100, unique=True)),
+                ('label', models.CharField(max_length=255)),
+                ('position', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['position', 'code'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaxonomyVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='category',
+            field=models.CharField(default='autres', max_length=100),
+        ),
+        migrations.CreateModel(
+            name='CategoryKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100)),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keywords', to='documents.category')),
+            ],
+            options={
+                'ordering': ['position', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('category', 'keyword'), name='unique_category_keyword')],
+            },
+        ),
+        migrations.RunPython(seed_taxonomy, remove_taxonomy),
+    ]
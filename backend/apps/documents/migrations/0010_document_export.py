@@ -0,0 +1,34 @@
+# Generated by Django 5.2.5 on 2026-10-18 19:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0009_taxonomy'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentExport',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'En attente'), ('building', 'En construction'), ('ready', 'Prete'), ('failed', 'Echec')], default='pending', max_length=20)),
+                ('manifest', models.JSONField(blank=True, default=dict)),
+                ('etag', models.CharField(blank=True, max_length=64)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('document_count', models.PositiveIntegerField(default=0)),
+                ('documents_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('built_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='document_export', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
+from django.db import models, transaction
 from django.conf import settings
 import os
+import uuid
 
 # Create your models here.
 
@@ -9,26 +12,82 @@ def document_upload_path(instance, filename):
     category = instance.category or 'autres'
     return f'documents/{category}/{filename}'
 
+class Category(models.Model):
+    """Categorie de la taxonomie de classification (voir taxonomy.py)"""
+    
+    code                = models.SlugField(max_length=100, unique=True)
+    label               = models.CharField(max_length=255)
+    position            = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position', 'code']
+        verbose_name_plural = 'categories'
+
+    def __str__(self):
+        return self.label
+
+
+class CategoryKeyword(models.Model):
+    """Mot-cle d'une categorie (l'ordre sert a l'affichage des mots-cles trouves)"""
+    
+    category            = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='keywords')
+    keyword             = models.CharField(max_length=100)
+    position            = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'keyword'], name='unique_category_keyword'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id} : {self.keyword}"
+
+
+class TaxonomyVersion(models.Model):
+    """Version de la taxonomie (une seule ligne), incrementee a chaque modification"""
+    
+    version             = models.PositiveBigIntegerField(default=0)
+    updated_at          = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Taxonomie v{self.version}"
+
+
 class Document(models.Model):
-    CATEGORY_CHOICES = [
-        ('math', 'Mathématiques'),
-        ('algo', 'Algorithme'),
-        ('histoire', 'Histoire'),
-        ('autres', 'Autres'),
+    STATUS_PENDING      = 'pending'
+    STATUS_PROCESSING   = 'processing'
+    STATUS_DONE         = 'done'
+    STATUS_FAILED       = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_PROCESSING, 'En cours de traitement'),
+        (STATUS_DONE, 'Traite'),
+        (STATUS_FAILED, 'Echec'),
     ]
     title               = models.CharField(max_length=255)
     file                = models.FileField(upload_to=document_upload_path)
-    category            = models.CharField(max_length=100, choices=CATEGORY_CHOICES, default='autres')
+    category            = models.CharField(max_length=100, default='autres')
     content_preview     = models.TextField(blank=True)
     keywords            = models.JSONField(default=list)
     file_type           = models.CharField(max_length=10)
     file_size           = models.PositiveBigIntegerField()
+    content_hash        = models.CharField(max_length=64, blank=True, db_index=True)
+    status              = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    processing_error    = models.TextField(blank=True)
     user                = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     created_at          = models.DateTimeField(auto_now_add=True)
     updated_at          = models.DateTimeField(auto_now=True)
     
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # liste des documents d'un utilisateur, eventuellement filtree par categorie
+            models.Index(fields=['user', '-created_at', '-id'], name='document_user_created_idx'),
+            models.Index(fields=['user', 'category', '-created_at', '-id'], name='document_user_cat_created_idx'),
+            # index inverse des mots-cles trouves (filtre keywords @> '["..."]')
+            GinIndex(fields=['keywords'], name='document_keywords_idx', opclasses=['jsonb_path_ops']),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.category})"
@@ -38,8 +97,176 @@ class Document(models.Model):
         return os.path.basename(self.file.name)
     
     def delete(self, *args, **kwargs):
-        # supprimer le fichier physique lors de la suppression
-        if self.file:
-            if os.path.isfile(self.file.name):
-                os.remove(self.file.name)
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        if not self.file:
+            return super().delete(*args, **kwargs)
+        
+        # un fichier peut etre partage par plusieurs documents de meme contenu :
+        # il n'est supprime qu'avec la derniere reference (lignes verrouillees pour
+        # que deux suppressions simultanees ne laissent pas le fichier orphelin)
+        file_name, storage = self.file.name, self.file.storage
+        with transaction.atomic():
+            references = (
+                Document.objects.select_for_update().filter(file=file_name).order_by('pk').values_list('pk', flat=True)
+            )
+            is_shared = any(pk != self.pk for pk in references)
+            result = super().delete(*args, **kwargs)
+            if not is_shared:
+                transaction.on_commit(lambda: storage.delete(file_name))
+        return result
+
+
+class DocumentContent(models.Model):
+    """Texte extrait complet d'un document, hors de la table Document (jamais charge par les listes)
+    
+    `search_vector` est calcule par PostgreSQL (colonne generee, configuration francaise)
+    et indexe en GIN pour la recherche plein texte.
+    """
+    
+    # configuration de recherche PostgreSQL : la meme pour l'index et pour les requetes
+    SEARCH_CONFIG       = 'french'
+    
+    document            = models.OneToOneField(Document, on_delete=models.CASCADE, primary_key=True, related_name='content')
+    text                = models.TextField(blank=True)
+    search_vector       = models.GeneratedField(
+        expression      = SearchVector('text', config=SEARCH_CONFIG),
+        output_field    = SearchVectorField(),
+        db_persist      = True,
+    )
+    updated_at          = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'], name='documentcontent_search_idx'),
+        ]
+
+    def __str__(self):
+        return f"Contenu de {self.document_id}"
+
+
+class ProcessingJob(models.Model):
+    """Tache en attente dans la file persistante (backend de traitement 'database')"""
+    
+    STATUS_PENDING  = 'pending'
+    STATUS_RUNNING  = 'running'
+    STATUS_DONE     = 'done'
+    STATUS_FAILED   = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_RUNNING, 'En cours'),
+        (STATUS_DONE, 'Terminee'),
+        (STATUS_FAILED, 'Echec'),
+    ]
+    task                = models.CharField(max_length=100)
+    payload             = models.JSONField(default=dict)
+    status              = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts            = models.PositiveIntegerField(default=0)
+    last_error          = models.TextField(blank=True)
+    created_at          = models.DateTimeField(auto_now_add=True)
+    updated_at          = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='processingjob_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+class DocumentCategoryStat(models.Model):
+    """Compteurs materialises du nombre et du volume de documents par utilisateur et categorie"""
+    
+    user                = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='document_stats')
+    category            = models.CharField(max_length=100)
+    document_count      = models.BigIntegerField(default=0)
+    total_size          = models.BigIntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'category'], name='unique_user_category_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}/{self.category} : {self.document_count}"
+
+
+class UploadSession(models.Model):
+    """Upload en plusieurs morceaux d'un document volumineux, reprenable apres une coupure"""
+    
+    STATUS_ACTIVE       = 'active'
+    STATUS_COMPLETE     = 'complete'
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, 'En cours'),
+        (STATUS_COMPLETE, 'Termine'),
+    ]
+    id                  = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user                = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    title               = models.CharField(max_length=255)
+    file_name           = models.CharField(max_length=255)
+    file_size           = models.PositiveBigIntegerField()
+    content_hash        = models.CharField(max_length=64, blank=True)
+    received            = models.PositiveBigIntegerField(default=0)
+    status              = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    document            = models.ForeignKey(Document, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_at          = models.DateTimeField(auto_now_add=True)
+    updated_at          = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.file_name} ({self.received}/{self.file_size})"
+    
+    @property
+    def temp_path(self):
+        """Fichier partiel, assemble sur disque au fil des morceaux recus"""
+        
+        upload_dir = settings.DOCUMENT_CHUNKED_UPLOAD_DIR or os.path.join(settings.MEDIA_ROOT, 'uploads')
+        return os.path.join(upload_dir, f'{self.pk}.part')
+
+
+class DocumentExport(models.Model):
+    """Archive zip de tous les documents d'un utilisateur, construite en arriere-plan
+    
+    Le manifeste liste les documents de l'archive ; chaque construction ne recompresse
+    que les documents ajoutes ou modifies depuis la precedente (voir export.py).
+    """
+    
+    STATUS_PENDING      = 'pending'
+    STATUS_BUILDING     = 'building'
+    STATUS_READY        = 'ready'
+    STATUS_FAILED       = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'En attente'),
+        (STATUS_BUILDING, 'En construction'),
+        (STATUS_READY, 'Prete'),
+        (STATUS_FAILED, 'Echec'),
+    ]
+    id                  = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user                = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='document_export')
+    status              = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    # {id du document: [updated_at, empreinte, fichier stocke, nom dans l'archive]}
+    manifest            = models.JSONField(default=dict, blank=True)
+    etag                = models.CharField(max_length=64, blank=True)
+    size                = models.PositiveBigIntegerField(default=0)
+    # etat des documents de l'utilisateur lors de la construction (detection des changements)
+    document_count      = models.PositiveIntegerField(default=0)
+    documents_updated_at = models.DateTimeField(null=True, blank=True)
+    error               = models.TextField(blank=True)
+    built_at            = models.DateTimeField(null=True, blank=True)
+    created_at          = models.DateTimeField(auto_now_add=True)
+    updated_at          = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Export de {self.user} ({self.status})"
+    
+    @property
+    def archive_path(self):
+        """Archive construite, nommee par son ETag : une reconstruction ne modifie pas un fichier en cours de lecture"""
+        
+        if not self.etag:
+            return None
+        export_dir = settings.DOCUMENT_EXPORT_DIR or os.path.join(settings.MEDIA_ROOT, 'exports')
+        return os.path.join(export_dir, f'{self.pk}-{self.etag}.zip')
+
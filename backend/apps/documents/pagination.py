@@ -0,0 +1,23 @@
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class DocumentCursorPagination(CursorPagination):
+    """Pagination par curseur : cout constant quelle que soit la profondeur de la page"""
+
+    ordering                = ('-created_at', '-id')
+    page_size_query_param   = 'limit'
+    max_page_size           = 100
+
+
+def get_document_list_paginator(request):
+    """Pagination par curseur si demandee (?pagination=cursor ou ?cursor=...), sinon limit/offset
+
+    Les resultats d'une recherche (?q=) sont classes par pertinence : toujours limit/offset.
+    """
+
+    params = request.query_params
+    if params.get('q', '').strip():
+        return LimitOffsetPagination()
+    if params.get('pagination') == 'cursor' or 'cursor' in params:
+        return DocumentCursorPagination()
+    return LimitOffsetPagination()
@@ -0,0 +1,36 @@
+"""
+
+Rendu JSON rapide avec orjson (dependance de requirements.txt), meme sortie que le
+JSONRenderer de DRF : JSON compact en UTF-8, dates au format de DRF, \\u2028 et \\u2029
+echappes. Pour une sortie indentee (Accept: application/json; indent=4), ou si orjson
+n'est pas installe, le rendu de DRF est utilise.
+
+"""
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    # dates et heures passees a l'encodeur de DRF (meme format), cles non textuelles converties comme json
+    ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer de DRF, rendu par orjson quand il est installe"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # orjson.JSONEncodeError : entier hors de 64 bits, type inconnu de l'encodeur...
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,142 @@
+"""
+
+Cache des reponses de la liste, du detail et des statistiques des documents, par utilisateur.
+
+Chaque utilisateur a une generation, un compteur stocke dans le cache et incremente a
+chaque modification de ses documents : signaux de Document et DocumentContent, et appels
+de `bump_generation` apres les operations en masse (bulk_create, bulk_update, update), qui
+ne declenchent pas les signaux. La cle d'une reponse contient la generation de
+l'utilisateur et la version de la taxonomie : apres une ecriture, les reponses precedentes
+ne sont plus lues (elles expirent d'elles-memes apres TIMEOUT).
+
+La generation est incrementee des l'ecriture puis a nouveau apres la validation de la
+transaction : une reponse construite entre-temps avec les donnees precedentes n'est pas
+servie ensuite. Une generation perdue (eviction, redemarrage du cache) repart d'une valeur
+jamais utilisee (horloge en nanosecondes).
+
+L'ETag d'une reponse est derive de sa cle : If-None-Match est resolu (304) sans
+construire ni lire la reponse.
+
+Configuration (DOCUMENT_RESPONSE_CACHE) :
+    - ENABLED : active le cache. Le cache doit etre partage par tous les processus qui
+                modifient des documents (serveur web et workers) : 'locmem' ne convient
+                qu'a un seul processus ; 'redis' incremente la generation de facon atomique
+    - ALIAS   : alias du cache dans CACHES
+    - TIMEOUT : duree de vie des reponses en cache en secondes
+
+"""
+
+import hashlib
+import logging
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+from . import metrics
+from .taxonomy import get_taxonomy
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache():
+    return caches[settings.DOCUMENT_RESPONSE_CACHE['ALIAS']]
+
+
+def generation_key(user_id):
+    return f'responses:generation:{user_id}'
+
+
+def get_generation(user_id):
+    """Generation courante des documents d'un utilisateur (None si le cache ne conserve rien)"""
+
+    cache = get_cache()
+    key = generation_key(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(*user_ids):
+    """Invalide les reponses en cache des utilisateurs dont les documents ont change
+
+    Appelee meme si le cache des reponses est desactive : a sa reactivation, aucune
+    reponse anterieure a une ecriture ne doit etre servie.
+    """
+
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+
+    def bump():
+        cache = get_cache()
+        for user_id in user_ids:
+            key = generation_key(user_id)
+            try:
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    # generation absente : toute nouvelle valeur invalide les reponses en cache
+                    cache.set(key, time.time_ns(), None)
+            except Exception as e:
+                logger.warning(f"Invalidation du cache des reponses impossible pour l'utilisateur {user_id} : {e}")
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def response_key(request, name, generation):
+    """Cle d'une reponse : utilisateur, generation, taxonomie, URL complete et format demande"""
+
+    renderer = getattr(request, 'accepted_renderer', None)
+    parts = [
+        name, str(request.user.pk), str(generation), str(get_taxonomy().version),
+        request.build_absolute_uri(), renderer.format if renderer is not None else '',
+    ]
+    return hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+
+
+def cached_response(request, name, build):
+    """Reponse GET de l'endpoint `name` pour l'utilisateur connecte, lue dans le cache si possible
+
+    `build()` construit la reponse (Response de DRF) ; seules les reponses 200 sont mises
+    en cache. Le client revalide avec If-None-Match a chaque requete (304 si rien n'a change).
+    """
+
+    config = settings.DOCUMENT_RESPONSE_CACHE
+    if not config['ENABLED'] or request.method != 'GET':
+        return build()
+    try:
+        generation = get_generation(request.user.pk)
+    except Exception as e:
+        logger.warning(f"Lecture du cache des reponses impossible : {e}")
+        return build()
+    if generation is None:
+        return build()
+
+    key = response_key(request, name, generation)
+    etag = f'"{key}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        result = 'not_modified'
+    else:
+        cache = get_cache()
+        data = cache.get(f'responses:{key}')
+        if data is not None:
+            result = 'hit'
+            response = Response(data)
+        else:
+            result = 'miss'
+            response = build()
+            if response.status_code == 200:
+                cache.set(f'responses:{key}', response.data, config['TIMEOUT'])
+    metrics.http_response_cache_total.inc(view=name, result=result)
+
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ['Authorization'])
+    return response
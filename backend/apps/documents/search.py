@@ -0,0 +1,75 @@
+"""
+
+Recherche plein texte dans le contenu extrait des documents (DocumentContent).
+
+La requete utilisateur est interpretee en syntaxe 'websearch' ("expression exacte",
+-exclusion, or) avec la configuration francaise de l'index. Les resultats sont
+classes par pertinence ; les extraits surlignes (ts_headline, couteux) ne sont
+calcules que pour les documents de la page affichee.
+
+"""
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F
+from django.utils.html import escape
+from .models import DocumentContent
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+
+# delimiteurs neutres (zone a usage prive d'Unicode) poses par ts_headline : le texte du
+# document est echappe avant qu'ils soient remplaces par les balises de surlignage
+HEADLINE_START_SEL = '\ue000'
+HEADLINE_STOP_SEL = '\ue001'
+
+
+def build_search_query(text):
+    """SearchQuery PostgreSQL pour le texte saisi, None si le texte est vide"""
+
+    text = (text or '').strip()
+    if not text:
+        return None
+    return SearchQuery(text, config=DocumentContent.SEARCH_CONFIG, search_type='websearch')
+
+
+def search_documents(queryset, query):
+    """Documents dont le contenu correspond a la requete, du plus pertinent au moins pertinent"""
+
+    return (
+        queryset
+        .filter(content__search_vector=query)
+        .annotate(rank=SearchRank(F('content__search_vector'), query))
+        .order_by('-rank', '-created_at', '-id')
+    )
+
+
+def attach_headlines(documents, query):
+    """Ajoute a chaque document un extrait de son contenu avec les termes trouves surlignes"""
+
+    headlines = dict(
+        DocumentContent.objects
+        .filter(document__in=[document.pk for document in documents])
+        .annotate(headline=SearchHeadline(
+            'text', query,
+            config          = DocumentContent.SEARCH_CONFIG,
+            start_sel       = HEADLINE_START_SEL,
+            stop_sel        = HEADLINE_STOP_SEL,
+            max_fragments   = 2,
+            min_words       = 8,
+            max_words       = 25,
+        ))
+        .values_list('document_id', 'headline')
+    )
+    for document in documents:
+        document.headline = render_headline(headlines.get(document.pk, ''))
+    return documents
+
+
+def render_headline(headline):
+    """Extrait en HTML : texte du document echappe, seuls les termes trouves sont balises"""
+
+    return (
+        escape(headline)
+        .replace(HEADLINE_START_SEL, HIGHLIGHT_START)
+        .replace(HEADLINE_STOP_SEL, HIGHLIGHT_STOP)
+    )
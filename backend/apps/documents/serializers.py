@@ -1,9 +1,27 @@
 from rest_framework import serializers
-from .models import Document
+from .models import Document, DocumentExport, UploadSession
+from .export import is_up_to_date
 from django.conf import settings
 import re
 import os
 
+ALLOWED_CONTENT_TYPES = [
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+]
+ALLOWED_EXTENSIONS = ['.pdf', '.docx', '.pptx']
+FILE_NAME_PATTERN = r'^[a-zA-Z0-9._-]+$'
+
+
+def validate_file_name(name):
+    """Nom de fichier sans chemin ni caracteres speciaux, extension autorisee"""
+    
+    if not re.match(FILE_NAME_PATTERN, name):
+        raise serializers.ValidationError("Nom de fichier invalide")
+    if os.path.splitext(name)[1].lower() not in ALLOWED_EXTENSIONS:
+        raise serializers.ValidationError("Extension de fichier non autorisée")
+
 class DocumentSerializer(serializers.ModelSerializer):
     file_name = serializers.ReadOnlyField()
     
@@ -12,38 +30,33 @@ class DocumentSerializer(serializers.ModelSerializer):
         fields              = [
             'id', 'title', 'file', 'file_name', 'category', 
             'content_preview', 'keywords', 'file_type', 
-            'file_size', 'created_at', 'updated_at'
+            'file_size', 'status', 'created_at', 'updated_at'
         ]
+        # fichier non modifiable : son empreinte, sa classification et son partage en dependent
         read_only_fields    = [
-            'category', 'content_preview', 'keywords', 
-            'file_type', 'file_size', 'created_at', 'updated_at'
+            'file', 'category', 'content_preview', 'keywords', 
+            'file_type', 'file_size', 'status', 'created_at', 'updated_at'
         ]
         
         
 class DocumentUploadSerializer(serializers.ModelSerializer):
     class Meta:
-        model   = Document
-        fields  = ['title', 'file']
+        model               = Document
+        fields              = ['id', 'title', 'file', 'status']
+        read_only_fields    = ['id', 'status']
         
     def validate_file(self, value):
         # validation de la taille du fichier
-        if value.size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
-            raise serializers.ValidationError("La taille du fichier ne dois pas depasser 10MB")
+        if value.size > settings.DOCUMENT_MAX_UPLOAD_SIZE:
+            max_size_mb = settings.DOCUMENT_MAX_UPLOAD_SIZE // (1024 * 1024)
+            raise serializers.ValidationError(f"La taille du fichier ne dois pas depasser {max_size_mb}MB")
         
         # validation du type de fichier
-        allowed_types = ['application/pdf', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document','application/vnd.openxmlformats-officedocument.presentationml.presentation']
-        if value.content_type not in allowed_types:
+        if value.content_type not in ALLOWED_CONTENT_TYPES:
             raise serializers.ValidationError("Type de fichier non supporte. Utilisez PDF, PPTX ou DOCX")
         
-        # Validation du nom de fichier
-        if not re.match(r'^[a-zA-Z0-9._-]+$', value.name):
-            raise serializers.ValidationError("Nom de fichier invalide")
-        
-        # Vérification de l'extension
-        allowed_extensions = ['.pdf', '.docx', '.pptx']
-        file_ext = os.path.splitext(value.name)[1].lower()
-        if file_ext not in allowed_extensions:
-            raise serializers.ValidationError("Extension de fichier non autorisée")
+        # validation du nom et de l'extension
+        validate_file_name(value.name)
         
         return value
     
@@ -55,5 +68,94 @@ class DocumentListSerializer(serializers.ModelSerializer):
         model   = Document
         fields  = [
             'id', 'title', 'file_name', 'category', 
-            'file_type', 'file_size', 'created_at'
-        ]
\ No newline at end of file
+            'file_type', 'file_size', 'status', 'created_at'
+        ]
+
+
+class DocumentSearchSerializer(DocumentListSerializer):
+    rank        = serializers.FloatField(read_only=True)
+    headline    = serializers.CharField(read_only=True)
+    
+    class Meta(DocumentListSerializer.Meta):
+        fields  = DocumentListSerializer.Meta.fields + ['rank', 'headline']
+
+
+# colonnes lues pour la liste sans recherche (voir serialize_document_rows)
+DOCUMENT_LIST_COLUMNS = ('id', 'title', 'file', 'category', 'file_type', 'file_size', 'status', 'created_at')
+DATETIME_FIELD = serializers.DateTimeField()
+
+
+def serialize_document_rows(rows):
+    """Lignes de .values(*DOCUMENT_LIST_COLUMNS) au format de DocumentListSerializer
+    
+    Meme schema (champs, ordre, format des dates) sans instances ni champs DRF par ligne :
+    le nom du fichier est deduit du chemin stocke, sans FieldFile.
+    """
+    
+    to_datetime = DATETIME_FIELD.to_representation
+    return [
+        {
+            'id'            : row['id'],
+            'title'         : row['title'],
+            'file_name'     : os.path.basename(row['file']),
+            'category'      : row['category'],
+            'file_type'     : row['file_type'],
+            'file_size'     : row['file_size'],
+            'status'        : row['status'],
+            'created_at'    : to_datetime(row['created_at']),
+        }
+        for row in rows
+    ]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    offset = serializers.IntegerField(source='received', read_only=True)
+    
+    class Meta:
+        model               = UploadSession
+        fields              = ['id', 'title', 'file_name', 'file_size', 'content_hash', 'offset', 'status', 'document']
+        read_only_fields    = ['id', 'status', 'document']
+        
+    def validate_file_name(self, value):
+        validate_file_name(value)
+        return value
+    
+    def validate_file_size(self, value):
+        if value <= 0:
+            raise serializers.ValidationError("Le fichier est vide")
+        if value > settings.DOCUMENT_CHUNKED_UPLOAD_MAX_SIZE:
+            max_size_mb = settings.DOCUMENT_CHUNKED_UPLOAD_MAX_SIZE // (1024 * 1024)
+            raise serializers.ValidationError(f"La taille du fichier ne dois pas depasser {max_size_mb}MB")
+        return value
+    
+    def validate_content_hash(self, value):
+        if value and not re.match(r'^[0-9a-f]{64}$', value):
+            raise serializers.ValidationError("Empreinte SHA-256 attendue (64 caracteres hexadecimaux)")
+        return value
+
+
+class ClassifyTextsSerializer(serializers.Serializer):
+    """Textes bruts a classifier en un lot (chacun limite au budget de classification)"""
+    
+    texts = serializers.ListField(
+        child       = serializers.CharField(allow_blank=True, trim_whitespace=False),
+        allow_empty = False,
+    )
+    
+    def validate_texts(self, value):
+        if len(value) > settings.DOCUMENT_CLASSIFY_MAX_TEXTS:
+            raise serializers.ValidationError(f"Au plus {settings.DOCUMENT_CLASSIFY_MAX_TEXTS} textes par requete")
+        max_chars = settings.DOCUMENT_CLASSIFICATION_MAX_CHARS
+        return [text[:max_chars] for text in value] if max_chars else value
+
+
+class DocumentExportSerializer(serializers.ModelSerializer):
+    up_to_date = serializers.SerializerMethodField()
+    
+    class Meta:
+        model               = DocumentExport
+        fields              = ['status', 'size', 'document_count', 'etag', 'error', 'built_at', 'up_to_date']
+        read_only_fields    = fields
+        
+    def get_up_to_date(self, obj):
+        return is_up_to_date(obj)
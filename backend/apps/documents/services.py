@@ -1,89 +1,389 @@
 import os
-import tempfile
+import time
 import zipfile
-from io import BytesIO
+from collections import defaultdict
 from django.conf import settings
-from django.http import HttpResponse
-from .models import Document
+from django.core.files.move import file_move_safe
+from django.db import transaction
+from django.utils import timezone
+from .models import Document, DocumentContent
 import logging
-from .utils import get_file_type, extract_text_from_document, classify_document
+from .response_cache import bump_generation
+from .stats import apply_delta
+from .upload_handlers import compute_content_hash
+from .extraction_cache import get_cached_text, set_cached_text
+from .classifier import get_classifier
+from .extraction import ExtractionError, extract_document, extract_text
+from . import metrics
+from .filetypes import get_file_type
+from .utils import DocumentReadError, classify_document_stream
+
+logger = logging.getLogger(__name__)
+
+# taille des blocs lus sur disque et emis dans la reponse zip
+ZIP_CHUNK_SIZE = 64 * 1024
+
+# formats dont le contenu est deja compresse (PDF : flux internes, DOCX/PPTX : archives zip)
+COMPRESSED_EXTENSIONS = {'.pdf', '.docx', '.pptx'}
 
 
 class DocumentProcessingService:
     @staticmethod
-    def process_uploaded_document(document_instance, uploaded_file):
-        """Traite un document uploade : extraction de texte et classification"""
+    def analyse_file(file_path, content_hash=None, extraction_pool=None, timer=None):
+        """Detection du type, extraction du texte et classification d'un fichier
+        
+        Retourne les champs de Document a mettre a jour. N'accede pas a la base.
+        La lecture du fichier s'execute dans le pool d'extraction (celui des settings
+        par defaut) : ExtractionTimeout est levee si elle depasse le delai.
+        La duree des etapes est cumulee dans `timer` (metrics.StageTimer), publiee par
+        l'appelant ; sans timer, elle est publiee a la fin de l'analyse.
+        """
+        
+        if timer is None:
+            timer = metrics.StageTimer()
+            try:
+                return DocumentProcessingService.analyse_file(file_path, content_hash, extraction_pool, timer)
+            finally:
+                timer.publish()
         
-        temp_file_path = None
+        # determiner le type de fichier
+        with timer.stage('type_detection'):
+            file_type = get_file_type(file_path)
+        timer.file_type = file_type
         
+        # texte deja extrait en cache, sinon lecture du fichier page par page : la
+        # classification s'arrete au budget de pages/caracteres ou des qu'elle est acquise
+        # (arret anticipe reserve au classement par mots-cles)
+        classifier = get_classifier()
+        decisive_margin = None if classifier.keyword_based else 0
+        cached_text = get_cached_text(content_hash, file_type)
+        max_pages = settings.DOCUMENT_CLASSIFICATION_MAX_PAGES if file_type in ('pdf', 'pptx') else None
+        if cached_text is not None:
+            with timer.stage('classification'):
+                category, keywords, extracted_text, complete = classify_document_stream(
+                    [cached_text], decisive_margin=decisive_margin,
+                )
+        else:
+            start = time.perf_counter()
+            category, keywords, extracted_text, complete, info = extract_document(
+                file_path, file_type, max_chunks=max_pages, decisive_margin=decisive_margin, pool=extraction_pool,
+            )
+            # lecture et classification sont entrelacees dans le processus de travail
+            timer.add('extraction', time.perf_counter() - start - info['classify_seconds'])
+            timer.add('classification', info['classify_seconds'])
+            metrics.chunks_read.observe(info['chunks'], format=file_type)
+        
+        # seul un texte lu en entier peut servir au cache d'extraction
+        if cached_text is None and complete:
+            set_cached_text(content_hash, file_type, extracted_text)
+        
+        if not classifier.keyword_based:
+            with timer.stage('classification'):
+                category = classifier.predict([extracted_text])[0]
+        
+        return {
+            'file_type': file_type,
+            'category': category,
+            'keywords': keywords,
+            'content_preview': extracted_text[:500] if extracted_text else "Aucun contenu extrait",
+        }
+    
+    
+    @staticmethod
+    def find_duplicate(user, content_hash):
+        """Document existant de l'utilisateur de meme contenu, de preference deja traite
+        
+        Limite aux documents de l'utilisateur : un document d'un autre compte ne doit ni
+        etre partage ni reveler qu'un contenu identique a deja ete envoye.
+        """
+        
+        if not content_hash:
+            return None
+        duplicates = Document.objects.filter(user=user, content_hash=content_hash).exclude(file='')
+        return (
+            duplicates.filter(status=Document.STATUS_DONE).order_by('pk').first()
+            or duplicates.order_by('pk').first()
+        )
+    
+    
+    @staticmethod
+    def find_duplicates(user, content_hashes):
+        """Documents existants de l'utilisateur par empreinte, de preference deja traites : {empreinte: document}
+        
+        Un document par empreinte et par statut (DISTINCT ON) : le cout ne depend pas du
+        nombre de copies d'un meme contenu.
+        """
+        
+        content_hashes = {content_hash for content_hash in content_hashes if content_hash}
+        if not content_hashes:
+            return {}
+        candidates = (
+            Document.objects
+            .filter(user=user, content_hash__in=content_hashes)
+            .exclude(file='')
+            .order_by('content_hash', 'status', 'pk')
+            .distinct('content_hash', 'status')
+        )
+        found = {}
+        for document in sorted(candidates, key=lambda document: document.pk):
+            current = found.get(document.content_hash)
+            if current is None or (current.status != Document.STATUS_DONE and document.status == Document.STATUS_DONE):
+                found[document.content_hash] = document
+        return found
+    
+    
+    @staticmethod
+    def duplicate_fields(source):
+        """Champs repris d'un document identique deja traite : fichier partage, pas de re-analyse"""
+        
+        return {
+            'file': source.file.name,
+            'file_size': source.file_size,
+            'file_type': source.file_type,
+            'category': source.category,
+            'keywords': list(source.keywords),
+            'content_preview': source.content_preview,
+            'status': Document.STATUS_DONE,
+        }
+    
+    
+    @staticmethod
+    def create_documents(user, uploads):
+        """Enregistre un lot de fichiers deja valides avec une seule insertion
+        
+        `uploads` : liste de (titre, fichier, empreinte). Comme pour un upload unitaire, un
+        contenu deja traite par l'utilisateur reprend le fichier et la classification existants ; les autres
+        documents sont crees en attente de traitement. bulk_create ne declenche pas les
+        signaux : les compteurs de statistiques et le cache des reponses sont mis a jour ici.
+        """
+        
+        duplicates = DocumentProcessingService.find_duplicates(user, (content_hash for _, _, content_hash in uploads))
+        documents, stored_files = [], []
+        storage = Document._meta.get_field('file').storage
         try:
-            # Sauvegarder temporairement le fichier pour traitement
-            with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-                for chunk in uploaded_file.chunks():
-                    temp_file.write(chunk)
-                temp_file_path = temp_file.name
-            
-            # Vérifier que le fichier existe
-            if not os.path.exists(temp_file_path):
-                raise FileNotFoundError("Fichier temporaire non créé")
-                
-            # determiner le type de fichier
-            file_type = get_file_type(temp_file_path)
-            
-            # extraire le texte
-            extracted_text = extract_text_from_document(temp_file_path, file_type)
+            for title, uploaded_file, content_hash in uploads:
+                duplicate = duplicates.get(content_hash)
+                if duplicate is not None and duplicate.status == Document.STATUS_DONE:
+                    document = Document(
+                        user            = user,
+                        title           = title,
+                        content_hash    = content_hash,
+                        **DocumentProcessingService.duplicate_fields(duplicate)
+                    )
+                else:
+                    document = Document(
+                        user            = user,
+                        title           = title,
+                        file_size       = uploaded_file.size,
+                        content_hash    = content_hash,
+                        status          = Document.STATUS_PENDING,
+                    )
+                    if duplicate is not None:
+                        document.file = duplicate.file.name
+                    else:
+                        with metrics.time_stage('storage', metrics.format_for_name(uploaded_file.name)):
+                            document.file.save(uploaded_file.name, uploaded_file, save=False)
+                        stored_files.append(document.file.name)
+                        # un fichier identique plus loin dans le lot partagera celui-ci
+                        duplicates[content_hash] = document
+                documents.append(document)
             
-            # classifier le document
-            category, keywords = classify_document(extracted_text)
+            with transaction.atomic():
+                Document.objects.bulk_create(documents)
+                if settings.DOCUMENT_STATS_USE_COUNTERS:
+                    deltas = defaultdict(lambda: [0, 0])
+                    for document in documents:
+                        deltas[document.category][0] += 1
+                        deltas[document.category][1] += document.file_size
+                    for category, (count, size) in deltas.items():
+                        apply_delta(user.pk, category, count, size)
+                bump_generation(user.pk)
+        except Exception:
+            # aucune ligne creee : ne pas laisser de fichiers orphelins
+            for file_name in stored_files:
+                storage.delete(file_name)
+            raise
+        return documents
+    
+    
+    @staticmethod
+    def process_document(document_instance):
+        """Traite un document deja enregistre : extraction de texte et classification"""
+        
+        timer = metrics.StageTimer()
+        document_instance.status = Document.STATUS_PROCESSING
+        document_instance.save(update_fields=['status', 'updated_at'])
+        
+        try:
+            if not document_instance.content_hash:
+                document_instance.content_hash = compute_content_hash(document_instance.file)
             
             # mettre a jour l'instance du document
-            document_instance.file_type = file_type
-            document_instance.file_size = uploaded_file.size
-            document_instance.category = category
-            document_instance.keywords = keywords
-            document_instance.content_preview = extracted_text[:500] if extracted_text else "Aucun contenu extrait"
-            
-            return document_instance
+            results = DocumentProcessingService.analyse_file(
+                document_instance.file.path, document_instance.content_hash, timer=timer,
+            )
+            for field, value in results.items():
+                setattr(document_instance, field, value)
+            document_instance.status = Document.STATUS_DONE
+            document_instance.processing_error = ''
             
         except Exception as e:
-            # Log l'erreur
-            logger = logging.getLogger(__name__)
-            logger.error(f"Erreur lors du traitement du document {uploaded_file.name}: {e}")
+            # echec attendu de l'extraction (fichier illisible, delai) : pas de trace
+            if isinstance(e, (ExtractionError, DocumentReadError)):
+                logger.error(f"Erreur lors du traitement du document {document_instance.pk}: {e}")
+            else:
+                logger.exception(f"Erreur lors du traitement du document {document_instance.pk}: {e}")
+            # type de l'erreur d'origine, y compris levee dans un processus d'extraction
+            reason = e.reason if isinstance(e, ExtractionError) else type(e).__name__
+            metrics.failures_total.inc(format=timer.file_type, reason=reason)
+            DocumentProcessingService.mark_failed(document_instance, str(e))
             
-            # Valeurs par défaut en cas d'erreur
-            document_instance.file_type = 'unknown'
-            document_instance.file_size = uploaded_file.size
-            document_instance.category = 'autres'
-            document_instance.keywords = []
-            document_instance.content_preview = "Erreur lors de l'extraction du contenu"
-            
-            return document_instance
-            
-        finally:
-            # Nettoyer le fichier temporaire
-            if temp_file_path and os.path.exists(temp_file_path):
-                try:
-                    os.remove(temp_file_path)
-                except OSError as e:
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.warning(f"Impossible de supprimer le fichier temporaire {temp_file_path}: {e}")
+        with timer.stage('db_save'):
+            document_instance.save()
+        metrics.record_document(document_instance, timer)
+        return document_instance
                     
     
     @staticmethod
-    def create_documents_zip(user):
-        """Creer un fichier zip contenant tous les documents de l'utilisateur classes par categorie"""
-        documents = Document.objects.filter(user=user)
-        
-        # Creer un buffer pour le zip
-        zip_buffer = BytesIO()
-        
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for document in documents:
-                if document.file and os.path.exists(document.file.path):
-                    # chemin dans le zip category/nom_du_fichier
-                    zip_path = f"{document.category}/{document.file_name}"
-                    zip_file.write(document.file.path, zip_path)
+    def mark_failed(document_instance, error):
+        """Passe le document en echec avec les valeurs par defaut (sans l'enregistrer)"""
+        
+        document_instance.file_type = 'unknown'
+        document_instance.category = 'autres'
+        document_instance.keywords = []
+        document_instance.content_preview = "Erreur lors de l'extraction du contenu"
+        document_instance.status = Document.STATUS_FAILED
+        document_instance.processing_error = error
                     
-        zip_buffer.seek(0)
-        return zip_buffer
\ No newline at end of file
+    
+    @staticmethod
+    def index_content(document_instance, extraction_pool=None):
+        """Enregistre le texte extrait complet du document pour la recherche plein texte
+        
+        Le texte est repris, dans l'ordre, d'un document de meme contenu deja indexe, du
+        cache d'extraction, ou extrait du fichier (dans le pool d'extraction).
+        """
+        
+        max_chars = settings.DOCUMENT_SEARCH_MAX_CHARS
+        content_hash = document_instance.content_hash
+        text = None
+        if content_hash:
+            text = (
+                DocumentContent.objects
+                .filter(document__content_hash=content_hash)
+                .exclude(document=document_instance)
+                .values_list('text', flat=True)
+                .first()
+            )
+        if text is None:
+            text = get_cached_text(content_hash, document_instance.file_type)
+        if text is None:
+            text, complete = extract_text(
+                document_instance.file.path, document_instance.file_type, max_chars, pool=extraction_pool,
+            )
+            if complete:
+                set_cached_text(content_hash, document_instance.file_type, text)
+        
+        # PostgreSQL refuse le caractere nul dans un champ texte
+        text = text[:max_chars].replace('\x00', '')
+        DocumentContent.objects.update_or_create(document=document_instance, defaults={'text': text})
+    
+    
+    @staticmethod
+    def relocate_file(file_name, category):
+        """Deplace un fichier stocke vers documents/<categorie>/ et retourne son nouveau nom"""
+        
+        if os.path.dirname(file_name) == f'documents/{category}':
+            return file_name
+        storage = Document._meta.get_field('file').storage
+        new_name = storage.get_available_name(f'documents/{category}/{os.path.basename(file_name)}')
+        return DocumentProcessingService.move_file(file_name, new_name)
+    
+    
+    @staticmethod
+    def move_file(file_name, new_name):
+        """Deplace un fichier stocke vers `new_name` et retourne le nom effectivement utilise"""
+        
+        storage = Document._meta.get_field('file').storage
+        try:
+            old_path, new_path = storage.path(file_name), storage.path(new_name)
+        except NotImplementedError:
+            # stockage distant : copie puis suppression
+            with storage.open(file_name, 'rb') as source:
+                new_name = storage.save(new_name, source)
+            storage.delete(file_name)
+            return new_name
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        file_move_safe(old_path, new_path)
+        return new_name
+    
+    
+    @staticmethod
+    def iter_documents_zip(user, chunk_size=ZIP_CHUNK_SIZE):
+        """Produit, morceau par morceau, un zip de tous les documents de l'utilisateur classes par categorie
+        
+        Les fichiers sont lus par blocs de `chunk_size` octets et chaque bloc compresse est
+        emis aussitot : la memoire utilisee ne depend pas de la taille de la bibliotheque.
+        """
+        documents = Document.objects.filter(user=user).only('file', 'category', 'updated_at')
+        
+        stream = ZipStream()
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for document in documents.iterator():
+                if not (document.file and os.path.exists(document.file.path)):
+                    continue
+                
+                zip_info = DocumentProcessingService.zip_entry(document)
+                with open(document.file.path, 'rb') as source, zip_file.open(zip_info, 'w') as target:
+                    while chunk := source.read(chunk_size):
+                        target.write(chunk)
+                        yield from stream.drain()
+                yield from stream.drain()
+        yield from stream.drain()
+    
+    
+    @staticmethod
+    def zip_entry(document, name=None):
+        """Entree de l'archive zip pour le fichier d'un document (par defaut category/nom_du_fichier)"""
+        
+        zip_info = zipfile.ZipInfo(
+            name or f"{document.category}/{document.file_name}",
+            date_time = timezone.localtime(document.updated_at).timetuple()[:6],
+        )
+        zip_info.file_size = os.path.getsize(document.file.path)
+        
+        # les PDF/DOCX/PPTX sont deja compresses : les recompresser coute du CPU pour rien
+        extension = os.path.splitext(document.file.name)[1].lower()
+        if settings.DOCUMENT_ZIP_STORE_COMPRESSED and extension in COMPRESSED_EXTENSIONS:
+            zip_info.compress_type = zipfile.ZIP_STORED
+        else:
+            zip_info.compress_type = zipfile.ZIP_DEFLATED
+        return zip_info
+
+
+class ZipStream:
+    """Flux d'ecriture non positionnable pour zipfile, vide a chaque morceau produit
+    
+    Sans `seek`, zipfile ecrit les tailles et CRC apres chaque fichier (data descriptor)
+    au lieu de revenir en arriere dans l'archive.
+    """
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self):
+        return self._position
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        """Retourne et oublie les morceaux ecrits depuis le dernier appel"""
+        chunks, self._chunks = self._chunks, []
+        return chunks
@@ -0,0 +1,75 @@
+"""
+
+Signaux de Document : maintien des compteurs materialises de statistiques.
+Les operations en masse (bulk_create, bulk_update, update) ne declenchent pas ces
+signaux : elles doivent appeler `stats.apply_delta` ou `stats.rebuild_user_stats`.
+
+Signaux de Document et DocumentContent : nouvelle generation du cache des reponses de
+l'utilisateur (les operations en masse doivent appeler `response_cache.bump_generation`).
+
+Signaux de Category et CategoryKeyword : nouvelle version de la taxonomie (les
+operations en masse doivent appeler `taxonomy.bump_version`).
+
+"""
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Category, CategoryKeyword, Document, DocumentContent
+from .response_cache import bump_generation
+from .stats import apply_delta
+from .taxonomy import bump_version
+
+
+@receiver(pre_save, sender=Document)
+def remember_previous_stats_values(sender, instance, update_fields=None, **kwargs):
+    instance._previous_stats_values = None
+    if not settings.DOCUMENT_STATS_USE_COUNTERS or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not {'category', 'file_size', 'user'} & set(update_fields):
+        return
+    instance._previous_stats_values = (
+        Document.objects.filter(pk=instance.pk).values_list('user_id', 'category', 'file_size').first()
+    )
+
+
+@receiver(post_save, sender=Document)
+def update_stats_on_save(sender, instance, created, **kwargs):
+    if not settings.DOCUMENT_STATS_USE_COUNTERS:
+        return
+    if created:
+        apply_delta(instance.user_id, instance.category, 1, instance.file_size)
+        return
+    previous = getattr(instance, '_previous_stats_values', None)
+    if previous and previous != (instance.user_id, instance.category, instance.file_size):
+        user_id, category, file_size = previous
+        apply_delta(user_id, category, -1, -file_size)
+        apply_delta(instance.user_id, instance.category, 1, instance.file_size)
+
+
+@receiver(post_delete, sender=Document)
+def update_stats_on_delete(sender, instance, **kwargs):
+    if not settings.DOCUMENT_STATS_USE_COUNTERS:
+        return
+    apply_delta(instance.user_id, instance.category, -1, -instance.file_size)
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def invalidate_cached_responses(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_stats_values', None)
+    bump_generation(instance.user_id, previous[0] if previous else None)
+
+
+@receiver(post_save, sender=DocumentContent)
+def invalidate_cached_search_responses(sender, instance, **kwargs):
+    # texte indexe : resultats de la recherche (?q=) modifies
+    bump_generation(instance.document.user_id)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=CategoryKeyword)
+@receiver(post_delete, sender=CategoryKeyword)
+def bump_taxonomy_version(sender, **kwargs):
+    bump_version()
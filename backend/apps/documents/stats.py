@@ -0,0 +1,131 @@
+"""
+
+Statistiques des documents par utilisateur et par categorie, et comptes par mot-cle.
+
+Deux sources equivalentes :
+    - une agregation GROUP BY sur Document (une requete)
+    - la table DocumentCategoryStat, tenue a jour par les signaux de Document
+      quand DOCUMENT_STATS_USE_COUNTERS est actif (lecture en O(nombre de categories))
+
+"""
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F, Sum
+from .models import Document, DocumentCategoryStat
+from .response_cache import bump_generation
+from .taxonomy import get_taxonomy
+
+
+def aggregate_user_stats(user_id):
+    """Nombre et volume de documents par categorie, en une seule requete"""
+
+    rows = (
+        Document.objects
+        .filter(user_id=user_id)
+        .order_by()
+        .values('category')
+        .annotate(document_count=Count('id'), total_size=Sum('file_size'))
+    )
+    return {row['category']: (row['document_count'], row['total_size'] or 0) for row in rows}
+
+
+def counter_user_stats(user_id):
+    """Nombre et volume de documents par categorie, lus dans les compteurs materialises"""
+
+    rows = DocumentCategoryStat.objects.filter(user_id=user_id).values_list('category', 'document_count', 'total_size')
+    return {category: (count, size) for category, count, size in rows if count}
+
+
+def get_user_stats(user_id):
+    """Statistiques de l'utilisateur au format de l'endpoint /api/documents/stats/"""
+
+    if settings.DOCUMENT_STATS_USE_COUNTERS:
+        per_category = counter_user_stats(user_id)
+    else:
+        per_category = aggregate_user_stats(user_id)
+
+    stats = {
+        'total_documents': sum(count for count, _ in per_category.values()),
+        'total_size': sum(size for _, size in per_category.values()),
+        'categories': {},
+        'sizes': {},
+    }
+    # categories de la taxonomie, puis celles retirees depuis qui contiennent encore des documents
+    categories = list(get_taxonomy().categories)
+    categories += [category for category in per_category if category not in categories]
+    for category in categories:
+        count, size = per_category.get(category, (0, 0))
+        stats['categories'][category] = count
+        stats['sizes'][category] = size
+    return stats
+
+
+def apply_delta(user_id, category, count, size):
+    """Ajoute (ou retire) des documents aux compteurs d'un utilisateur pour une categorie"""
+
+    counters = DocumentCategoryStat.objects.filter(user_id=user_id, category=category)
+    if counters.update(document_count=F('document_count') + count, total_size=F('total_size') + size):
+        return
+    if count <= 0:
+        # rien a decrementer (compteurs pas encore initialises ou utilisateur en cours de suppression)
+        return
+    try:
+        with transaction.atomic():
+            DocumentCategoryStat.objects.create(
+                user_id=user_id, category=category, document_count=count, total_size=size
+            )
+    except IntegrityError:
+        # cree entre-temps par une autre requete
+        counters.update(document_count=F('document_count') + count, total_size=F('total_size') + size)
+
+
+def rebuild_user_stats(user_ids=None):
+    """Recalcule les compteurs materialises a partir des documents"""
+
+    documents = Document.objects.order_by()
+    counters = DocumentCategoryStat.objects.all()
+    if user_ids is not None:
+        documents = documents.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+
+    rows = documents.values('user_id', 'category').annotate(
+        document_count=Count('id'), total_size=Sum('file_size')
+    )
+    with transaction.atomic():
+        rows = list(rows)
+        # statistiques en cache des utilisateurs dont les compteurs changent
+        user_ids = set(counters.order_by().values_list('user_id', flat=True).distinct()) | {row['user_id'] for row in rows}
+        counters.delete()
+        DocumentCategoryStat.objects.bulk_create([
+            DocumentCategoryStat(
+                user_id         = row['user_id'],
+                category        = row['category'],
+                document_count  = row['document_count'],
+                total_size      = row['total_size'] or 0,
+            )
+            for row in rows
+        ])
+        bump_generation(*user_ids)
+
+
+def keyword_facets(user_id, category=None):
+    """Nombre de documents par mot-cle trouve, en une seule requete
+
+    Les listes JSON sont depliees par PostgreSQL (jsonb_array_elements_text) :
+    aucune ligne n'est chargee ni deserialisee cote Python.
+    """
+
+    sql = (
+        f'SELECT keyword, COUNT(*) FROM {Document._meta.db_table} '
+        'CROSS JOIN LATERAL jsonb_array_elements_text(keywords) AS keyword '
+        'WHERE user_id = %s'
+    )
+    params = [user_id]
+    if category:
+        sql += ' AND category = %s'
+        params.append(category)
+    sql += ' GROUP BY keyword ORDER BY COUNT(*) DESC, keyword'
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [{'keyword': keyword, 'count': count} for keyword, count in cursor.fetchall()]
@@ -0,0 +1,241 @@
+"""
+
+File de traitement asynchrone des documents.
+
+Les taches sont enregistrees par nom avec le decorateur `task` puis mises en
+file avec `enqueue`. Le backend d'execution est choisi par le setting
+DOCUMENT_PROCESSING_BACKEND :
+    - 'thread'    : pool de threads dans le processus web (par defaut)
+    - 'database'  : table ProcessingJob consommee par `manage.py process_documents_queue`
+    - 'immediate' : execution synchrone (tests, developpement)
+
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import export, metrics
+from .models import Document, ProcessingJob
+from .services import DocumentProcessingService
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+
+def task(name):
+    """Enregistre une fonction comme tache executable par les backends"""
+
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def run_task(name, payload):
+    """Execute une tache enregistree avec son payload"""
+
+    try:
+        func = TASKS[name]
+    except KeyError:
+        raise ValueError(f"Tache inconnue : {name}")
+    return func(**payload)
+
+
+class ImmediateBackend:
+    """Execute les taches immediatement dans le processus appelant"""
+
+    def enqueue(self, name, payload):
+        run_task(name, payload)
+
+
+class ThreadPoolBackend:
+    """Execute les taches dans un pool de threads du processus web"""
+
+    def __init__(self, max_workers=None):
+        self.max_workers    = max_workers or settings.DOCUMENT_PROCESSING_WORKERS
+        self._executor      = None
+        self._lock          = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers         = self.max_workers,
+                    thread_name_prefix  = 'document-processing',
+                )
+            return self._executor
+
+    def enqueue(self, name, payload):
+        # attendre le commit pour que le worker voie les lignes creees par la requete
+        transaction.on_commit(lambda: self.executor.submit(self._run, name, payload))
+
+    @staticmethod
+    def _run(name, payload):
+        close_old_connections()
+        try:
+            run_task(name, payload)
+        except Exception:
+            logger.exception(f"Echec de la tache {name} ({payload})")
+        finally:
+            close_old_connections()
+
+
+class DatabaseBackend:
+    """File d'attente persistante en base, partagee entre plusieurs noeuds"""
+
+    def enqueue(self, name, payload):
+        ProcessingJob.objects.create(task=name, payload=payload)
+
+    def enqueue_many(self, name, payloads):
+        ProcessingJob.objects.bulk_create(ProcessingJob(task=name, payload=payload) for payload in payloads)
+
+    @staticmethod
+    def claim_next():
+        """Reserve la prochaine tache disponible sans bloquer les autres workers"""
+
+        # les taches 'running' trop anciennes appartiennent a un worker mort : reprises tant
+        # qu'elles n'ont pas atteint le nombre maximal de tentatives
+        stale_before = timezone.now() - timedelta(seconds=settings.DOCUMENT_PROCESSING_JOB_TIMEOUT)
+        max_attempts = settings.DOCUMENT_PROCESSING_JOB_MAX_ATTEMPTS
+        DatabaseBackend.fail_exhausted(stale_before, max_attempts)
+        with transaction.atomic():
+            job = (
+                ProcessingJob.objects
+                .select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=ProcessingJob.STATUS_PENDING) |
+                    Q(status=ProcessingJob.STATUS_RUNNING, updated_at__lt=stale_before, attempts__lt=max_attempts)
+                )
+                .order_by('created_at')
+                .first()
+            )
+            if job is None:
+                return None
+            ProcessingJob.objects.filter(pk=job.pk).update(
+                status      = ProcessingJob.STATUS_RUNNING,
+                attempts    = F('attempts') + 1,
+                updated_at  = timezone.now(),
+            )
+        job.refresh_from_db()
+        return job
+
+    @staticmethod
+    def fail_exhausted(stale_before, max_attempts):
+        """Passe en echec les taches abandonnees apres `max_attempts` tentatives, et leur document"""
+
+        with transaction.atomic():
+            jobs = list(
+                ProcessingJob.objects
+                .select_for_update(skip_locked=True)
+                .filter(status=ProcessingJob.STATUS_RUNNING, updated_at__lt=stale_before, attempts__gte=max_attempts)
+            )
+            if not jobs:
+                return
+            error = f"Tache abandonnee apres {max_attempts} tentatives interrompues"
+            for job in jobs:
+                logger.error(f"{error} : {job}")
+                job.status      = ProcessingJob.STATUS_FAILED
+                job.last_error  = error
+                job.save(update_fields=['status', 'last_error', 'updated_at'])
+                if job.task != 'process_document':
+                    continue
+                document = Document.objects.filter(pk=job.payload.get('document_id')).first()
+                if document is not None and document.status != Document.STATUS_DONE:
+                    metrics.failures_total.inc(format=document.file_type, reason='JobAttemptsExceeded')
+                    DocumentProcessingService.mark_failed(document, error)
+                    document.save()
+
+    def run_next(self):
+        """Execute une tache de la file, retourne False si la file est vide"""
+
+        job = self.claim_next()
+        if job is None:
+            return False
+        try:
+            run_task(job.task, job.payload)
+        except Exception as e:
+            logger.exception(f"Echec de la tache {job}")
+            job.status      = ProcessingJob.STATUS_FAILED
+            job.last_error  = str(e)
+        else:
+            job.status      = ProcessingJob.STATUS_DONE
+            job.last_error  = ''
+        job.save(update_fields=['status', 'last_error', 'updated_at'])
+        return True
+
+
+BACKENDS = {
+    'immediate': ImmediateBackend,
+    'thread': ThreadPoolBackend,
+    'database': DatabaseBackend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend():
+    """Retourne l'instance (partagee par processus) du backend configure"""
+
+    name = settings.DOCUMENT_PROCESSING_BACKEND
+    with _backends_lock:
+        if name not in _backends:
+            backend_class = BACKENDS[name] if name in BACKENDS else import_string(name)
+            _backends[name] = backend_class()
+        return _backends[name]
+
+
+def enqueue(name, **payload):
+    """Met une tache en file sur le backend configure"""
+
+    get_backend().enqueue(name, payload)
+
+
+def enqueue_many(name, payloads):
+    """Met un lot de taches en file (une insertion pour le backend 'database')"""
+
+    backend = get_backend()
+    if hasattr(backend, 'enqueue_many'):
+        backend.enqueue_many(name, payloads)
+        return
+    for payload in payloads:
+        backend.enqueue(name, payload)
+
+
+@task('process_document')
+def process_document(document_id):
+    """Extraction de texte et classification d'un document deja enregistre"""
+
+    document = Document.objects.filter(pk=document_id).first()
+    if document is None:
+        logger.warning(f"Document {document_id} introuvable, traitement ignore")
+        return
+    DocumentProcessingService.process_document(document)
+    if document.status == Document.STATUS_DONE:
+        enqueue('index_document', document_id=document.pk)
+
+
+@task('index_document')
+def index_document(document_id):
+    """Indexation du texte complet d'un document classe pour la recherche plein texte"""
+
+    document = Document.objects.filter(pk=document_id).exclude(file='').first()
+    if document is None:
+        logger.warning(f"Document {document_id} introuvable, indexation ignoree")
+        return
+    DocumentProcessingService.index_content(document)
+
+
+@task('build_export')
+def build_export(user_id):
+    """Construction ou mise a jour incrementale de l'archive zip des documents d'un utilisateur"""
+
+    export.build_export(user_id)
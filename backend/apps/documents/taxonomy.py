@@ -0,0 +1,85 @@
+"""
+
+Taxonomie de classification : categories et mots-cles stockes en base (Category,
+CategoryKeyword), modifiables sans redeploiement (admin Django).
+
+Chaque modification incremente TaxonomyVersion (signaux de Category et CategoryKeyword ;
+les operations en masse doivent appeler `bump_version`). Chaque processus garde la
+taxonomie en memoire avec sa version et relit la version en base au plus toutes les
+DOCUMENT_TAXONOMY_CHECK_INTERVAL secondes (une requete sur une ligne) : une modification
+est prise en compte par tous les processus dans ce delai, sans redemarrage. Le matcher
+compile (classifier.get_matcher) suit la version de la taxonomie.
+
+"""
+
+import threading
+import time
+from django.conf import settings
+from django.db.models import F
+from .models import Category, CategoryKeyword, TaxonomyVersion
+
+VERSION_PK = 1
+
+
+class Taxonomy:
+    """Etat de la taxonomie a une version donnee"""
+
+    def __init__(self, version, categories, labels):
+        self.version = version
+        # code -> mots-cles (ordre des positions), categorie par defaut comprise
+        self.categories = categories
+        # code -> libelle
+        self.labels = labels
+
+
+def current_version():
+    """Version de la taxonomie en base (0 si elle n'a jamais ete modifiee)"""
+
+    return TaxonomyVersion.objects.filter(pk=VERSION_PK).values_list('version', flat=True).first() or 0
+
+
+def bump_version():
+    """Signale une modification de la taxonomie a tous les processus"""
+
+    if not TaxonomyVersion.objects.filter(pk=VERSION_PK).update(version=F('version') + 1):
+        TaxonomyVersion.objects.get_or_create(pk=VERSION_PK, defaults={'version': 1})
+    invalidate()
+
+
+def load_taxonomy(version):
+    categories, labels = {}, {}
+    for code, label in Category.objects.values_list('code', 'label'):
+        categories[code] = []
+        labels[code] = label
+    for code, keyword in CategoryKeyword.objects.values_list('category__code', 'keyword'):
+        categories[code].append(keyword)
+    return Taxonomy(version, categories, labels)
+
+
+_taxonomy     = None
+_checked_at   = 0.0
+_lock         = threading.Lock()
+
+
+def get_taxonomy():
+    """Taxonomie courante, rechargee quand sa version en base change"""
+
+    global _taxonomy, _checked_at
+
+    with _lock:
+        now = time.monotonic()
+        if _taxonomy is None or now - _checked_at >= settings.DOCUMENT_TAXONOMY_CHECK_INTERVAL:
+            version = current_version()
+            if _taxonomy is None or _taxonomy.version != version:
+                _taxonomy = load_taxonomy(version)
+            _checked_at = now
+        return _taxonomy
+
+
+def invalidate():
+    """Force le rechargement de la taxonomie au prochain acces (modification dans ce processus)"""
+
+    global _taxonomy
+
+    with _lock:
+        _taxonomy = None
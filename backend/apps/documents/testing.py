@@ -0,0 +1,111 @@
+"""
+
+Generateurs de documents synthetiques (PDF, DOCX, PPTX) pour les tests et benchmarks.
+
+"""
+
+import random
+import zipfile
+from io import BytesIO
+import docx
+from pptx import Presentation
+from pptx.util import Inches
+
+FILLER_WORDS = [
+    'le', 'la', 'les', 'des', 'une', 'document', 'cours', 'exemple', 'chapitre',
+    'section', 'page', 'notes', 'resume', 'exercice', 'lecture', 'travail',
+]
+
+
+def random_text(words, vocabulary=(), keyword_ratio=0.02, seed=0):
+    """Texte de `words` mots, dont une proportion `keyword_ratio` tiree de `vocabulary`"""
+
+    rng = random.Random(seed)
+    vocabulary = list(vocabulary)
+    return ' '.join(
+        rng.choice(vocabulary) if vocabulary and rng.random() < keyword_ratio else rng.choice(FILLER_WORDS)
+        for _ in range(words)
+    )
+
+
+def _pdf_string(line):
+    escaped = line.encode('cp1252', 'replace').replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+    return b'(' + escaped + b')'
+
+
+def make_pdf(pages):
+    """Genere un PDF dont chaque page contient le texte donne (liste de chaines)"""
+
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # arbre des pages, complete une fois les pages numerotees
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+    ]
+    page_ids = []
+    for text in pages:
+        words, lines, line = text.split(), [], ''
+        for word in words:
+            if len(line) + len(word) > 90:
+                lines.append(line)
+                line = ''
+            line = f'{line} {word}' if line else word
+        lines.append(line)
+
+        content = b'BT /F1 9 Tf 12 TL 40 800 Td ' + b' '.join(_pdf_string(l) + b" '" for l in lines) + b' ET'
+        objects.append(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        content_id = len(objects)
+        objects.append(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+            b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % content_id
+        )
+        page_ids.append(len(objects))
+    kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+    objects[1] = b'<< /Type /Pages /Kids [' + kids + b'] /Count %d >>' % len(page_ids)
+
+    output = BytesIO()
+    output.write(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(output.tell())
+        output.write(b'%d 0 obj\n' % number + body + b'\nendobj\n')
+    xref = output.tell()
+    output.write(b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1))
+    for offset in offsets:
+        output.write(b'%010d 00000 n \n' % offset)
+    output.write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref))
+    return output.getvalue()
+
+
+def _fixed_timestamps(data):
+    """Reecrit une archive OOXML avec des dates fixes : meme texte, memes octets (et meme empreinte)"""
+
+    output = BytesIO()
+    with zipfile.ZipFile(BytesIO(data)) as source, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        for info in source.infolist():
+            target.writestr(zipfile.ZipInfo(info.filename, date_time=(1980, 1, 1, 0, 0, 0)), source.read(info),
+                            compress_type=zipfile.ZIP_DEFLATED)
+    return output.getvalue()
+
+
+def make_docx(text):
+    """Genere un fichier DOCX en memoire, un paragraphe par ligne du texte"""
+
+    document = docx.Document()
+    for line in text.split('\n'):
+        document.add_paragraph(line)
+    buffer = BytesIO()
+    document.save(buffer)
+    return _fixed_timestamps(buffer.getvalue())
+
+
+def make_pptx(slides):
+    """Genere un fichier PPTX en memoire, une diapositive par texte"""
+
+    presentation = Presentation()
+    layout = presentation.slide_layouts[6]  # diapositive vide
+    for text in slides:
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(6)).text_frame.text = text
+    buffer = BytesIO()
+    presentation.save(buffer)
+    return _fixed_timestamps(buffer.getvalue())
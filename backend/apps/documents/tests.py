@@ -1,14 +1,62 @@
-from django.test import TestCase
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from unittest import skipUnless
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Document
-from .utils import classify_document
+from django.db.models import F
+from django.utils import timezone
+from datetime import timedelta
+from io import BytesIO
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from unittest import mock
+import numpy as np
+from .models import (
+    Category, CategoryKeyword, Document, DocumentCategoryStat, DocumentContent, DocumentExport, ProcessingJob,
+    TaxonomyVersion,
+)
+from .serializers import DocumentListSerializer
+from .services import DocumentProcessingService
+from .stats import aggregate_user_stats, counter_user_stats, keyword_facets, rebuild_user_stats
+from .tasks import DatabaseBackend
+from .classifier import get_classifier
+from .extraction import ExtractionError, ExtractionPool, ExtractionTimeout
+from . import export, extraction_cache, filetypes, metrics, response_cache, taxonomy
+from .testing import make_docx, make_pdf, make_pptx, random_text
+from .utils import (
+    classify_document, classify_document_stream, classify_document_with_counts, classify_documents,
+    extract_text_from_document, extract_text_from_pdf, iter_text_from_document, read_document_text,
+)
 
 # Create your tests here.
 User = get_user_model()
 
+DOCX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+
+def bytes_written():
+    """Octets ecrits par ce processus via write() depuis son demarrage (Linux)"""
+    
+    with open('/proc/self/io') as f:
+        for line in f:
+            if line.startswith('wchar:'):
+                return int(line.split()[1])
+
+
+def extraction_cache_settings(location, max_size=1024 * 1024):
+    return {'BACKEND': 'disk', 'LOCATION': location, 'MAX_SIZE': max_size, 'TIMEOUT': None}
+
+
 class DocumentTests(APITestCase):
     
     def setUp(self):
@@ -40,15 +88,81 @@ class DocumentTests(APITestCase):
         category, keywords  = classify_document(history_text)
         self.assertEqual(category, 'histoire')
     
+    
+    def test_classification_counts_and_accents(self):
+        """Test du matcher compile : accents ignores, mots entiers, occurrences comptees"""
+        
+        text = "Équation, EQUATION et equation ; l'algèbre. Les équations ne comptent pas."
+        category, keyword_counts = classify_document_with_counts(text)
+        self.assertEqual(category, 'math')
+        self.assertEqual(keyword_counts, {'équation': 3, 'algèbre': 1})
+        
+        self.assertEqual(classify_document(""), ('autres', []))
+        
+    
+    def test_batch_classification(self):
+        """Test de la classification par lot : memes categories qu'un texte a la fois, scores et confiance"""
+        
+        texts = [
+            "Une equation et le calcul d'une equation, un algorithme",
+            "La guerre et la revolution",
+            "Un algorithme en python, une equation",
+            "",
+        ]
+        results = classify_documents(texts)
+        self.assertEqual([(r['category'], r['keywords']) for r in results], [classify_document(text) for text in texts])
+        self.assertEqual(results[0]['scores'], {'math': 0.75, 'algo': 0.25, 'histoire': 0.0})
+        self.assertEqual(results[0]['confidence'], 0.75)
+        self.assertEqual(results[3]['confidence'], 0.0)
+        
+        response = self.client.post('/api/documents/classify/', {'texts': texts[:2]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['category'] for r in response.data['results']], ['math', 'histoire'])
+        self.assertEqual(response.data['results'][1]['keywords'], ['guerre', 'révolution'])
+        
+        response = self.client.post('/api/documents/classify/', {'texts': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(DOCUMENT_CLASSIFY_MAX_TEXTS=2):
+            response = self.client.post('/api/documents/classify/', {'texts': texts}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+    
+    def test_classification_follows_taxonomy_changes(self):
+        """Test de la taxonomie en base : matcher recompile quand sa version change, sans redemarrage"""
+        
+        self.addCleanup(taxonomy.invalidate)
+        text = "Un cours de chimie sur les molecules"
+        self.assertEqual(classify_document(text), ('autres', []))
+        version = taxonomy.get_taxonomy().version
+        
+        # modification dans ce processus (admin) : prise en compte immediate
+        chimie = Category.objects.create(code='chimie', label='Chimie', position=10)
+        CategoryKeyword.objects.create(category=chimie, keyword='molécules')
+        CategoryKeyword.objects.create(category=chimie, keyword='chimie', position=1)
+        self.assertEqual(classify_document(text), ('chimie', ['molécules', 'chimie']))
+        self.assertGreater(taxonomy.get_taxonomy().version, version)
+        response = self.client.get('/api/documents/categories/')
+        self.assertEqual(response.data['categories'][-1], {'code': 'chimie', 'label': 'Chimie', 'keywords': ['molécules', 'chimie']})
+        
+        # modification par un autre processus : visible apres l'intervalle de verification
+        CategoryKeyword.objects.filter(keyword='chimie').update(keyword='atomes')
+        CategoryKeyword.objects.filter(keyword='molécules').update(keyword='réactions')
+        TaxonomyVersion.objects.update(version=F('version') + 1)
+        self.assertEqual(classify_document(text)[0], 'chimie')
+        with override_settings(DOCUMENT_TAXONOMY_CHECK_INTERVAL=0):
+            self.assertEqual(classify_document(text), ('autres', []))
+            self.assertEqual(classify_document("des atomes et des réactions")[0], 'chimie')
+
         
     
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='immediate', DOCUMENT_EXTRACTION_CACHE={'BACKEND': 'none'})
     def test_document_upload(self):
         """Test d'upload de document"""
-        # creer un fichier de test
+        # creer un fichier de test (PDF reel genere)
         test_file = SimpleUploadedFile(
-            "test.txt",
-            b"Contenu de test avec les mots-cles mathematiques equation algebre ",
-            content_type='text/plain'
+            "test.pdf",
+            make_pdf(["Contenu de test avec les mots-cles mathematiques equation algebre"]),
+            content_type='application/pdf'
         )
         
         url = '/api/documents/upload/'
@@ -56,9 +170,16 @@ class DocumentTests(APITestCase):
             'title': 'Document de test',
             'file': test_file
         }
-        # Note: Ce test nécessiterait un fichier PDF/DOCX/PPTX réel pour fonctionner complètement
-        # response = self.client.post(url, data, format='multipart')
-        # self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            response = self.client.post(url, data, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        
+        document = Document.objects.get(pk=response.data['id'])
+        self.assertEqual(document.status, Document.STATUS_DONE)
+        self.assertEqual(document.file_type, 'pdf')
+        self.assertEqual(document.category, 'math')
         
     
     def test_document_list(self):
@@ -69,6 +190,76 @@ class DocumentTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         
     
+    @override_settings(DB_QUERY_BUDGET=1)
+    def test_query_budget(self):
+        """Test du comptage des requetes SQL par requete HTTP et du journal des depassements de budget"""
+        
+        Document.objects.create(title='Doc', file='documents/algo/doc.pdf', category='algo', file_size=1, user=self.user)
+        requests = metrics.http_db_queries.count(view='document-list')
+        # comptage puis page de resultats : deux requetes
+        with self.assertLogs('apps.documents.middleware', 'WARNING') as logs:
+            self.client.get('/api/documents/')
+        self.assertIn('GET /api/documents/ (document-list)', logs.output[0])
+        self.assertEqual(metrics.http_db_queries.count(view='document-list'), requests + 1)
+        
+        with override_settings(DB_QUERY_BUDGET=0), self.assertNoLogs('apps.documents.middleware', 'WARNING'):
+            self.client.get('/api/documents/')
+        
+    
+    def test_document_list_cursor_pagination(self):
+        """Test de la pagination par curseur sur la liste des documents"""
+        
+        for index in range(5):
+            Document.objects.create(
+                title=f'Doc {index}', file=f'documents/math/doc{index}.pdf', category='math',
+                file_size=1, user=self.user
+            )
+        
+        response = self.client.get('/api/documents/', {'pagination': 'cursor', 'limit': 2, 'category': 'math'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        
+        titles = [document['title'] for document in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            titles += [document['title'] for document in response.data['results']]
+        self.assertEqual(titles, [f'Doc {index}' for index in reversed(range(5))])
+        
+        # la pagination limit/offset reste le mode par defaut
+        response = self.client.get('/api/documents/', {'limit': 2, 'offset': 4})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 1)
+
+
+    def test_document_list_lean_rendering(self):
+        """Test de la liste sans serializer par ligne : meme reponse que DocumentListSerializer et JSONRenderer"""
+
+        for index, title in enumerate(['Équations', 'Ligne\u2028séparée', 'Doc "cité"']):
+            Document.objects.create(
+                title=title, file=f'documents/math/sous dossier/doc{index}.pdf', category='math',
+                file_type='pdf', file_size=10 ** 10 + index, user=self.user
+            )
+        Document.objects.create(title='Sans fichier', file='', file_size=0, user=self.user)
+
+        queryset = Document.objects.filter(user=self.user)
+        expected = DocumentListSerializer(queryset, many=True).data
+        response = self.client.get('/api/documents/', {'limit': 10})
+        self.assertEqual(response.data['results'], expected)
+        self.assertEqual(
+            response.content, JSONRenderer().render({'count': 4, 'next': None, 'previous': None, 'results': expected}),
+        )
+        self.assertEqual([document['file_name'] for document in response.data['results']], ['', 'doc2.pdf', 'doc1.pdf', 'doc0.pdf'])
+        self.assertIn(b'Ligne\\u2028s', response.content)
+
+        response = self.client.get('/api/documents/', {'pagination': 'cursor', 'limit': 3})
+        self.assertEqual(response.data['results'], expected[:3])
+        self.assertEqual(self.client.get(response.data['next']).data['results'], expected[3:])
+
+        # sortie indentee demandee : rendu de DRF
+        response = self.client.get('/api/documents/', {'limit': 1}, HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  "count": 4', response.content)
+
+    
     
     def test_document_stats(self):
         """Test des statistiques des documents"""
@@ -77,4 +268,1127 @@ class DocumentTests(APITestCase):
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue('total_documents' in response.data)
-        self.assertTrue('categories' in response.data)
\ No newline at end of file
+        self.assertTrue('categories' in response.data)
+
+
+class DocumentProcessingTests(APITestCase):
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username    = 'testuser',
+            email       = 'test@example.com',
+            password    = 'testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        # stockage des fichiers uploades et cache d'extraction dans un repertoire temporaire
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(
+            MEDIA_ROOT=media_root,
+            DOCUMENT_EXTRACTION_CACHE=extraction_cache_settings(os.path.join(media_root, 'cache')),
+        )
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        
+    
+    def upload(self, name='cours.docx', text="Un algorithme de programmation en python"):
+        test_file = SimpleUploadedFile(name, make_docx(text), content_type=DOCX_CONTENT_TYPE)
+        return self.client.post(
+            '/api/documents/upload/',
+            {'title': 'Document de test', 'file': test_file},
+            format='multipart'
+        )
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='immediate')
+    def test_upload_returns_accepted_and_processes(self):
+        """Test d'upload asynchrone : 202 puis document traite"""
+        
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        
+        document = Document.objects.get(pk=response.data['id'])
+        self.assertEqual(document.status, Document.STATUS_DONE)
+        self.assertGreater(document.file_size, 0)
+        
+        response = self.client.get(f"/api/documents/{document.pk}/status/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Document.STATUS_DONE)
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='immediate', DOCUMENT_SLOW_PROCESSING_SECONDS=1e-6, METRICS_TOKEN='jeton')
+    def test_processing_metrics(self):
+        """Test des metriques par etape, du journal des documents lents et de l'endpoint /metrics"""
+        
+        processed = metrics.processed_total.value(status=Document.STATUS_DONE, format='docx')
+        extractions = metrics.stage_seconds.count(stage='extraction', format='docx')
+        with self.assertLogs('apps.documents.metrics', 'WARNING') as logs:
+            response = self.upload()
+        self.assertIn(f"Traitement lent du document {response.data['id']} (docx", logs.output[0])
+        self.assertIn('extraction=', logs.output[0])
+        self.assertEqual(metrics.processed_total.value(status=Document.STATUS_DONE, format='docx'), processed + 1)
+        self.assertEqual(metrics.stage_seconds.count(stage='extraction', format='docx'), extractions + 1)
+        for stage in ('upload_receive', 'storage', 'type_detection', 'classification', 'db_save'):
+            self.assertGreater(metrics.stage_seconds.count(stage=stage, format='docx'), 0, stage)
+        
+        self.assertEqual(self.client.get('/metrics').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer autre')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer jeton')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        content = response.content.decode()
+        self.assertIn('# TYPE documents_stage_seconds histogram', content)
+        self.assertIn('documents_stage_seconds_bucket{stage="extraction",format="docx",le="+Inf"}', content)
+        self.assertIn('documents_chunks_read_count{format="docx"}', content)
+        self.assertIn('documents_extraction_cache_misses_total', content)
+        
+    
+    def test_failure_metrics(self):
+        """Test du comptage des echecs par format et type d'erreur, et du rendu d'un histogramme"""
+        
+        failures = metrics.failures_total.value(format='pdf', reason='ExtractionTimeout')
+        document = Document.objects.create(
+            user=self.user, title='Lent', file='documents/lent.pdf', file_size=10,
+            content_hash='c' * 64, status=Document.STATUS_PENDING,
+        )
+        with mock.patch('apps.documents.services.get_file_type', return_value='pdf'), \
+             mock.patch('apps.documents.services.extract_document', side_effect=ExtractionTimeout("delai")), \
+             self.assertLogs('apps.documents.services', 'ERROR'):
+            DocumentProcessingService.process_document(document)
+        self.assertEqual(metrics.failures_total.value(format='pdf', reason='ExtractionTimeout'), failures + 1)
+
+        # fichier illisible : echec compte, dans le processus appelant comme dans le pool d'extraction
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'documents'), exist_ok=True)
+        with open(os.path.join(settings.MEDIA_ROOT, 'documents', 'corrompu.pdf'), 'wb') as f:
+            f.write(b'%PDF-1.4\n' + os.urandom(2000))
+        for workers in (0, 1):
+            failures = metrics.failures_total.value(format='pdf', reason='DocumentReadError')
+            document = Document.objects.create(
+                user=self.user, title='Corrompu', file='documents/corrompu.pdf', file_size=2009,
+                status=Document.STATUS_PENDING,
+            )
+            with override_settings(DOCUMENT_EXTRACTION_WORKERS=workers), \
+                 self.assertLogs('apps.documents.services', 'ERROR') as logs:
+                DocumentProcessingService.process_document(document)
+            self.assertIn('illisible', logs.output[0])
+            self.assertEqual(document.status, Document.STATUS_FAILED)
+            self.assertEqual(metrics.failures_total.value(format='pdf', reason='DocumentReadError'), failures + 1)
+
+        histogram = metrics.Histogram('essai', "Essai", ('format',), buckets=(1, 10))
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value, format='a"b')
+        self.assertEqual(histogram.render()[2:], [
+            'essai_bucket{format="a\\"b",le="1.0"} 2.0',
+            'essai_bucket{format="a\\"b",le="10.0"} 3.0',
+            'essai_bucket{format="a\\"b",le="+Inf"} 4.0',
+            'essai_sum{format="a\\"b"} 56.5',
+            'essai_count{format="a\\"b"} 4.0',
+        ])
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='database')
+    def test_upload_with_database_queue(self):
+        """Test de la file persistante : le document reste en attente jusqu'au worker"""
+        
+        response = self.upload()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Document.STATUS_PENDING)
+        
+        job = ProcessingJob.objects.get()
+        self.assertEqual(job.payload, {'document_id': response.data['id']})
+        
+        self.assertTrue(DatabaseBackend().run_next())
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.STATUS_DONE)
+        self.assertEqual(Document.objects.get(pk=response.data['id']).status, Document.STATUS_DONE)
+        
+        # puis l'indexation du texte pour la recherche
+        self.assertEqual(ProcessingJob.objects.get(status=ProcessingJob.STATUS_PENDING).task, 'index_document')
+        self.assertTrue(DatabaseBackend().run_next())
+        self.assertFalse(DatabaseBackend().run_next())
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='database', DOCUMENT_PROCESSING_JOB_MAX_ATTEMPTS=2)
+    def test_abandoned_job_attempts_are_limited(self):
+        """Test des taches abandonnees : reprises jusqu'au nombre maximal de tentatives, puis en echec"""
+        
+        document_id = self.upload().data['id']
+        job = ProcessingJob.objects.get()
+        stale = timezone.now() - timedelta(seconds=settings.DOCUMENT_PROCESSING_JOB_TIMEOUT + 1)
+        
+        # worker tue apres la premiere reservation : la tache est reprise
+        ProcessingJob.objects.filter(pk=job.pk).update(status=ProcessingJob.STATUS_RUNNING, attempts=1, updated_at=stale)
+        self.assertEqual(DatabaseBackend.claim_next().pk, job.pk)
+        
+        # puis tue a nouveau : plus de reprise, la tache et le document sont en echec
+        ProcessingJob.objects.filter(pk=job.pk).update(updated_at=stale)
+        self.assertFalse(DatabaseBackend().run_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ProcessingJob.STATUS_FAILED, 2))
+        self.assertIn('2 tentatives', job.last_error)
+        document = Document.objects.get(pk=document_id)
+        self.assertEqual(document.status, Document.STATUS_FAILED)
+        self.assertEqual(document.processing_error, job.last_error)
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='database')
+    def test_duplicate_upload_reuses_results_and_file(self):
+        """Test de la deduplication par empreinte : pas de re-traitement, fichier partage"""
+        
+        first = Document.objects.get(pk=self.upload().data['id'])
+        self.assertEqual(len(first.content_hash), 64)
+        self.assertTrue(DatabaseBackend().run_next())
+        first.refresh_from_db()
+        
+        response = self.upload(name='copie.docx')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Document.STATUS_DONE)
+        self.assertEqual(ProcessingJob.objects.filter(task='process_document').count(), 1)
+        
+        second = Document.objects.get(pk=response.data['id'])
+        self.assertEqual(second.content_hash, first.content_hash)
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(
+            (second.category, second.keywords, second.content_preview, second.file_type),
+            (first.category, first.keywords, first.content_preview, first.file_type)
+        )
+        
+        # le fichier n'est supprime qu'avec sa derniere reference
+        file_path = first.file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(os.path.exists(file_path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(os.path.exists(file_path))
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='database')
+    def test_duplicate_upload_is_limited_to_the_user(self):
+        """Test que la deduplication ne partage pas les documents d'un autre utilisateur"""
+        
+        first = Document.objects.get(pk=self.upload().data['id'])
+        self.assertTrue(DatabaseBackend().run_next())
+        first.refresh_from_db()
+        
+        # le fichier d'un document n'est pas modifiable (son empreinte ne serait plus a jour)
+        response = self.client.patch(f'/api/documents/{first.pk}/', {'file': 'documents/autres/autre.docx'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Document.objects.get(pk=first.pk).file.name, first.file.name)
+        
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        self.client.force_authenticate(user=other)
+        response = self.upload(name='copie.docx')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Document.STATUS_PENDING)
+        second = Document.objects.get(pk=response.data['id'])
+        self.assertEqual(second.content_hash, first.content_hash)
+        self.assertNotEqual(second.file.name, first.file.name)
+        
+    
+    @skipUnless(os.path.exists('/proc/self/io'), "compteurs d'entrees/sorties Linux requis")
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='database', FILE_UPLOAD_MAX_MEMORY_SIZE=64 * 1024)
+    def test_upload_is_written_to_disk_once(self):
+        """Test que chaque upload n'est ecrit qu'une fois sur disque, en memoire ou via un fichier temporaire"""
+        
+        with override_settings(FILE_UPLOAD_TEMP_DIR=settings.MEDIA_ROOT):
+            for size in (32 * 1024, 2 * 1024 * 1024):
+                test_file = SimpleUploadedFile(f'doc{size}.docx', os.urandom(size), content_type=DOCX_CONTENT_TYPE)
+                before = bytes_written()
+                response = self.client.post(
+                    '/api/documents/upload/', {'title': 'Gros document', 'file': test_file}, format='multipart'
+                )
+                written = bytes_written() - before
+                
+                self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+                self.assertEqual(Document.objects.get(pk=response.data['id']).file.size, size)
+                # une seule ecriture du contenu (plus quelques octets de journalisation eventuels)
+                self.assertGreaterEqual(written, size)
+                self.assertLess(written, size + 16 * 1024)
+        
+    
+    def test_status_of_other_user_document(self):
+        """Test que le statut d'un document d'un autre utilisateur est inaccessible"""
+        
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        document = Document.objects.create(title='Autre', file='documents/autres/a.pdf', file_size=1, user=other)
+        
+        response = self.client.get(f"/api/documents/{document.pk}/status/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='database')
+    def test_batch_upload(self):
+        """Test de l'upload par lot : resultat par fichier, une insertion, statistiques a jour"""
+        
+        files = [
+            SimpleUploadedFile('algo.docx', make_docx("Un algorithme en python"), content_type=DOCX_CONTENT_TYPE),
+            SimpleUploadedFile('notes.txt', b'du texte', content_type='text/plain'),
+            SimpleUploadedFile('copie.docx', make_docx("Un algorithme en python"), content_type=DOCX_CONTENT_TYPE),
+        ]
+        response = self.client.post(
+            '/api/documents/upload/batch/', {'files': files, 'titles': ['Cours', '', '']}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual((response.data['accepted'], response.data['rejected']), (2, 1))
+        
+        algo, notes, copie = response.data['results']
+        self.assertEqual(algo['title'], 'Cours')
+        self.assertIn('file', notes['errors'])
+        self.assertEqual(copie['title'], 'copie')
+        
+        # contenu identique dans le lot : un seul fichier stocke, chaque document traite
+        first, second = Document.objects.get(pk=algo['id']), Document.objects.get(pk=copie['id'])
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(ProcessingJob.objects.count(), 2)
+        self.assertEqual(counter_user_stats(self.user.pk), {'autres': (2, first.file_size * 2)})
+        
+        while DatabaseBackend().run_next():
+            pass
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.category), (Document.STATUS_DONE, 'algo'))
+        self.assertEqual(counter_user_stats(self.user.pk), aggregate_user_stats(self.user.pk))
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='database')
+    def test_batch_upload_archive(self):
+        """Test de l'upload par lot d'une archive zip, contenus deja traites repris sans re-analyse"""
+        
+        existing = Document.objects.get(pk=self.upload(text="Une equation").data['id'])
+        self.assertTrue(DatabaseBackend().run_next())
+        
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('cours/equation.docx', make_docx("Une equation"))
+            archive.writestr('cours/histoire.docx', make_docx("La guerre et la revolution"))
+            archive.writestr('cours/', '')
+            archive.writestr('image.png', b'\x89PNG\r\n')
+        archive = SimpleUploadedFile('lot.zip', buffer.getvalue(), content_type='application/zip')
+        
+        response = self.client.post('/api/documents/upload/batch/', {'archive': archive}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        equation, histoire, image = response.data['results']
+        self.assertEqual(equation['status'], Document.STATUS_DONE)
+        self.assertEqual(Document.objects.get(pk=equation['id']).file.name, existing.file.name)
+        self.assertEqual(histoire['status'], Document.STATUS_PENDING)
+        self.assertIn('errors', image)
+        self.assertEqual(ProcessingJob.objects.filter(task='process_document', status=ProcessingJob.STATUS_PENDING).count(), 1)
+        
+        response = self.client.post('/api/documents/upload/batch/', {}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # membres decompresses dans des fichiers temporaires, un a la fois : memoire bornee
+        size = 4 * 1024 * 1024
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for index in range(4):
+                archive.writestr(f'gros{index}.pdf', b'%PDF-1.4\n' + bytes([index]) * size)
+        archive = SimpleUploadedFile('gros.zip', buffer.getvalue(), content_type='application/zip')
+        tracemalloc.start()
+        try:
+            response = self.client.post('/api/documents/upload/batch/', {'archive': archive}, format='multipart')
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(response.data['accepted'], 4)
+        self.assertLess(peak, size // 2)
+        self.assertEqual(Document.objects.get(pk=response.data['results'][3]['id']).file.size, size + 9)
+
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='immediate', DOCUMENT_UPLOAD_CHUNK_MAX_SIZE=16 * 1024)
+    def test_chunked_upload(self):
+        """Test de l'upload en morceaux : reprise a l'offset, verification de l'empreinte, traitement"""
+        
+        content = make_docx("Un algorithme de programmation en python\n" + random_text(5000))
+        content_hash = hashlib.sha256(content).hexdigest()
+        response = self.client.post('/api/documents/upload/sessions/', {
+            'title': 'Gros cours', 'file_name': 'gros.docx', 'file_size': len(content), 'content_hash': content_hash,
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = f"/api/documents/upload/sessions/{response.data['id']}/"
+        
+        def put(offset, data):
+            return self.client.put(f'{url}?offset={offset}', data, content_type='application/octet-stream')
+        
+        self.assertEqual(put(0, content[:10000]).data['offset'], 10000)
+        # morceau renvoye a un mauvais offset : le serveur indique ou reprendre
+        response = put(5000, content[5000:15000])
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.get(url).data['offset'], 10000)
+        self.assertEqual(put(10000, content[10000:40000]).status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        
+        # upload incomplet
+        self.assertEqual(self.client.post(f'{url}complete/').status_code, status.HTTP_400_BAD_REQUEST)
+        for offset in range(10000, len(content), 16 * 1024):
+            put(offset, content[offset:offset + 16 * 1024])
+        
+        response = self.client.post(f'{url}complete/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        document = Document.objects.get(pk=response.data['id'])
+        self.assertEqual((document.status, document.category), (Document.STATUS_DONE, 'algo'))
+        self.assertEqual((document.file_size, document.content_hash), (len(content), content_hash))
+        with document.file.open('rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertFalse(os.listdir(os.path.join(settings.MEDIA_ROOT, 'uploads')))
+        self.assertEqual(self.client.post(f'{url}complete/').status_code, status.HTTP_404_NOT_FOUND)
+        
+    
+    def test_chunked_upload_hash_mismatch(self):
+        """Test du rejet d'un fichier assemble dont l'empreinte ne correspond pas"""
+        
+        content = make_docx("Une equation")
+        response = self.client.post('/api/documents/upload/sessions/', {
+            'title': 'Cours', 'file_name': 'cours.docx', 'file_size': len(content), 'content_hash': '0' * 64,
+        })
+        url = f"/api/documents/upload/sessions/{response.data['id']}/"
+        self.client.put(f'{url}?offset=0', content, content_type='application/octet-stream')
+        
+        response = self.client.post(f'{url}complete/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['offset'], 0)
+        self.assertEqual(self.client.get(url).data['offset'], 0)
+        self.assertFalse(Document.objects.exists())
+        
+        response = self.client.post('/api/documents/upload/sessions/', {
+            'title': 'Script', 'file_name': '../script.sh', 'file_size': 10,
+        })
+        self.assertIn('file_name', response.data)
+
+
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='immediate')
+    def test_full_text_search(self):
+        """Test de la recherche plein texte : texte complet indexe, classement et extraits surlignes"""
+        
+        text = "Les algorithmes de parcours de graphes\n" + random_text(3000) + "\nconclusion sur les arbres couvrants"
+        graphes = Document.objects.get(pk=self.upload(name='graphes.docx', text=text).data['id'])
+        self.upload(name='tri.docx', text="Un algorithme de tri rapide")
+        guerre = Document.objects.get(pk=self.upload(name='guerre.docx', text="La guerre de cent ans").data['id'])
+        
+        # le texte est conserve en entier, au-dela de l'apercu de 500 caracteres
+        self.assertIn('arbres couvrants', graphes.content.text)
+        
+        response = self.client.get('/api/documents/', {'q': 'algorithme'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        results = response.data['results']
+        self.assertGreaterEqual(results[0]['rank'], results[1]['rank'])
+        self.assertIn('<mark>', results[0]['headline'])
+        
+        response = self.client.get('/api/documents/', {'q': '"arbres couvrants"'})
+        self.assertEqual([result['id'] for result in response.data['results']], [graphes.pk])
+        
+        response = self.client.get('/api/documents/', {'q': 'algorithme', 'category': 'histoire'})
+        self.assertEqual(response.data['count'], 0)
+        
+        # une copie deja classee reprend le texte indexe
+        copie = Document.objects.get(pk=self.upload(name='copie.docx', text="La guerre de cent ans").data['id'])
+        self.assertEqual(copie.content.text, guerre.content.text)
+
+
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='immediate')
+    def test_search_headline_is_escaped(self):
+        """Test des extraits surlignes : le HTML du document est echappe, seules les balises <mark> restent"""
+
+        # ts_headline retire les balises completes mais garde celles qu'il ne reconnait pas
+        self.upload(name='piege.docx', text='Un algorithme & <script>alert("xss")</script> <svg/onload=alert(1)>')
+
+        response = self.client.get('/api/documents/', {'q': 'algorithme'})
+        headline = response.data['results'][0]['headline']
+        self.assertNotIn('<script>', headline)
+        self.assertNotIn('<svg', headline)
+        self.assertIn('&lt;svg/onload', headline)
+        self.assertIn('&amp;', headline)
+        self.assertIn('<mark>algorithme</mark>', headline)
+        self.assertEqual(headline.replace('<mark>', '').replace('</mark>', '').count('<'), 0)
+
+
+
+class DocumentZipExportTests(APITestCase):
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username    = 'testuser',
+            email       = 'test@example.com',
+            password    = 'testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root)
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        
+    
+    def create_documents(self, count, size=256 * 1024, extension='.pdf'):
+        directory = os.path.join(self.media_root, 'documents', 'math')
+        os.makedirs(directory, exist_ok=True)
+        for index in range(Document.objects.count(), Document.objects.count() + count):
+            name = f'documents/math/doc{index}{extension}'
+            with open(os.path.join(self.media_root, name), 'wb') as f:
+                f.write(os.urandom(size))
+            Document.objects.create(title=f'Doc {index}', file=name, category='math', file_size=size, user=self.user)
+            
+    
+    def download_peak_memory(self):
+        response = self.client.get('/api/documents/download-zip/')
+        tracemalloc.start()
+        try:
+            total = sum(len(chunk) for chunk in response.streaming_content)
+            return total, tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            
+    
+    def test_zip_content(self):
+        """Test du contenu de l'archive : chemins par categorie, PDF stockes sans recompression"""
+        
+        self.create_documents(2, size=1024)
+        self.create_documents(1, size=1024, extension='.txt')
+        
+        response = self.client.get('/api/documents/download-zip/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertIsNone(archive.testzip())
+            infos = {info.filename: info for info in archive.infolist()}
+        self.assertEqual(sorted(infos), ['math/doc0.pdf', 'math/doc1.pdf', 'math/doc2.txt'])
+        self.assertEqual(infos['math/doc0.pdf'].compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(infos['math/doc2.txt'].compress_type, zipfile.ZIP_DEFLATED)
+        
+    
+    def test_zip_memory_is_bounded(self):
+        """Test que la memoire de l'export ne grandit pas avec le nombre de documents"""
+        
+        self.create_documents(4)
+        small_total, small_peak = self.download_peak_memory()
+        
+        self.create_documents(28)
+        large_total, large_peak = self.download_peak_memory()
+        
+        self.assertGreater(large_total, 8 * 1024 * 1024)
+        # quelques blocs de lecture, pas une copie de l'archive
+        self.assertLess(large_peak, 2 * 1024 * 1024)
+        self.assertLess(large_peak, small_peak * 2)
+        
+    
+    @override_settings(DOCUMENT_PROCESSING_BACKEND='immediate')
+    def test_incremental_export(self):
+        """Test de l'archive pre-construite : ETag, intervalles et mise a jour incrementale"""
+        
+        self.create_documents(3, size=1024)
+        response = self.client.post('/api/documents/export/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], DocumentExport.STATUS_READY)
+        self.assertTrue(response.data['up_to_date'])
+        
+        url = '/api/documents/export/download/'
+        response = self.client.get(url)
+        content, etag = b''.join(response.streaming_content), response['ETag']
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, HTTP_RANGE='bytes=100-199', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(content)}')
+        self.assertEqual(b''.join(response.streaming_content), content[100:200])
+        self.assertEqual(b''.join(self.client.get(url, HTTP_RANGE='bytes=-10').streaming_content), content[-10:])
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={len(content)}-').status_code, 416)
+        # archive reconstruite depuis : l'intervalle ne vaut plus, archive entiere
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"autre"').status_code, 200)
+        # l'archive a jour est servie par le telechargement habituel
+        self.assertEqual(self.client.get('/api/documents/download-zip/')['ETag'], etag)
+        
+        first, second, third = Document.objects.order_by('pk')
+        first.category = 'algo'
+        first.save()
+        second.delete()
+        name = 'documents/math/nouveau.pdf'
+        with open(os.path.join(self.media_root, name), 'wb') as f:
+            f.write(b'nouveau')
+        Document.objects.create(title='Nouveau', file=name, category='math', file_size=7, user=self.user)
+        self.assertFalse(self.client.get('/api/documents/export/').data['up_to_date'])
+        
+        self.assertEqual(export.build_export(self.user.pk), {'reused': 1, 'written': 2, 'removed': 1})
+        self.assertIsNone(export.build_export(self.user.pk))
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], etag)
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(sorted(archive.namelist()), ['algo/doc0.pdf', 'math/doc2.pdf', 'math/nouveau.pdf'])
+            with open(third.file.path, 'rb') as f:
+                self.assertEqual(archive.read('math/doc2.pdf'), f.read())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'exports')), [os.path.basename(
+            DocumentExport.objects.get(user=self.user).archive_path
+        )])
+
+
+class DocumentStatsTests(APITestCase):
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username    = 'testuser',
+            email       = 'test@example.com',
+            password    = 'testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        
+    
+    def create_document(self, category, file_size, keywords=()):
+        return Document.objects.create(
+            title='Doc', file=f'documents/{category}/doc.pdf', category=category,
+            file_size=file_size, keywords=list(keywords), user=self.user
+        )
+        
+    
+    def test_stats_counters_follow_changes(self):
+        """Test des compteurs materialises : creation, changement de categorie, suppression"""
+        
+        self.create_document('math', 100)
+        self.create_document('math', 50)
+        moved = self.create_document('autres', 10)
+        removed = self.create_document('histoire', 7)
+        
+        moved.category = 'algo'
+        moved.save()
+        removed.delete()
+        
+        taxonomy.get_taxonomy()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/documents/stats/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_documents'], 3)
+        self.assertEqual(response.data['total_size'], 160)
+        self.assertEqual(response.data['categories'], {'math': 2, 'algo': 1, 'histoire': 0, 'autres': 0})
+        self.assertEqual(response.data['sizes'], {'math': 150, 'algo': 10, 'histoire': 0, 'autres': 0})
+        
+        self.assertEqual(counter_user_stats(self.user.pk), aggregate_user_stats(self.user.pk))
+        
+    
+    @override_settings(DOCUMENT_STATS_USE_COUNTERS=False)
+    def test_stats_single_aggregation_query(self):
+        """Test des statistiques calculees par une seule agregation"""
+        
+        self.create_document('math', 100)
+        self.create_document('histoire', 20)
+        self.assertFalse(DocumentCategoryStat.objects.exists())
+        
+        taxonomy.get_taxonomy()
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/documents/stats/')
+        self.assertEqual(response.data['total_documents'], 2)
+        self.assertEqual(response.data['categories']['histoire'], 1)
+        self.assertEqual(response.data['sizes']['math'], 100)
+        
+        rebuild_user_stats([self.user.pk])
+        self.assertEqual(counter_user_stats(self.user.pk), {'math': (1, 100), 'histoire': (1, 20)})
+        
+    
+    def test_keyword_filter_and_facets(self):
+        """Test du filtre par mot-cle (accents et casse ignores) et des comptes par mot-cle"""
+        
+        first = self.create_document('math', 10, ['équation', 'calcul'])
+        second = self.create_document('math', 10, ['équation'])
+        self.create_document('algo', 10, ['algorithme', 'calcul'])
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        Document.objects.create(title='Doc', file='documents/math/doc.pdf', file_size=1, keywords=['équation'], user=other)
+        
+        response = self.client.get('/api/documents/', {'keyword': 'EQUATION'})
+        self.assertEqual({doc['id'] for doc in response.data['results']}, {first.pk, second.pk})
+        response = self.client.get('/api/documents/', {'keyword': ['equation', 'calcul']})
+        self.assertEqual([doc['id'] for doc in response.data['results']], [first.pk])
+        
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/documents/keywords/')
+        self.assertEqual(response.data['keywords'], [
+            {'keyword': 'calcul', 'count': 2}, {'keyword': 'équation', 'count': 2}, {'keyword': 'algorithme', 'count': 1},
+        ])
+        self.assertEqual(keyword_facets(self.user.pk, category='algo'), [
+            {'keyword': 'algorithme', 'count': 1}, {'keyword': 'calcul', 'count': 1},
+        ])
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'responses-tests'}},
+    DOCUMENT_RESPONSE_CACHE={'ENABLED': True, 'ALIAS': 'default', 'TIMEOUT': 300},
+)
+class DocumentResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        response_cache.get_cache().clear()
+        self.user = User.objects.create_user(
+            username    = 'testuser',
+            email       = 'test@example.com',
+            password    = 'testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.document = Document.objects.create(
+            title='Doc', file='documents/math/doc.pdf', category='math', file_size=100, user=self.user
+        )
+        taxonomy.get_taxonomy()
+
+
+    def test_cached_responses_and_etag(self):
+        """Test des reponses servies depuis le cache sans requete SQL et des 304 sur If-None-Match"""
+
+        for url in ('/api/documents/', f'/api/documents/{self.document.pk}/', '/api/documents/stats/'):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, status.HTTP_200_OK)
+            self.assertIn('ETag', first)
+            self.assertIn('private', first['Cache-Control'])
+
+            with self.assertNumQueries(0):
+                cached = self.client.get(url)
+            self.assertEqual(cached.data, first.data)
+            self.assertEqual(cached['ETag'], first['ETag'])
+
+            with self.assertNumQueries(0):
+                not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # parametres differents : reponse differente
+        response = self.client.get('/api/documents/', {'category': 'algo'})
+        self.assertEqual(response.data['count'], 0)
+
+
+    def test_no_stale_response_after_write(self):
+        """Test qu'aucune reponse anterieure a une ecriture n'est servie : API, signaux et operations en masse"""
+
+        detail_url = f'/api/documents/{self.document.pk}/'
+        list_etag = self.client.get('/api/documents/')['ETag']
+        self.client.get(detail_url)
+        self.client.get('/api/documents/stats/')
+
+        # modification par l'API
+        self.assertEqual(self.client.patch(detail_url, {'title': 'Nouveau titre'}).status_code, status.HTTP_200_OK)
+        response = self.client.get('/api/documents/', HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['title'], 'Nouveau titre')
+        self.assertEqual(self.client.get(detail_url).data['title'], 'Nouveau titre')
+
+        # modification hors requete (worker) : signaux de Document
+        self.document.refresh_from_db()
+        self.document.category = 'algo'
+        self.document.save()
+        self.assertEqual(self.client.get(detail_url).data['category'], 'algo')
+        self.assertEqual(self.client.get('/api/documents/stats/').data['categories']['algo'], 1)
+
+        # insertion en masse (bulk_create, sans signaux)
+        upload = SimpleUploadedFile('new.pdf', b'%PDF-1.4 contenu', content_type='application/pdf')
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            DocumentProcessingService.create_documents(self.user, [('Nouveau', upload, 'a' * 64)])
+            self.addCleanup(shutil.rmtree, settings.MEDIA_ROOT, True)
+        self.assertEqual(self.client.get('/api/documents/').data['count'], 2)
+        self.assertEqual(self.client.get('/api/documents/stats/').data['total_documents'], 2)
+
+        # compteurs recalcules
+        DocumentCategoryStat.objects.filter(user=self.user).update(document_count=F('document_count') + 5)
+        rebuild_user_stats([self.user.pk])
+        self.assertEqual(self.client.get('/api/documents/stats/').data['total_documents'], 2)
+
+        # suppression
+        self.assertEqual(self.client.delete(detail_url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/documents/').data['count'], 1)
+        self.assertEqual(self.client.get('/api/documents/stats/').data['categories']['algo'], 0)
+
+
+    def test_responses_isolated_per_user(self):
+        """Test que les ecritures d'un utilisateur n'invalident pas le cache des autres"""
+
+        etag = self.client.get('/api/documents/')['ETag']
+        other = User.objects.create_user(username='other', email='other@example.com', password='testpass123')
+        Document.objects.create(title='Autre', file='documents/math/autre.pdf', file_size=1, user=other)
+
+        response = self.client.get('/api/documents/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.force_authenticate(user=other)
+        response = self.client.get('/api/documents/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([document['title'] for document in response.data['results']], ['Autre'])
+
+
+class ExtractionCacheTests(TestCase):
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        
+    
+    def test_extraction_uses_cache(self):
+        """Test que le texte extrait est repris du cache pour un contenu deja analyse"""
+        
+        path = os.path.join(self.location, 'cours.docx')
+        with open(path, 'wb') as f:
+            f.write(make_docx("Un algorithme en python"))
+        
+        with override_settings(DOCUMENT_EXTRACTION_CACHE=extraction_cache_settings(self.location)):
+            before = extraction_cache.stats.as_dict()
+            with mock.patch('apps.documents.utils.extract_text_from_docx', return_value="texte extrait") as extractor:
+                self.assertEqual(extract_text_from_document(path, 'docx', 'a' * 64), "texte extrait")
+                self.assertEqual(extract_text_from_document(path, 'docx', 'a' * 64), "texte extrait")
+                # sans empreinte, pas de cache
+                extract_text_from_document(path, 'docx')
+            self.assertEqual(extractor.call_count, 2)
+            
+            after = extraction_cache.stats.as_dict()
+            self.assertEqual(after['hits'] - before['hits'], 1)
+            self.assertEqual(after['misses'] - before['misses'], 1)
+            
+    
+    def test_disk_cache_lru_eviction(self):
+        """Test de l'eviction des entrees les moins recemment lues quand la taille maximale est atteinte"""
+        
+        cache = extraction_cache.DiskExtractionCache(self.location, max_size=2500)
+        cache.set('aa-first', 'x' * 1000)
+        cache.set('bb-second', 'y' * 1000)
+        
+        # rendre la premiere entree plus recente que la seconde
+        os.utime(cache._path('bb-second'), (1, 1))
+        self.assertEqual(cache.get('aa-first'), 'x' * 1000)
+        
+        cache.set('cc-third', 'z' * 1000)
+        self.assertIsNone(cache.get('bb-second'))
+        self.assertEqual(cache.get('aa-first'), 'x' * 1000)
+        self.assertEqual(cache.get('cc-third'), 'z' * 1000)
+        
+    
+    def test_disk_cache_overwrite_size(self):
+        """Test qu'une entree reecrite ne compte qu'une fois dans la taille du cache"""
+        
+        cache = extraction_cache.DiskExtractionCache(self.location, max_size=2500)
+        cache.set('aa-first', 'x' * 1000)
+        for length in (1000, 1200, 800):
+            cache.set('bb-second', 'y' * length)
+        self.assertEqual(cache._size, 1800)
+        self.assertEqual(cache.get('aa-first'), 'x' * 1000)
+
+
+class DocumentExtractionTests(TestCase):
+    
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+        
+    
+    def write_pdf(self, pages):
+        path = os.path.join(self.location, 'document.pdf')
+        with open(path, 'wb') as f:
+            f.write(make_pdf(pages))
+        return path
+        
+    
+    def test_pdf_pages_are_streamed(self):
+        """Test que le PDF est lu page par page et que le texte complet reste identique"""
+        
+        path = self.write_pdf(["Premiere page", "Deuxieme page", "Troisieme page"])
+        pages = list(iter_text_from_document(path, 'pdf'))
+        self.assertEqual(pages, ["Premiere page", "Deuxieme page", "Troisieme page"])
+        self.assertEqual(extract_text_from_pdf(path), "Premiere page\nDeuxieme page\nTroisieme page")
+        
+    
+    def test_stream_stops_on_decisive_margin(self):
+        """Test de l'arret anticipe quand une categorie est largement en tete"""
+        
+        pages = iter(["python algorithme " * 20] + ["histoire " * 50] * 10)
+        category, keywords, text, complete = classify_document_stream(pages, decisive_margin=25)
+        self.assertEqual(category, 'algo')
+        self.assertIn('python', keywords)
+        self.assertFalse(complete)
+        # les pages suivantes n'ont pas ete lues
+        self.assertEqual(len(list(pages)), 10)
+        
+    
+    def test_stream_budget(self):
+        """Test des limites en pages et en caracteres"""
+        
+        pages = [random_text(200, seed=i) for i in range(10)]
+        
+        _, _, text, complete = classify_document_stream(pages, max_chunks=3, decisive_margin=0)
+        self.assertFalse(complete)
+        self.assertEqual(text, '\n'.join(pages[:3]).strip())
+        
+        _, _, text, complete = classify_document_stream(pages, max_chars=500, decisive_margin=0)
+        self.assertFalse(complete)
+        self.assertEqual(text, pages[0][:500].strip())
+        
+        # morceau se terminant exactement sur le budget : le suivant n'est pas lu
+        _, keywords, text, complete = classify_document_stream(
+            ['a' * 10, 'algorithme ' * 100], max_chars=10, decisive_margin=0,
+        )
+        self.assertFalse(complete)
+        self.assertEqual(text, 'a' * 10)
+        self.assertEqual(keywords, [])
+        
+        _, _, text, complete = classify_document_stream(pages, max_chunks=0, max_chars=0, decisive_margin=0)
+        self.assertTrue(complete)
+        self.assertEqual(text, '\n'.join(pages).strip())
+        
+    
+    def test_read_document_text_budget(self):
+        """Test de la lecture limitee : une page se terminant sur le budget arrete la lecture"""
+        
+        path = self.write_pdf(['a' * 10, 'b' * 1000])
+        self.assertEqual(read_document_text(path, 'pdf', max_chars=10), ('a' * 10, False))
+        self.assertEqual(read_document_text(path, 'pdf', max_chars=15), ('a' * 10 + '\n' + 'b' * 4, False))
+        self.assertEqual(read_document_text(path, 'pdf'), ('a' * 10 + '\n' + 'b' * 1000, True))
+
+
+class FileTypeTests(TestCase):
+    
+    def test_detect_from_header(self):
+        """Test de la detection des types geres a partir des premiers octets"""
+        
+        self.assertEqual(filetypes.detect_file_type(make_pdf(["Une page"])[:filetypes.SNIFF_SIZE]), 'pdf')
+        self.assertEqual(filetypes.detect_file_type(make_docx("Un paragraphe")[:filetypes.SNIFF_SIZE]), 'docx')
+        self.assertEqual(filetypes.detect_file_type(make_pptx(["Une diapositive"])[:filetypes.SNIFF_SIZE]), 'pptx')
+        self.assertEqual(filetypes.detect_file_type(b'Simple texte', 'notes.txt'), 'unknown')
+        
+    
+    def test_ooxml_without_content_types(self):
+        """Test du repli sur le nom des membres de l'archive"""
+        
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('ppt/presentation.xml', '<p:presentation/>')
+        self.assertEqual(filetypes.sniff_header(buffer.getvalue()), 'pptx')
+        
+    
+    def test_get_file_type_from_path(self):
+        """Test de get_file_type sur un fichier et reutilisation du handle libmagic"""
+        
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'sans-extension')
+            with open(path, 'wb') as f:
+                f.write(make_docx("Un paragraphe"))
+            self.assertEqual(filetypes.get_file_type(path), 'docx')
+            self.assertEqual(filetypes.get_file_type(os.path.join(directory, 'absent.pdf')), 'unknown')
+        
+        if filetypes.magic is not None:
+            self.assertIs(filetypes.get_magic(), filetypes.get_magic())
+
+
+class ExtractionPoolTests(TestCase):
+    
+    def setUp(self):
+        self.pool = ExtractionPool(workers=1, timeout=1, max_memory=512 * 1024 * 1024, max_jobs_per_worker=2)
+        self.addCleanup(self.pool.close)
+        
+    
+    def test_timeout_kills_worker(self):
+        """Test qu'un fichier trop long a analyser est interrompu sans bloquer le pool"""
+        
+        start = time.perf_counter()
+        with self.assertRaises(ExtractionTimeout):
+            self.pool.run(time.sleep, 30)
+        self.assertLess(time.perf_counter() - start, 10)
+        # un nouveau processus prend le relais
+        self.assertEqual(self.pool.run(abs, -3), 3)
+        
+    
+    def test_memory_limit_and_recycling(self):
+        """Test de la limite memoire et du recyclage des processus apres N fichiers"""
+        
+        with self.assertRaises(ExtractionError):
+            self.pool.run(bytearray, 1024 * 1024 * 1024)
+        
+        pids = [self.pool.run(os.getpid) for _ in range(4)]
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+        self.assertNotIn(os.getpid(), pids)
+        
+    
+    def test_processing_falls_back_on_timeout(self):
+        """Test du repli sur la categorie par defaut quand l'extraction depasse le delai"""
+        
+        user = User.objects.create_user(username='lent', email='lent@example.com', password='testpass123')
+        document = Document.objects.create(
+            user=user, title='Lent', file='documents/lent.pdf', file_size=10,
+            content_hash='b' * 64, status=Document.STATUS_PENDING,
+        )
+        with mock.patch('apps.documents.services.get_file_type', return_value='pdf'), \
+             mock.patch('apps.documents.services.extract_document', side_effect=ExtractionTimeout("Extraction interrompue apres 60s")):
+            DocumentProcessingService.process_document(document)
+        
+        document.refresh_from_db()
+        self.assertEqual(document.category, 'autres')
+        self.assertEqual(document.status, Document.STATUS_FAILED)
+        self.assertIn('60s', document.processing_error)
+
+
+class ClassifierEngineTests(TestCase):
+    
+    VOCABULARIES = {
+        'math': ['intégrale', 'dérivée', 'matrice', 'vecteur', 'polynôme', 'théorème'],
+        'algo': ['compilateur', 'récursion', 'pointeur', 'boucle', 'variable', 'fonction'],
+        'histoire': ['empereur', 'royaume', 'bataille', 'dynastie', 'traité', 'empire'],
+    }
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', email='test@example.com', password='testpass123')
+        self.model_dir = os.path.join(tempfile.mkdtemp(), 'model')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.model_dir), ignore_errors=True)
+        for category, vocabulary in self.VOCABULARIES.items():
+            for index in range(30):
+                document = Document.objects.create(
+                    title='Doc', file=f'documents/{category}/doc{index}.pdf', category=category,
+                    file_size=10, status=Document.STATUS_DONE, user=self.user,
+                )
+                DocumentContent.objects.create(
+                    document=document, text=random_text(200, vocabulary, keyword_ratio=0.1, seed=index),
+                )
+        
+    
+    def test_train_and_classify_with_tfidf(self):
+        """Test de l'entrainement du modele TF-IDF, de son chargement projete en memoire et du classement"""
+        
+        out = io.StringIO()
+        call_command('train_classifier', output=self.model_dir, stdout=out)
+        self.assertIn('Precision tfidf', out.getvalue())
+        
+        text = "Le calcul d'une intégrale et la dérivée d'un polynôme"
+        self.assertEqual(classify_document(text)[0], 'math')
+        text = "La bataille qui mit fin au royaume et à la dynastie"
+        self.assertEqual(classify_document(text), ('autres', []))
+        
+        with override_settings(DOCUMENT_CLASSIFIER={'BACKEND': 'tfidf', 'MODEL_DIR': self.model_dir}):
+            classifier = get_classifier()
+            self.assertIsInstance(classifier.coef, np.memmap)
+            self.assertEqual(classify_document(text), ('histoire', []))
+            self.assertEqual(
+                classifier.predict(["Une boucle récursive dans le compilateur", "", "rien de connu ici"]),
+                ['algo', 'autres', 'autres'],
+            )
+            result, unknown = classify_documents([text, "rien de connu ici"])
+            self.assertEqual(result['category'], 'histoire')
+            self.assertAlmostEqual(sum(result['scores'].values()), 1.0, places=5)
+            self.assertEqual(result['confidence'], max(result['scores'].values()))
+            self.assertEqual((unknown['category'], unknown['confidence']), ('autres', 0.0))
+            
+            path = os.path.join(os.path.dirname(self.model_dir), 'histoire.docx')
+            with open(path, 'wb') as f:
+                f.write(make_docx(text))
+            with override_settings(DOCUMENT_EXTRACTION_WORKERS=0, DOCUMENT_EXTRACTION_CACHE={'BACKEND': 'none'}):
+                self.assertEqual(DocumentProcessingService.analyse_file(path)['category'], 'histoire')
+        
+    
+    def test_tfidf_without_model_falls_back_to_keywords(self):
+        """Test du repli sur les mots-cles tant qu'aucun modele n'est entraine"""
+        
+        with override_settings(DOCUMENT_CLASSIFIER={'BACKEND': 'tfidf', 'MODEL_DIR': self.model_dir}):
+            with self.assertLogs('apps.documents.tfidf', 'WARNING'):
+                classifier = get_classifier()
+            self.assertEqual(classifier.name, 'keyword')
+            self.assertEqual(classify_document("une équation"), ('math', ['équation']))
+
+
+class ReclassifyDocumentsCommandTests(TestCase):
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username    = 'testuser',
+            email       = 'test@example.com',
+            password    = 'testpass123'
+        )
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        media_settings = override_settings(MEDIA_ROOT=self.media_root, DOCUMENT_EXTRACTION_CACHE={'BACKEND': 'none'})
+        media_settings.enable()
+        self.addCleanup(media_settings.disable)
+        
+        self.algo = self.create_document('algo.docx', "Un algorithme de programmation en python", 'histoire')
+        self.math = self.create_document('math.docx', "Une equation et le calcul", 'math')
+        
+    
+    def create_document(self, name, text, category):
+        os.makedirs(os.path.join(self.media_root, 'documents', category), exist_ok=True)
+        file_name = f'documents/{category}/{name}'
+        with open(os.path.join(self.media_root, file_name), 'wb') as f:
+            f.write(make_docx(text))
+        return Document.objects.create(
+            title=name, file=file_name, category=category, file_size=10,
+            status=Document.STATUS_DONE, user=self.user
+        )
+        
+    
+    def reclassify(self, **options):
+        out = io.StringIO()
+        call_command('reclassify_documents', workers=1, stdout=out, stderr=io.StringIO(), **options)
+        return out.getvalue()
+        
+    
+    def test_reclassify_moves_changed_documents(self):
+        """Test de la reclassification : categorie, mots-cles, chemin du fichier et compteurs"""
+        
+        output = self.reclassify(batch_size=1)
+        self.assertIn('docs/s', output)
+        
+        self.algo.refresh_from_db()
+        self.assertEqual(self.algo.category, 'algo')
+        self.assertEqual(self.algo.keywords, ['algorithme', 'programmation', 'python'])
+        self.assertEqual(self.algo.file.name, 'documents/algo/algo.docx')
+        self.assertTrue(os.path.exists(self.algo.file.path))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'documents/histoire/algo.docx')))
+        
+        self.math.refresh_from_db()
+        self.assertEqual(self.math.file.name, 'documents/math/math.docx')
+        self.assertEqual(counter_user_stats(self.user.pk), aggregate_user_stats(self.user.pk))
+        
+    
+    def test_reclassify_restores_files_when_write_fails(self):
+        """Test de la reclassification : fichiers remis en place si l'ecriture en base echoue"""
+
+        with mock.patch.object(Document.objects, 'bulk_update', side_effect=RuntimeError('base indisponible')):
+            with self.assertRaises(RuntimeError):
+                self.reclassify()
+
+        self.algo.refresh_from_db()
+        self.assertEqual(self.algo.category, 'histoire')
+        self.assertEqual(self.algo.file.name, 'documents/histoire/algo.docx')
+        self.assertTrue(os.path.exists(self.algo.file.path))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'documents/algo/algo.docx')))
+
+
+    def test_reclassify_dry_run_and_checkpoint(self):
+        """Test du mode simulation et de la reprise depuis un point de controle"""
+        
+        output = self.reclassify(dry_run=True)
+        self.assertIn('histoire -> algo', output)
+        self.algo.refresh_from_db()
+        self.assertEqual(self.algo.category, 'histoire')
+        
+        # le premier document est deja traite selon le point de controle
+        checkpoint = os.path.join(self.media_root, 'checkpoint')
+        with open(checkpoint, 'w') as f:
+            f.write(str(self.algo.pk))
+        self.math.category = 'autres'
+        self.math.save()
+        
+        self.reclassify(checkpoint=checkpoint)
+        self.algo.refresh_from_db()
+        self.math.refresh_from_db()
+        self.assertEqual(self.algo.category, 'histoire')
+        self.assertEqual(self.math.category, 'math')
+        self.assertFalse(os.path.exists(checkpoint))
+        
+    
+    def test_reclassify_from_index(self):
+        """Test de la reclassification a partir du texte indexe, sans relire les fichiers indexes"""
+        
+        DocumentContent.objects.create(document=self.algo, text="La guerre et la revolution du siecle")
+        os.remove(self.algo.file.path)
+        self.math.category = 'autres'
+        self.math.save()
+        
+        self.reclassify(from_index=True)
+        self.algo.refresh_from_db()
+        self.math.refresh_from_db()
+        self.assertEqual((self.algo.category, self.algo.keywords), ('histoire', ['guerre', 'révolution', 'siècle']))
+        self.assertEqual(self.math.category, 'math')
+        self.assertEqual(counter_user_stats(self.user.pk), aggregate_user_stats(self.user.pk))
@@ -0,0 +1,236 @@
+"""
+
+Classifieur TF-IDF + Bayes naif multinomial (backend 'tfidf' de DOCUMENT_CLASSIFIER).
+
+Le modele est entraine sur les documents deja classes (`python manage.py train_classifier`)
+et enregistre dans un dossier :
+    model.json       categories, parametres et date d'entrainement
+    vocabulary.json  mot normalise -> colonne de la matrice
+    idf.npy          poids IDF de chaque mot (float32)
+    coef.npy         log-probabilite de chaque mot par categorie (mots x categories, float32)
+    intercept.npy    log-probabilite a priori de chaque categorie
+
+Les tableaux sont ouverts en memoire partagee (np.load, mmap_mode='r') : le chargement
+ne copie rien et les processus d'une meme machine partagent les pages du modele. Un lot
+de textes est vectorise en une matrice creuse puis score en un seul produit matriciel.
+
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+from django.utils import timezone
+import numpy as np
+from scipy import sparse
+from .classifier import best_categories, fold_text
+
+logger = logging.getLogger(__name__)
+
+MODEL_FILE = 'model.json'
+VOCABULARY_FILE = 'vocabulary.json'
+
+# mots d'au moins deux lettres (chiffres et ponctuation ignores)
+TOKEN_PATTERN = re.compile(r'[^\W\d_]{2,}')
+
+# textes vectorises ensemble pendant l'entrainement
+TRAINING_BATCH_SIZE = 1000
+
+
+def tokenize(text):
+    """Mots du texte, en minuscules et sans accents"""
+
+    return TOKEN_PATTERN.findall(fold_text(text or ''))
+
+
+def vectorize(texts, vocabulary, idf):
+    """Matrice creuse TF-IDF (documents x mots) : tf sous-lineaire, normalisee par document"""
+
+    # colonnes de tous les mots du lot (-1 : mot inconnu), puis comptage par NumPy
+    lookup = vocabulary.get
+    columns, lengths = [], []
+    for text in texts:
+        words = tokenize(text)
+        columns.extend([lookup(word, -1) for word in words])
+        lengths.append(len(words))
+    columns = np.asarray(columns, dtype=np.int64)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    known = columns >= 0
+    matrix = sparse.csr_matrix(
+        (np.ones(int(known.sum()), dtype=np.float32), (rows[known], columns[known])),
+        shape=(len(lengths), len(idf)),
+    )
+    matrix.sum_duplicates()
+
+    values = matrix.data
+    np.log(values, out=values)
+    values += 1
+    values *= idf[matrix.indices]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    values /= np.repeat(norms, np.diff(matrix.indptr)).astype(np.float32)
+    return matrix
+
+
+class TfidfClassifier:
+    """Backend 'tfidf' : categorie la plus probable selon le modele entraine"""
+
+    name = 'tfidf'
+    # la categorie depend du texte lu en entier (dans la limite du budget de lecture)
+    keyword_based = False
+
+    def __init__(self, categories, vocabulary, idf, coef, intercept, info=None):
+        self.categories = list(categories)
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.coef = coef
+        self.intercept = intercept
+        self.info = info or {}
+
+    def scores(self, texts):
+        """Probabilite de chaque categorie (textes x categories), nulle pour un texte sans mot connu"""
+
+        texts = list(texts)
+        matrix = vectorize(texts, self.vocabulary, self.idf)
+        logits = np.asarray(matrix @ self.coef) + self.intercept
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        probabilities[matrix.getnnz(axis=1) == 0] = 0
+        return probabilities
+
+    def predict(self, texts):
+        """Categorie de chaque texte (categorie par defaut si aucun mot n'est connu du modele)"""
+
+        return best_categories(self.categories, self.scores(texts))
+
+    def save(self, path):
+        """Enregistre le modele dans `path` (remplace d'un bloc un modele existant)"""
+
+        path = os.path.abspath(path)
+        staging = f'{path}.tmp-{os.getpid()}'
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        np.save(os.path.join(staging, 'idf.npy'), np.asarray(self.idf, dtype=np.float32))
+        np.save(os.path.join(staging, 'coef.npy'), np.asarray(self.coef, dtype=np.float32))
+        np.save(os.path.join(staging, 'intercept.npy'), np.asarray(self.intercept, dtype=np.float32))
+        with open(os.path.join(staging, VOCABULARY_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.vocabulary, f, ensure_ascii=False)
+        with open(os.path.join(staging, MODEL_FILE), 'w', encoding='utf-8') as f:
+            json.dump({**self.info, 'categories': self.categories}, f, ensure_ascii=False, indent=2)
+
+        # les processus qui ont deja ouvert l'ancien modele gardent leurs fichiers projetes
+        previous = f'{path}.old-{os.getpid()}'
+        if os.path.exists(path):
+            os.rename(path, previous)
+        os.rename(staging, path)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path):
+        """Ouvre un modele enregistre, tableaux projetes en memoire"""
+
+        with open(os.path.join(path, MODEL_FILE), encoding='utf-8') as f:
+            info = json.load(f)
+        with open(os.path.join(path, VOCABULARY_FILE), encoding='utf-8') as f:
+            vocabulary = json.load(f)
+        return cls(
+            categories  = info.pop('categories'),
+            vocabulary  = vocabulary,
+            idf         = np.load(os.path.join(path, 'idf.npy'), mmap_mode='r'),
+            coef        = np.load(os.path.join(path, 'coef.npy'), mmap_mode='r'),
+            intercept   = np.load(os.path.join(path, 'intercept.npy')),
+            info        = info,
+        )
+
+
+def train(iter_documents, min_df=2, max_features=50000, alpha=0.1):
+    """Entraine un modele sur les documents classes
+
+    `iter_documents` est appele deux fois et doit produire des couples (texte, categorie) :
+    un premier passage compte les documents contenant chaque mot (vocabulaire et IDF),
+    le second vectorise les textes par lots et cumule les poids des mots par categorie.
+    """
+
+    document_frequency = Counter()
+    category_counts = Counter()
+    for text, category in iter_documents():
+        document_frequency.update(set(tokenize(text)))
+        category_counts[category] += 1
+    if len(category_counts) < 2:
+        raise ValueError("Au moins deux categories sont necessaires pour entrainer le classifieur")
+
+    total = sum(category_counts.values())
+    words = [word for word, count in document_frequency.most_common(max_features) if count >= min_df]
+    words.sort()
+    vocabulary = {word: index for index, word in enumerate(words)}
+    idf = np.array(
+        [math.log((1 + total) / (1 + document_frequency[word])) + 1 for word in words], dtype=np.float32,
+    )
+
+    categories = sorted(category_counts)
+    category_index = {category: index for index, category in enumerate(categories)}
+    word_weights = np.zeros((len(categories), len(words)), dtype=np.float64)
+
+    def accumulate(batch):
+        texts, labels = zip(*batch)
+        matrix = vectorize(texts, vocabulary, idf)
+        one_hot = sparse.csr_matrix(
+            (np.ones(len(labels)), ([category_index[label] for label in labels], np.arange(len(labels)))),
+            shape=(len(categories), len(labels)),
+        )
+        word_weights[:] += (one_hot @ matrix).toarray()
+
+    batch = []
+    for document in iter_documents():
+        batch.append(document)
+        if len(batch) >= TRAINING_BATCH_SIZE:
+            accumulate(batch)
+            batch = []
+    if batch:
+        accumulate(batch)
+
+    # Bayes naif multinomial avec lissage de Laplace : log P(mot | categorie)
+    smoothed = word_weights + alpha
+    coef = np.log(smoothed / smoothed.sum(axis=1, keepdims=True)).T
+    intercept = np.log(np.array([category_counts[category] for category in categories], dtype=np.float64) / total)
+
+    return TfidfClassifier(
+        categories, vocabulary, idf, coef.astype(np.float32), intercept.astype(np.float32),
+        info={
+            'trained_at': timezone.now().isoformat(),
+            'documents': total,
+            'documents_per_category': dict(category_counts),
+            'vocabulary_size': len(words),
+            'min_df': min_df,
+            'alpha': alpha,
+        },
+    )
+
+
+_model       = None
+_model_key   = None
+_model_lock  = threading.Lock()
+
+
+def get_model(path):
+    """Modele enregistre dans `path` (recharge apres un nouvel entrainement), None s'il n'existe pas"""
+
+    global _model, _model_key
+
+    try:
+        key = (path, os.stat(os.path.join(path, MODEL_FILE)).st_mtime_ns)
+    except FileNotFoundError:
+        key = (path, None)
+    with _model_lock:
+        if _model_key != key:
+            if key[1] is None:
+                logger.warning(f"Aucun modele de classification dans {path} : classification par mots-cles")
+                _model = None
+            else:
+                _model = TfidfClassifier.load(path)
+            _model_key = key
+        return _model
@@ -0,0 +1,116 @@
+import hashlib
+import os
+import time
+import zipfile
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from . import metrics
+from .filetypes import CONTENT_TYPES, SNIFF_SIZE, detect_file_type
+
+
+class ContentHashUploadHandler(FileUploadHandler):
+    """Calcule le SHA-256 de chaque fichier pendant la reception des morceaux
+
+    Place en tete de request.upload_handlers, il laisse passer les donnees vers les
+    handlers suivants (memoire ou fichier temporaire) et enregistre les empreintes
+    dans request.upload_content_hashes : {nom du champ: [empreinte par fichier]}.
+    La duree de reception de chaque fichier (lecture du corps de la requete et ecriture
+    du fichier temporaire) alimente l'etape 'upload_receive' des metriques.
+    """
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.hasher = None
+        if request is not None:
+            request.upload_content_hashes = {}
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.hasher = hashlib.sha256()
+        self.started_at = time.perf_counter()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        self.request.upload_content_hashes.setdefault(self.field_name, []).append(self.hasher.hexdigest())
+        metrics.stage_seconds.observe(
+            time.perf_counter() - self.started_at, stage='upload_receive', format=metrics.format_for_name(self.file_name),
+        )
+        # le fichier lui-meme est construit par le handler suivant
+        return None
+
+
+def compute_content_hash(file, chunk_size=64 * 1024):
+    """SHA-256 d'un fichier Django, lu par morceaux"""
+
+    hasher = hashlib.sha256()
+    for chunk in file.chunks(chunk_size):
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_uploaded_file_hash(request, field_name, uploaded_file, index=0):
+    """Empreinte calculee pendant l'upload, ou recalculee si le handler n'etait pas installe"""
+
+    hashes = getattr(request, 'upload_content_hashes', {}).get(field_name, [])
+    if index < len(hashes):
+        return hashes[index]
+    return compute_content_hash(uploaded_file)
+
+
+def iter_archive_files(archive, max_files, max_size, chunk_size=64 * 1024):
+    """Fichiers d'une archive zip uploadee : (nom, fichier ou None, empreinte ou None, erreur ou None)
+
+    Chaque membre est decompresse par morceaux dans un fichier temporaire (comme un upload
+    volumineux), empreinte calculee au passage : un seul membre a la fois sur disque si
+    l'appelant ferme chaque fichier avant de passer au suivant, aucun en memoire. Les
+    membres plus gros que `max_size` (taille annoncee ou reelle) ne sont pas conserves.
+    """
+
+    try:
+        zip_file = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile:
+        yield archive.name, None, None, "Archive zip invalide"
+        return
+
+    with zip_file:
+        members = [
+            info for info in zip_file.infolist()
+            if not info.is_dir() and not os.path.basename(info.filename).startswith('.')
+            and not info.filename.startswith('__MACOSX/')
+        ]
+        for count, info in enumerate(members):
+            name = os.path.basename(info.filename)
+            if count >= max_files:
+                yield name, None, None, f"Archive limitee a {max_files} fichiers"
+                continue
+            if info.file_size > max_size:
+                yield name, None, None, "Fichier trop volumineux"
+                continue
+
+            temp_file = TemporaryUploadedFile(name, 'application/octet-stream', 0, None)
+            hasher, size, head, error = hashlib.sha256(), 0, b'', None
+            try:
+                with zip_file.open(info) as member:
+                    while chunk := member.read(chunk_size):
+                        size += len(chunk)
+                        if size > max_size:
+                            error = "Fichier trop volumineux"
+                            break
+                        if len(head) < SNIFF_SIZE:
+                            head += chunk[:SNIFF_SIZE - len(head)]
+                        hasher.update(chunk)
+                        temp_file.write(chunk)
+            except (zipfile.BadZipFile, RuntimeError, NotImplementedError) as e:
+                error = f"Lecture impossible : {e}"
+            if error is not None:
+                temp_file.close()
+                yield name, None, None, error
+                continue
+            temp_file.seek(0)
+            temp_file.size = size
+            # type annonce deduit du contenu, comme le ferait un navigateur pour un fichier seul
+            temp_file.content_type = CONTENT_TYPES.get(detect_file_type(head), 'application/octet-stream')
+            yield name, temp_file, hasher.hexdigest(), None
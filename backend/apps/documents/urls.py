@@ -3,14 +3,36 @@ from .views import (
     DocumentListView, 
     DocumentDetailView, 
     DocumentUploadView, 
+    DocumentBatchUploadView,
+    UploadSessionCreateView,
+    UploadSessionView,
+    category_list,
+    classify_texts,
+    complete_upload_session,
     download_documents_zip,
+    download_export,
+    document_export,
+    document_keywords,
     document_stats,
+    document_status,
+    extraction_cache_stats,
 )
 
 urlpatterns = [
     path('', DocumentListView.as_view(), name="document-list"),
     path('<int:pk>/', DocumentDetailView.as_view(), name="document-detail"),
+    path('<int:pk>/status/', document_status, name="document-status"),
     path('upload/', DocumentUploadView.as_view(), name="document-upload"),
+    path('upload/batch/', DocumentBatchUploadView.as_view(), name="document-upload-batch"),
+    path('upload/sessions/', UploadSessionCreateView.as_view(), name="upload-session-create"),
+    path('upload/sessions/<uuid:pk>/', UploadSessionView.as_view(), name="upload-session"),
+    path('upload/sessions/<uuid:pk>/complete/', complete_upload_session, name="upload-session-complete"),
     path('download-zip/', download_documents_zip, name="download-documents-zip"),
+    path('export/', document_export, name="document-export"),
+    path('export/download/', download_export, name="document-export-download"),
     path('stats/', document_stats, name="document-stats"),
+    path('keywords/', document_keywords, name="document-keywords"),
+    path('classify/', classify_texts, name="document-classify"),
+    path('categories/', category_list, name="document-categories"),
+    path('extraction-cache/stats/', extraction_cache_stats, name="extraction-cache-stats"),
 ]   
\ No newline at end of file
@@ -1,47 +1,104 @@
 import PyPDF2
 import docx
 from pptx import Presentation
-import magic
-import os
+from collections import Counter
 from django.conf import settings
+from .classifier import best_categories, get_classifier, get_matcher
+from .extraction_cache import get_cached_text, set_cached_text
 
+class DocumentReadError(Exception):
+    """Fichier illisible par sa bibliotheque d'extraction (corrompu ou mal forme)"""
 
-def get_file_type(file_path):
-    """Determine le type de fichier"""
+
+def iter_text_from_pdf(file_path):
+    
+    """Produit le texte d'un fichier pdf page par page"""
     
     try:
-        import magic
-        mime = magic.Magic(mime=True)
-        file_type = mime.from_file(file_path)
-    except ImportError:
-        # Fallback si python-magic n'est pas disponible
-        _, ext = os.path.splitext(file_path)
-        ext_to_mime = {
-            '.pdf': 'application/pdf',
-            '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-            '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
-        }
-        file_type = ext_to_mime.get(ext.lower(), 'unknown')
+        with open(file_path, 'rb') as file:
+            reader = PyPDF2.PdfReader(file)
+            for page in reader.pages:
+                yield page.extract_text()
     except Exception as e:
-        print(f"Erreur lors de la détection du type : {e}")
-        return 'unknown'
+        raise DocumentReadError(f"Fichier PDF illisible : {e}") from e
+
+
+def iter_text_from_docx(file_path):
     
+    """Produit le texte d'un fichier docx paragraphe par paragraphe"""
+    
+    try:
+        doc = docx.Document(file_path)
+        for paragraph in doc.paragraphs:
+            yield paragraph.text
+    except Exception as e:
+        raise DocumentReadError(f"Fichier DOCX illisible : {e}") from e
 
 
-def extract_text_from_pdf(file_path):
+def iter_text_from_pptx(file_path):
     
-    """Extrait le texte d'un fichier pdf"""
+    """Produit le texte d'un fichier PPTX diapositive par diapositive"""
     
     try:
-        with open(file_path, 'rb') as file:
-            reader  = PyPDF2.PdfReader(file)
-            text    = ""
-            for page in reader.pages:
-                text += page.extract_text() + '\n'
-            return text.strip()
+        prs = Presentation(file_path)
+        for slide in prs.slides:
+            yield '\n'.join(shape.text for shape in slide.shapes if hasattr(shape, "text"))
     except Exception as e:
-        print(f"Erreur lors de l'extraction PDF {e}")
-        return ""
+        raise DocumentReadError(f"Fichier PPTX illisible : {e}") from e
+
+
+# extracteurs en flux par type de fichier
+TEXT_EXTRACTORS = {
+    'pdf': iter_text_from_pdf,
+    'docx': iter_text_from_docx,
+    'pptx': iter_text_from_pptx,
+}
+
+
+def iter_text_from_document(file_path, file_type):
+    
+    """Produit le texte du document par morceaux (pages, paragraphes ou diapositives)"""
+    
+    extractor = TEXT_EXTRACTORS.get(file_type)
+    if extractor is None:
+        return iter(())
+    return extractor(file_path)
+
+
+def limit_chunks(chunks, max_chars=None):
+    
+    """Morceaux de texte limites a `max_chars` caracteres au total, separateurs compris
+    
+    Produit (morceau, tronque ou non) et s'arrete apres le morceau tronque, vide si le
+    budget etait deja atteint. Sans `max_chars`, les morceaux sont produits tels quels.
+    """
+    
+    length = 0
+    for chunk in chunks:
+        if max_chars and length + len(chunk) > max_chars:
+            yield chunk[:max(0, max_chars - length)], True
+            return
+        yield chunk, False
+        length += len(chunk) + 1
+
+
+def read_document_text(file_path, file_type, max_chars=None):
+    
+    """Texte du document, limite a `max_chars` caracteres : (texte, texte complet lu ou non)"""
+    
+    parts = []
+    for chunk, truncated in limit_chunks(iter_text_from_document(file_path, file_type), max_chars):
+        parts.append(chunk)
+        if truncated:
+            return '\n'.join(parts).strip(), False
+    return '\n'.join(parts).strip(), True
+
+
+def extract_text_from_pdf(file_path):
+    
+    """Extrait le texte d'un fichier pdf"""
+    
+    return '\n'.join(iter_text_from_pdf(file_path)).strip()
     
 
 
@@ -49,76 +106,122 @@ def extract_text_from_docx(file_path):
     
     """Extrait le texte d'un fichier docx"""
     
-    try:
-        doc     = docx.Document(file_path)
-        text    = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + '\n'
-        return text.strip()
-    except Exception as e:
-        print(f"Erreur lors de l'extractin DOCX {e}")
-        return ""
+    return '\n'.join(iter_text_from_docx(file_path)).strip()
 
 
 def extract_text_from_pptx(file_path):
     
     """Extrait le text d'un fichier PPTX"""
     
-    try:
-        prs     = Presentation(file_path)
-        text    = ""
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    text += shape.text + '\n'
-        return text.strip()
-    except Exception as e:
-        print(f"Erreur lors de l'extraction du PPTX {e}")
-        return ""
+    return '\n'.join(iter_text_from_pptx(file_path)).strip()
     
 
-def extract_text_from_document(file_path, file_type):
+def extract_text_from_document(file_path, file_type, content_hash=None):
+    
+    """Extrait le texte selon le type de fichier
     
-    """Extrait le texte selon le type de fichier"""
+    Avec l'empreinte du contenu, le cache d'extraction est consulte avant d'analyser le fichier.
+    """
+    
+    cached_text = get_cached_text(content_hash, file_type)
+    if cached_text is not None:
+        return cached_text
     
     if file_type == 'pdf':
-        return extract_text_from_pdf(file_path)
+        text = extract_text_from_pdf(file_path)
     elif file_type == 'docx':
-        return extract_text_from_docx(file_path)
+        text = extract_text_from_docx(file_path)
     elif file_type == 'pptx':
-        return extract_text_from_pptx(file_path)
+        text = extract_text_from_pptx(file_path)
     else:
-        return ""
+        text = ""
+    
+    set_cached_text(content_hash, file_type, text)
+    return text
     
 
 def classify_document(text):
     
-    """Classifie un document en se basant sur son contenu"""
+    """Classifie un document en se basant sur son contenu (moteur de DOCUMENT_CLASSIFIER)"""
     
-    text_lower = text.lower()
-    categories = settings.DOCUMENT_CATEGORIES
+    category, keyword_counts = classify_document_with_counts(text)
+    classifier = get_classifier()
+    if not classifier.keyword_based:
+        category = classifier.predict([text or ""])[0]
+    return category, list(keyword_counts)
+
+
+def classify_documents(texts):
     
-    category_scores = {}
+    """Classifie un lot de textes : le texte est parcouru une fois, le lot score en une passe
     
-    for category, keywords in categories.items():
-        if category == "autres":
-            continue
-        score = 0
-        found_keywords = []
-        
-        for keyword in keywords:
-            count = text_lower.count(keyword)
-            if count > 0:
-                score += count
-                found_keywords.append(keyword)
-        if score > 0:
-            category_scores[category] = {
-                'score': score,
-                'keywords': found_keywords
-            }
-    if category_scores:
-        # retourner la category avec le score le plus eleve
-        best_category = max(category_scores.items(), key=lambda x: x[1]['score'])
-        return best_category[0], best_category[1]['keywords']
+    Retourne pour chaque texte un dict : categorie, confiance (score de la categorie retenue),
+    scores par categorie et mots-cles trouves de la categorie retenue.
+    """
+    
+    texts = [text or "" for text in texts]
+    matcher = get_matcher()
+    classifier = get_classifier()
+    counts = [matcher.count(text) for text in texts]
+    if classifier.keyword_based:
+        scores = classifier.score_counts(counts)
     else:
-        return 'autres', []
\ No newline at end of file
+        scores = classifier.scores(texts)
+    categories = best_categories(classifier.categories, scores)
+    
+    results = []
+    for category, row, text_counts in zip(categories, scores.tolist(), counts):
+        category_scores = dict(zip(classifier.categories, row))
+        results.append({
+            'category': category,
+            'confidence': category_scores.get(category, 0.0),
+            'scores': category_scores,
+            'keywords': list(matcher.keywords_for(category, text_counts)),
+        })
+    return results
+
+
+def classify_document_with_counts(text):
+    
+    """Classifie un document et retourne le nombre d'occurrences de chaque mot-cle trouve"""
+    
+    return get_matcher().classify(text or "")
+
+
+
+def classify_document_stream(chunks, max_chunks=None, max_chars=None, decisive_margin=None, matcher=None):
+    
+    """Classifie un texte fourni par morceaux en s'arretant des que possible
+    
+    La lecture s'arrete apres `max_chunks` morceaux (pages) ou `max_chars` caracteres, ou
+    quand la categorie en tete a `decisive_margin` occurrences de mots-cles d'avance sur la
+    suivante. Retourne (categorie, mots-cles, texte lu, texte complet lu ou non).
+    Sans `matcher`, la taxonomie courante est utilisee.
+    """
+    
+    if max_chars is None:
+        max_chars = settings.DOCUMENT_CLASSIFICATION_MAX_CHARS
+    if decisive_margin is None:
+        decisive_margin = settings.DOCUMENT_CLASSIFICATION_DECISIVE_MARGIN
+    
+    if matcher is None:
+        matcher = get_matcher()
+    counts = Counter()
+    parts = []
+    complete = True
+    for chunk, truncated in limit_chunks(chunks, max_chars):
+        parts.append(chunk)
+        counts.update(matcher.count(chunk))
+        
+        # budget atteint (un document d'exactement max_chunks pages est considere incomplet)
+        if truncated or (max_chunks and len(parts) >= max_chunks):
+            complete = False
+            break
+        if decisive_margin and counts:
+            scores = sorted((entry['score'] for entry in matcher.score(counts).values()), reverse=True) + [0]
+            if scores[0] - scores[1] >= decisive_margin:
+                complete = False
+                break
+    
+    category, keyword_counts = matcher.classify_counts(counts)
+    return category, list(keyword_counts), '\n'.join(parts).strip(), complete
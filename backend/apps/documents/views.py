@@ -1,28 +1,98 @@
 from django.shortcuts import render
 from rest_framework import status, generics, permissions
 from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from django.http import HttpResponse
-from .models import Document
-from .serializers import DocumentSerializer, DocumentListSerializer, DocumentUploadSerializer
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from django.utils import timezone
+from .models import Document, DocumentExport, UploadSession
+from .serializers import (
+    ClassifyTextsSerializer, DocumentExportSerializer, DocumentSerializer, DocumentListSerializer, DocumentSearchSerializer,
+    DocumentUploadSerializer, UploadSessionSerializer, DOCUMENT_LIST_COLUMNS, serialize_document_rows,
+)
 from .services import DocumentProcessingService
+from . import chunked_upload, extraction_cache, metrics
+from .pagination import get_document_list_paginator
+from .renderers import FastJSONRenderer
+from .response_cache import cached_response
 from .permissions import IsOwnerOrReadOnly
+from .search import attach_headlines, build_search_query, search_documents
+from .classifier import get_matcher
+from .export import archive_response, is_up_to_date
+from .stats import get_user_stats, keyword_facets
+from .tasks import enqueue, enqueue_many
+from .taxonomy import get_taxonomy
+from .utils import classify_documents
+from .upload_handlers import ContentHashUploadHandler, get_uploaded_file_hash, iter_archive_files
+from functools import partial
+import hmac
+import os
 
 # Create your views here.
 
 class DocumentListView(generics.ListAPIView):
     serializer_class    = DocumentListSerializer
     permission_classes  = [permissions.IsAuthenticated]
+    renderer_classes    = [FastJSONRenderer]
+    
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = get_document_list_paginator(self.request)
+        return self._paginator
+    
+    @property
+    def search_query(self):
+        """Recherche plein texte demandee avec ?q=, None sinon"""
+        
+        if not hasattr(self, '_search_query'):
+            self._search_query = build_search_query(self.request.query_params.get('q'))
+        return self._search_query
+    
+    def get_serializer_class(self):
+        if self.search_query is not None:
+            return DocumentSearchSerializer
+        return DocumentListSerializer
     
     def get_queryset(self):
         queryset = Document.objects.filter(user=self.request.user)
         category = self.request.query_params.get('category', None)
         if category:
             queryset = queryset.filter(category=category)
+        keywords = self.request.query_params.getlist('keyword')
+        if keywords:
+            # documents contenant tous les mots-cles demandes (index GIN sur keywords)
+            matcher = get_matcher()
+            queryset = queryset.filter(keywords__contains=[matcher.resolve_keyword(keyword) for keyword in keywords])
+        if self.search_query is not None:
+            queryset = search_documents(queryset, self.search_query)
         return queryset
     
+    def list(self, request, *args, **kwargs):
+        # en cache tant que les documents de l'utilisateur ne changent pas (voir response_cache.py)
+        return cached_response(request, 'list', partial(self.list_documents, request, *args, **kwargs))
+    
+    def list_documents(self, request, *args, **kwargs):
+        if self.search_query is not None:
+            return super().list(request, *args, **kwargs)
+        # sans recherche : colonnes listees lues en dictionnaires, sans instances ni serializer
+        queryset = self.filter_queryset(self.get_queryset()).values(*DOCUMENT_LIST_COLUMNS)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serialize_document_rows(page))
+        return Response(serialize_document_rows(queryset))
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        # extraits surlignes calcules pour la seule page retournee
+        if page is not None and self.search_query is not None:
+            attach_headlines(page, self.search_query)
+        return page
+    
 
 class DocumentDetailView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class    = DocumentSerializer
@@ -30,6 +100,9 @@ class DocumentDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def get_queryset(self):
         return Document.objects.filter(user=self.request.user)
+    
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(request, 'detail', partial(super().retrieve, request, *args, **kwargs))
 
 
 
@@ -38,35 +111,294 @@ class DocumentUploadView(generics.CreateAPIView):
     permission_classes  = [permissions.IsAuthenticated]
     parser_classes      = [MultiPartParser, FormParser]
     
+    def create(self, request, *args, **kwargs):
+        # empreinte du contenu calculee pendant la reception du fichier
+        request.upload_handlers.insert(0, ContentHashUploadHandler(request._request))
+        
+        # le traitement est asynchrone : le document est accepte, pas encore classe
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+    
     def perform_create(self, serializer):
-        # creer l'instance du document
-        document = serializer.save(user=self.request.user)
+        uploaded_file = serializer.validated_data['file']
+        content_hash = get_uploaded_file_hash(self.request, 'file', uploaded_file)
         
-        # traiter le document (extraction de texte et classification)
-        document = DocumentProcessingService.process_uploaded_document(document, self.request.FILES['file'])
-        document.save()
+        # contenu deja connu : partager le fichier stocke et reprendre son traitement
+        duplicate = DocumentProcessingService.find_duplicate(self.request.user, content_hash)
+        if duplicate is not None and duplicate.status == Document.STATUS_DONE:
+            document = serializer.save(
+                user            = self.request.user,
+                content_hash    = content_hash,
+                **DocumentProcessingService.duplicate_fields(duplicate)
+            )
+            # deja classe : seul le texte pour la recherche reste a enregistrer
+            enqueue('index_document', document_id=document.pk)
+            return
         
+        # creer l'instance du document (ecriture du fichier stocke puis insertion)
+        with metrics.time_stage('storage', metrics.format_for_name(uploaded_file.name)):
+            document = serializer.save(
+                user            = self.request.user,
+                file            = duplicate.file.name if duplicate is not None else uploaded_file,
+                file_size       = uploaded_file.size,
+                content_hash    = content_hash,
+                status          = Document.STATUS_PENDING,
+            )
         
-@api_view(['GET'])
-@permission_classes([permissions.IsAuthenticated])
-def download_documents_zip(request):
-    """Endpoint pour telecharger un zip contenant tous les documents classes"""
+        # traiter le document en arriere-plan (extraction de texte et classification)
+        enqueue('process_document', document_id=document.pk)
+        
+        
+class DocumentBatchUploadView(generics.GenericAPIView):
+    """Upload de plusieurs documents en une requete : champs `files` (repetes) et/ou `archive` (zip)
     
-    try:
-        zip_buffer      = DocumentProcessingService.create_documents_zip(request.user)
+    Chaque fichier est valide avec les regles de DocumentUploadSerializer ; les fichiers
+    valides du champ `files` sont enregistres ensemble, ceux de l'archive un par un a mesure
+    de leur decompression, puis traites en arriere-plan. La reponse donne le resultat de
+    chaque fichier, dans l'ordre d'envoi.
+    """
+    
+    serializer_class    = DocumentUploadSerializer
+    permission_classes  = [permissions.IsAuthenticated]
+    parser_classes      = [MultiPartParser]
+    
+    def post(self, request, *args, **kwargs):
+        request.upload_handlers.insert(0, ContentHashUploadHandler(request._request))
+        max_files = settings.DOCUMENT_BATCH_MAX_FILES
+        titles = request.data.getlist('titles')
+        results, accepted, documents = [], [], []
+        
+        def add(name, uploaded_file, content_hash, error):
+            result = {'name': name}
+            index = len(results)
+            results.append(result)
+            if error is not None:
+                result['errors'] = {'file': [error]}
+                return
+            title = titles[index] if index < len(titles) and titles[index] else os.path.splitext(name)[0]
+            serializer = self.get_serializer(data={'title': title, 'file': uploaded_file})
+            if not serializer.is_valid():
+                result['errors'] = serializer.errors
+                return
+            accepted.append((result, serializer.validated_data, content_hash))
+        
+        def store():
+            if not accepted:
+                return
+            created = DocumentProcessingService.create_documents(request.user, [
+                (data['title'], data['file'], content_hash) for _, data, content_hash in accepted
+            ])
+            for (result, _, _), document in zip(accepted, created):
+                result.update(id=document.pk, title=document.title, status=document.status)
+            documents.extend(created)
+            accepted.clear()
+        
+        # fichiers envoyes directement (deja recus par les handlers d'upload) : une seule insertion
+        for index, uploaded_file in enumerate(request.FILES.getlist('files')[:max_files]):
+            add(uploaded_file.name, uploaded_file, get_uploaded_file_hash(request, 'files', uploaded_file, index), None)
+        store()
         
-        response        = HttpResponse(
-            zip_buffer.getvalue(),
-            content_type = 'application/zip'    
+        # membres de l'archive enregistres un par un : un seul fichier decompresse a la fois
+        archive = request.FILES.get('archive')
+        if archive is not None:
+            members = iter_archive_files(archive, max_files - len(results), settings.DOCUMENT_MAX_UPLOAD_SIZE)
+            for name, member, content_hash, error in members:
+                try:
+                    add(name, member, content_hash, error)
+                    store()
+                finally:
+                    if member is not None:
+                        # fichier temporaire supprime (sauf s'il a ete deplace dans le stockage)
+                        member.close()
+        
+        if not results:
+            return Response({'detail': "Aucun fichier envoye (champs 'files' ou 'archive')"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if documents:
+            # traitement concurrent par le backend de la file (pool de threads ou workers)
+            enqueue_many('process_document', [
+                {'document_id': document.pk} for document in documents if document.status == Document.STATUS_PENDING
+            ])
+            enqueue_many('index_document', [
+                {'document_id': document.pk} for document in documents if document.status == Document.STATUS_DONE
+            ])
+        
+        return Response(
+            {'accepted': len(documents), 'rejected': len(results) - len(documents), 'results': results},
+            status=status.HTTP_202_ACCEPTED if documents else status.HTTP_400_BAD_REQUEST,
         )
-        response['Content-Disposition'] = 'attachement; filename="mes_documents.classes.zip"'
-        return response
-    except Exception as e:
+        
+        
+class UploadSessionCreateView(generics.CreateAPIView):
+    """Debut d'un upload en morceaux (voir chunked_upload.py)"""
+    
+    serializer_class    = UploadSessionSerializer
+    permission_classes  = [permissions.IsAuthenticated]
+    
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+        
+        
+class UploadSessionView(APIView):
+    """Etat (GET), envoi d'un morceau (PUT ?offset=N, corps brut) et abandon (DELETE) d'un upload"""
+    
+    permission_classes  = [permissions.IsAuthenticated]
+    
+    def get_session(self, pk):
+        return get_object_or_404(UploadSession, pk=pk, user=self.request.user, status=UploadSession.STATUS_ACTIVE)
+    
+    def get(self, request, pk):
+        return Response(UploadSessionSerializer(self.get_session(pk)).data)
+    
+    def put(self, request, pk):
+        session = self.get_session(pk)
+        try:
+            offset = int(request.query_params['offset'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError, ValueError):
+            return Response({'detail': "Parametre offset et en-tete Content-Length requis"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # le client reprend la ou le serveur s'est arrete
+        if offset != session.received:
+            return Response({'detail': "Offset inattendu", 'offset': session.received}, status=status.HTTP_409_CONFLICT)
+        if length > settings.DOCUMENT_UPLOAD_CHUNK_MAX_SIZE:
+            return Response(
+                {'detail': f"Morceau limite a {settings.DOCUMENT_UPLOAD_CHUNK_MAX_SIZE} octets"},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+        if offset + length > session.file_size:
+            return Response({'detail': "Le morceau depasse la taille annoncee"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # corps lu directement (pas de parser) : ecrit sur disque par blocs
+        written = chunked_upload.write_chunk(session, offset, request.stream, length) if length else 0
+        updated = UploadSession.objects.filter(
+            pk=session.pk, received=offset, status=UploadSession.STATUS_ACTIVE
+        ).update(received=offset + written, updated_at=timezone.now())
+        if not updated:
+            # un autre envoi de la meme session est passe entre-temps
+            session.refresh_from_db()
+            return Response({'detail': "Envoi concurrent", 'offset': session.received}, status=status.HTTP_409_CONFLICT)
+        return Response({'id': session.pk, 'offset': offset + written, 'file_size': session.file_size})
+    
+    def delete(self, request, pk):
+        session = self.get_session(pk)
+        chunked_upload.discard(session)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+        
+        
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def complete_upload_session(request, pk):
+    """Fin d'un upload en morceaux : verification puis creation du document"""
+    
+    session = get_object_or_404(UploadSession, pk=pk, user=request.user, status=UploadSession.STATUS_ACTIVE)
+    if session.received != session.file_size:
+        return Response({'detail': "Upload incomplet", 'offset': session.received}, status=status.HTTP_400_BAD_REQUEST)
+    
+    expected_hash = request.data.get('content_hash') or session.content_hash
+    if not expected_hash:
+        return Response({'content_hash': ["Empreinte SHA-256 du fichier requise"]}, status=status.HTTP_400_BAD_REQUEST)
+    content_hash = chunked_upload.assembled_file_hash(session)
+    if content_hash != expected_hash.lower():
+        # contenu corrompu : le fichier est a renvoyer depuis le debut
+        chunked_upload.discard(session)
+        UploadSession.objects.filter(pk=session.pk).update(received=0, updated_at=timezone.now())
         return Response(
-            {'error':f'erreur lors de la creation du zip: {str(e)}'},
-            status  = status.HTTP_500_INTERNAL_SERVER_ERROR
+            {'content_hash': ["L'empreinte du fichier recu ne correspond pas"], 'offset': 0},
+            status=status.HTTP_400_BAD_REQUEST,
         )
+    if chunked_upload.assembled_file_type(session) not in ('pdf', 'docx', 'pptx'):
+        chunked_upload.discard(session)
+        session.delete()
+        return Response({'file': ["Type de fichier non supporte. Utilisez PDF, PPTX ou DOCX"]}, status=status.HTTP_400_BAD_REQUEST)
+    
+    # une seule completion par session, meme si la requete est rejouee
+    if not UploadSession.objects.filter(pk=session.pk, status=UploadSession.STATUS_ACTIVE).update(
+        status=UploadSession.STATUS_COMPLETE, updated_at=timezone.now()
+    ):
+        return Response({'detail': "Upload deja termine"}, status=status.HTTP_409_CONFLICT)
+    
+    assembled = chunked_upload.AssembledFile(session.temp_path, session.file_name)
+    try:
+        document, = DocumentProcessingService.create_documents(request.user, [(session.title, assembled, content_hash)])
+    except Exception:
+        UploadSession.objects.filter(pk=session.pk).update(status=UploadSession.STATUS_ACTIVE)
+        raise
+    finally:
+        assembled.close()
+    # fichier partiel restant si le contenu etait deja connu (sinon il a ete deplace)
+    chunked_upload.discard(session)
+    UploadSession.objects.filter(pk=session.pk).update(document=document)
+    
+    if document.status == Document.STATUS_PENDING:
+        enqueue('process_document', document_id=document.pk)
+    else:
+        enqueue('index_document', document_id=document.pk)
+    return Response(DocumentUploadSerializer(document).data, status=status.HTTP_202_ACCEPTED)
+        
+        
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def document_status(request, pk):
+    """Etat du traitement asynchrone d'un document"""
+    
+    document = get_object_or_404(Document, pk=pk, user=request.user)
+    return Response({
+        'id': document.pk,
+        'status': document.status,
+        'category': document.category,
+        'error': document.processing_error or None,
+    })
+        
         
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_documents_zip(request):
+    """Endpoint pour telecharger un zip contenant tous les documents classes
+    
+    L'archive pre-construite est servie si elle est a jour ; sinon le zip est produit a la
+    volee et l'archive est (re)construite en arriere-plan pour les prochains telechargements.
+    """
+    
+    archive = DocumentExport.objects.filter(user=request.user).first()
+    if archive is not None and is_up_to_date(archive):
+        return archive_response(request, archive)
+    enqueue('build_export', user_id=request.user.pk)
+    
+    response        = StreamingHttpResponse(
+        DocumentProcessingService.iter_documents_zip(request.user),
+        content_type = 'application/zip'
+    )
+    response['Content-Disposition'] = 'attachment; filename="mes_documents.classes.zip"'
+    return response
+        
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([permissions.IsAuthenticated])
+def document_export(request):
+    """Archive zip construite en arriere-plan : etat (GET) ou construction/mise a jour (POST)"""
+    
+    if request.method == 'POST':
+        archive, _ = DocumentExport.objects.get_or_create(user=request.user)
+        if not is_up_to_date(archive):
+            enqueue('build_export', user_id=request.user.pk)
+            archive.refresh_from_db()
+        return Response(DocumentExportSerializer(archive).data, status=status.HTTP_202_ACCEPTED)
+    
+    archive = get_object_or_404(DocumentExport, user=request.user)
+    return Response(DocumentExportSerializer(archive).data)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def download_export(request):
+    """Telechargement de la derniere archive construite (ETag, reprise par intervalles)"""
+    
+    archive = get_object_or_404(DocumentExport, user=request.user)
+    return archive_response(request, archive)
 
 
 @api_view(['GET'])
@@ -74,17 +406,63 @@ def download_documents_zip(request):
 def document_stats(request):
     """Statistiques des documents de l'utilisateur"""
     
-    user_documents = Document.objects.filter(user=request.user)
+    return cached_response(request, 'stats', lambda: Response(get_user_stats(request.user.pk)))
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def document_keywords(request):
+    """Nombre de documents de l'utilisateur par mot-cle trouve (filtre optionnel ?category=)"""
     
-    stats = {
-        'total_documents': user_documents.count(),
-        'categories': {}
-    }
+    return Response({'keywords': keyword_facets(request.user.pk, request.query_params.get('category'))})
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def category_list(request):
+    """Categories de la taxonomie courante, avec leurs mots-cles"""
+    
+    taxonomy = get_taxonomy()
+    return Response({
+        'version': taxonomy.version,
+        'categories': [
+            {'code': code, 'label': taxonomy.labels[code], 'keywords': keywords}
+            for code, keywords in taxonomy.categories.items()
+        ],
+    })
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def classify_texts(request):
+    """Classification d'un lot de textes bruts (sans document) : categorie, confiance et scores"""
     
-    # compter par categories
-    for category, _ in Document.CATEGORY_CHOICES:
-        count = user_documents.filter(category=category).count()
-        stats['categories'][category] = count
+    serializer = ClassifyTextsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response({'results': classify_documents(serializer.validated_data['texts'])})
 
 
-    return Response(stats)
\ No newline at end of file
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def extraction_cache_stats(request):
+    """Compteurs du cache d'extraction de ce processus (supervision)"""
+    
+    return Response(extraction_cache.stats.as_dict())
+
+
+@require_GET
+def metrics_view(request):
+    """Metriques du traitement au format texte de Prometheus
+    
+    Avec METRICS_TOKEN, le collecteur s'authentifie par `Authorization: Bearer <jeton>` ;
+    sinon l'acces est reserve aux comptes staff connectes (session de l'admin).
+    """
+    
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'.encode()
+        authorized = hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected)
+    else:
+        authorized = request.user.is_authenticated and request.user.is_staff
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
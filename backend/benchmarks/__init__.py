@@ -0,0 +1,50 @@
+"""
+
+Benchmarks de performance du backend.
+Usage : python -m benchmarks.<module> (depuis le repertoire backend/)
+
+"""
+
+import os
+import time
+from contextlib import contextmanager
+
+
+def setup_django():
+    """Configure Django pour les benchmarks qui utilisent l'ORM ou les settings"""
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'document_classifier.settings')
+    import django
+    django.setup()
+
+
+def measure(func, repeat=5, number=1):
+    """Execute func `number` fois par serie, `repeat` series ; temps par appel en secondes"""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        'best': min(timings),
+        'mean': sum(timings) / len(timings),
+    }
+
+
+@contextmanager
+def test_database(verbosity=0):
+    """Base de test temporaire, creee puis detruite, pour les benchmarks qui ecrivent en base"""
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity)
+        teardown_test_environment()
@@ -0,0 +1,91 @@
+"""
+
+Micro-benchmark de classify_document : boucle str.count par mot-cle (ancienne
+implementation) contre le matcher compile en une passe.
+Usage : python -m benchmarks.bench_classifier [--keywords 500] [--pages 200]
+
+"""
+
+import argparse
+import random
+from apps.documents.classifier import KeywordMatcher
+from benchmarks import measure
+
+WORDS_PER_PAGE = 400
+
+
+def legacy_classify(text, categories):
+    """Ancienne implementation : un parcours complet du texte par mot-cle"""
+
+    text_lower = text.lower()
+    category_scores = {}
+    for category, keywords in categories.items():
+        if category == "autres":
+            continue
+        score = 0
+        found_keywords = []
+        for keyword in keywords:
+            count = text_lower.count(keyword)
+            if count > 0:
+                score += count
+                found_keywords.append(keyword)
+        if score > 0:
+            category_scores[category] = {'score': score, 'keywords': found_keywords}
+    if category_scores:
+        best_category = max(category_scores.items(), key=lambda x: x[1]['score'])
+        return best_category[0], best_category[1]['keywords']
+    return 'autres', []
+
+
+def build_taxonomy(keyword_count, per_category=25, seed=0):
+    rng = random.Random(seed)
+    letters = 'abcdefghijklmnopqrstuvwxyzéèà'
+    taxonomy = {}
+    for index in range(keyword_count):
+        keyword = ''.join(rng.choice(letters) for _ in range(rng.randint(5, 12)))
+        taxonomy.setdefault(f'categorie{index // per_category}', []).append(keyword)
+    taxonomy['autres'] = []
+    return taxonomy
+
+
+def build_text(taxonomy, pages, seed=0):
+    rng = random.Random(seed)
+    keywords = [keyword for keywords in taxonomy.values() for keyword in keywords]
+    filler = ['le', 'la', 'des', 'document', 'cours', 'exemple', 'chapitre', 'page']
+    words = [
+        rng.choice(keywords) if rng.random() < 0.02 else rng.choice(filler)
+        for _ in range(pages * WORDS_PER_PAGE)
+    ]
+    return ' '.join(words)
+
+
+def run(keywords=500, pages=200, repeat=3):
+    taxonomy = build_taxonomy(keywords)
+    text = build_text(taxonomy, pages)
+    matcher = KeywordMatcher(taxonomy)
+
+    legacy = measure(lambda: legacy_classify(text, taxonomy), repeat=repeat)
+    compiled = measure(lambda: matcher.classify(text), repeat=repeat)
+    compile_time = measure(lambda: KeywordMatcher(taxonomy), repeat=repeat)
+    return {
+        'keywords': keywords,
+        'pages': pages,
+        'legacy_seconds': legacy['best'],
+        'compiled_seconds': compiled['best'],
+        'compile_seconds': compile_time['best'],
+        'speedup': legacy['best'] / compiled['best'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--keywords', type=int, default=500)
+    parser.add_argument('--pages', type=int, default=200)
+    args = parser.parse_args()
+
+    result = run(args.keywords, args.pages)
+    print(f"{result['keywords']} mots-cles, {result['pages']} pages")
+    print(f"  boucle str.count : {result['legacy_seconds'] * 1000:.1f} ms")
+    print(f"  matcher compile  : {result['compiled_seconds'] * 1000:.1f} ms "
+          f"(compilation {result['compile_seconds'] * 1000:.1f} ms, une fois)")
+    print(f"  acceleration     : x{result['speedup']:.1f}")
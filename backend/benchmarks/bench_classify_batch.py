@@ -0,0 +1,73 @@
+"""
+
+Benchmark de la classification par lot (classify_documents) : cout par texte selon la
+taille du lot (1, 100, 10 000), pour les moteurs 'keyword' et 'tfidf', compare a
+l'appel texte par texte de classify_document.
+Usage : python -m benchmarks.bench_classify_batch [--texts 10000] [--words 300]
+
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+from benchmarks import measure, setup_django, test_database
+from benchmarks.bench_tfidf import build_corpus
+
+BATCH_SIZES = [1, 100, 10000]
+
+
+def per_text_seconds(func, texts, batch_size, repeat):
+    def run_batches():
+        for start in range(0, len(texts), batch_size):
+            func(texts[start:start + batch_size])
+
+    return measure(run_batches, repeat=repeat)['best'] / len(texts)
+
+
+def run(texts=10000, words=300, repeat=3):
+    from django.test.utils import override_settings
+    from apps.documents.taxonomy import get_taxonomy
+    from apps.documents.testing import random_text
+    from apps.documents.tfidf import train
+    from apps.documents.utils import classify_document, classify_documents
+
+    keywords = [keyword for values in get_taxonomy().categories.values() for keyword in values]
+    engines = {
+        'keyword': ({'BACKEND': 'keyword'}, [random_text(words, keywords, seed=index) for index in range(texts)]),
+    }
+    model_dir = os.path.join(tempfile.mkdtemp(), 'model')
+    corpus = build_corpus(texts, 20000, words=words)
+    train(lambda: iter(corpus)).save(model_dir)
+    engines['tfidf'] = ({'BACKEND': 'tfidf', 'MODEL_DIR': model_dir}, [text for text, _ in corpus])
+
+    results = []
+    try:
+        for name, (config, samples) in engines.items():
+            with override_settings(DOCUMENT_CLASSIFIER=config):
+                classify_documents(samples[:10])  # chargement du modele hors mesure
+                result = {
+                    'engine': name,
+                    'single_seconds': per_text_seconds(lambda batch: [classify_document(text) for text in batch], samples, 1, repeat),
+                }
+                for batch_size in BATCH_SIZES:
+                    result[batch_size] = per_text_seconds(classify_documents, samples, batch_size, repeat)
+                results.append(result)
+    finally:
+        shutil.rmtree(os.path.dirname(model_dir), ignore_errors=True)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--texts', type=int, default=10000)
+    parser.add_argument('--words', type=int, default=300)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args.texts, args.words)
+    print(f"{args.texts} textes de {args.words} mots, cout par texte")
+    for result in results:
+        batches = ' | '.join(f"lot de {size} : {result[size] * 1e6:6.0f} us" for size in BATCH_SIZES)
+        print(f"  {result['engine']:<8} classify_document : {result['single_seconds'] * 1e6:6.0f} us | {batches}")
@@ -0,0 +1,180 @@
+"""
+
+Test de charge des connexions a PostgreSQL : une connexion par requete (CONN_MAX_AGE=0),
+connexions persistantes verifiees avant reutilisation (CONN_MAX_AGE, CONN_HEALTH_CHECKS)
+et pool de connexions psycopg (OPTIONS['pool'], si psycopg 3 et psycopg_pool sont
+installes). Un serveur WSGI a pool de threads fixe (comme gunicorn --threads) sert la
+liste et les statistiques a plusieurs clients HTTP concurrents (authentification JWT).
+Usage : python -m benchmarks.bench_connections [--clients 8] [--requests 200] [--documents 1000]
+
+"""
+
+import argparse
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+from benchmarks import setup_django, test_database
+
+ENDPOINTS = {
+    'liste': '/api/documents/',
+    'statistiques': '/api/documents/stats/',
+}
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """Serveur WSGI a pool de threads fixe : chaque thread garde sa connexion a la base"""
+
+    def __init__(self, *args, threads=8, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = threads
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def close_connections(self):
+        """Ferme la connexion a la base de chaque thread du pool puis arrete le pool"""
+
+        from django.db import connections
+
+        barrier = threading.Barrier(self.threads)
+
+        def close():
+            barrier.wait()  # un appel par thread
+            connections.close_all()
+
+        for future in [self.executor.submit(close) for _ in range(self.threads)]:
+            future.result()
+        self.executor.shutdown()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def load(base_url, token, clients, requests):
+    """`clients` clients concurrents, `requests` requetes chacun en alternant les endpoints"""
+
+    latencies = {name: [] for name in ENDPOINTS}
+    lock = threading.Lock()
+
+    def client(index):
+        for number in range(requests):
+            name = list(ENDPOINTS)[(index + number) % len(ENDPOINTS)]
+            request = urllib.request.Request(base_url + ENDPOINTS[name], headers={'Authorization': f'Bearer {token}'})
+            start = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies[name].append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        for future in [executor.submit(client, index) for index in range(clients)]:
+            future.result()
+    wall = time.perf_counter() - start
+    return {
+        'throughput': clients * requests / wall,
+        'endpoints': {
+            name: {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95)}
+            for name, values in latencies.items()
+        },
+    }
+
+
+def configurations():
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+    configs = {
+        'une connexion par requete': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+        'connexions persistantes': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True},
+    }
+    try:
+        import psycopg_pool  # noqa: F401
+        pool_available = is_psycopg3
+    except ImportError:
+        pool_available = False
+    if pool_available:
+        configs['pool psycopg'] = {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'pool': {'min_size': 2, 'max_size': 16}}
+    return configs
+
+
+def run(clients=8, requests=200, documents=1000):
+    from django.contrib.auth import get_user_model
+    from django.db import connection, connections
+    from django.test.utils import override_settings
+    from django.core.handlers.wsgi import WSGIHandler
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from benchmarks.bench_keywords import create_documents
+
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+    create_documents(user, documents)
+    token = str(RefreshToken.for_user(user).access_token)
+    connections.close_all()
+
+    results = {}
+    settings_dict = connection.settings_dict  # partage par les connexions de tous les threads
+    for name, config in configurations().items():
+        settings_dict['CONN_MAX_AGE'] = config['CONN_MAX_AGE']
+        settings_dict['CONN_HEALTH_CHECKS'] = config['CONN_HEALTH_CHECKS']
+        settings_dict['OPTIONS'].pop('pool', None)
+        if 'pool' in config:
+            settings_dict['OPTIONS']['pool'] = config['pool']
+
+        with override_settings(ALLOWED_HOSTS=['*'], DB_QUERY_BUDGET=0, DB_QUERY_TIME_BUDGET=0):
+            server = make_server(
+                '127.0.0.1', 0, WSGIHandler(),
+                server_class=partial(PooledWSGIServer, threads=clients), handler_class=QuietHandler,
+            )
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+            try:
+                load(base_url, token, clients, 5)  # mise en route : threads et connexions
+                results[name] = load(base_url, token, clients, requests)
+            finally:
+                server.shutdown()
+                server.close_connections()
+                server.server_close()
+                if 'pool' in config:
+                    connection.close_pool()
+        settings_dict['OPTIONS'].pop('pool', None)
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--documents', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args.clients, args.requests, args.documents)
+
+    print(f"{args.clients} clients concurrents, {args.requests} requetes chacun, {args.documents} documents")
+    for name, result in results.items():
+        latencies = ' | '.join(
+            f"{endpoint} p50 {values['p50'] * 1000:5.1f} ms p95 {values['p95'] * 1000:5.1f} ms"
+            for endpoint, values in result['endpoints'].items()
+        )
+        print(f"  {name:<26} {result['throughput']:6.0f} req/s | {latencies}")
@@ -0,0 +1,85 @@
+"""
+
+Benchmark de l'export zip : archive produite a la volee (download-zip sans archive a jour)
+contre la premiere construction de l'archive, sa mise a jour apres la modification d'un
+document (entrees inchangees recopiees sans recompression) et le telechargement de
+l'archive pre-construite.
+Usage : python -m benchmarks.bench_export [--documents 200] [--size 1000000] [--extension .txt]
+
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from benchmarks import measure, setup_django, test_database
+
+
+def run(documents=200, size=1000000, extension='.txt', repeat=3):
+    from django.test.utils import override_settings
+    from django.contrib.auth import get_user_model
+    from rest_framework.test import APIClient
+    from apps.documents.export import build_export
+    from apps.documents.models import Document
+    from apps.documents.services import DocumentProcessingService
+
+    media_root = tempfile.mkdtemp()
+    try:
+        with override_settings(MEDIA_ROOT=media_root, DOCUMENT_PROCESSING_BACKEND='database', ALLOWED_HOSTS=['*']):
+            user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+            os.makedirs(os.path.join(media_root, 'documents', 'math'))
+            # contenu compressible : la recompression a un vrai cout (pas de stockage brut)
+            words = b'equation algebre matrice vecteur theoreme calcul '
+            for index in range(documents):
+                name = f'documents/math/doc{index}{extension}'
+                with open(os.path.join(media_root, name), 'wb') as f:
+                    f.write((words * (size // len(words) + 1))[:size - 8] + b'%08d' % index)
+                Document.objects.create(title=f'Doc {index}', file=name, category='math', file_size=size, user=user)
+
+            streamed = measure(lambda: sum(len(chunk) for chunk in DocumentProcessingService.iter_documents_zip(user)), repeat=repeat)
+
+            start = time.perf_counter()
+            build_export(user.pk)
+            full_seconds = time.perf_counter() - start
+
+            def update_one():
+                document = Document.objects.filter(user=user).order_by('?').first()
+                document.save()
+                return build_export(user.pk)
+
+            update_one()
+            incremental = measure(update_one, repeat=repeat)
+
+            client = APIClient()
+            client.force_authenticate(user=user)
+            download = measure(lambda: sum(len(chunk) for chunk in client.get('/api/documents/download-zip/').streaming_content), repeat=repeat)
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    return {
+        'documents': documents,
+        'size': size,
+        'streamed_seconds': streamed['best'],
+        'full_build_seconds': full_seconds,
+        'incremental_seconds': incremental['best'],
+        'download_seconds': download['best'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=200)
+    parser.add_argument('--size', type=int, default=1000000)
+    parser.add_argument('--extension', default='.txt')
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        result = run(args.documents, args.size, args.extension)
+
+    print(f"{result['documents']} documents de {result['size'] // 1000} ko")
+    print(f"  zip a la volee                       : {result['streamed_seconds'] * 1000:8.0f} ms")
+    print(f"  premiere construction de l'archive   : {result['full_build_seconds'] * 1000:8.0f} ms")
+    print(f"  mise a jour apres 1 document modifie : {result['incremental_seconds'] * 1000:8.0f} ms")
+    print(f"  telechargement de l'archive          : {result['download_seconds'] * 1000:8.0f} ms")
@@ -0,0 +1,77 @@
+"""
+
+Benchmark de l'extraction PDF sur un document volumineux : concatenation `text +=`
+(ancienne implementation), lecture complete en flux (join) et classification avec
+budget de pages et arret anticipe.
+Usage : python -m benchmarks.bench_extraction [--pages 500]
+
+"""
+
+import argparse
+import os
+import tempfile
+import PyPDF2
+from benchmarks import measure, setup_django, test_database
+
+WORDS_PER_PAGE = 400
+
+
+def legacy_extract(file_path):
+    """Ancienne implementation : concatenation de chaines page apres page"""
+
+    text = ""
+    with open(file_path, 'rb') as file:
+        reader = PyPDF2.PdfReader(file)
+        for page in reader.pages:
+            text += page.extract_text() + "\n"
+    return text.strip()
+
+
+def run(pages=500, repeat=3):
+    setup_django()
+    with test_database():
+        return measure_extraction(pages, repeat)
+
+
+def measure_extraction(pages, repeat):
+    from django.conf import settings
+    from apps.documents.taxonomy import get_taxonomy
+    from apps.documents.testing import make_pdf, random_text
+    from apps.documents.utils import classify_document, classify_document_stream, extract_text_from_pdf, iter_text_from_pdf
+
+    vocabulary = [keyword for keywords in get_taxonomy().categories.values() for keyword in keywords]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'fixture.pdf')
+        with open(path, 'wb') as f:
+            f.write(make_pdf([random_text(WORDS_PER_PAGE, vocabulary, seed=page) for page in range(pages)]))
+
+        legacy = measure(lambda: classify_document(legacy_extract(path)), repeat=repeat)
+        streamed = measure(lambda: classify_document(extract_text_from_pdf(path)), repeat=repeat)
+        budgeted = measure(
+            lambda: classify_document_stream(iter_text_from_pdf(path), max_chunks=settings.DOCUMENT_CLASSIFICATION_MAX_PAGES),
+            repeat=repeat,
+        )
+        _, _, text, _ = classify_document_stream(iter_text_from_pdf(path), max_chunks=settings.DOCUMENT_CLASSIFICATION_MAX_PAGES)
+
+    return {
+        'pages': pages,
+        'legacy_seconds': legacy['best'],
+        'streamed_seconds': streamed['best'],
+        'budgeted_seconds': budgeted['best'],
+        'budgeted_chars': len(text),
+        'speedup': legacy['best'] / budgeted['best'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=500)
+    args = parser.parse_args()
+
+    result = run(args.pages)
+    print(f"PDF de {result['pages']} pages, extraction + classification")
+    print(f"  concatenation text +=     : {result['legacy_seconds'] * 1000:.0f} ms")
+    print(f"  flux complet (join)       : {result['streamed_seconds'] * 1000:.0f} ms")
+    print(f"  flux avec budget / arret  : {result['budgeted_seconds'] * 1000:.0f} ms "
+          f"({result['budgeted_chars']} caracteres lus)")
+    print(f"  acceleration              : x{result['speedup']:.1f}")
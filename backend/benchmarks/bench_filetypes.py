@@ -0,0 +1,77 @@
+"""
+
+Benchmark de la detection du type de fichier : nouveau handle libmagic et lecture
+du fichier complet a chaque appel (ancienne implementation) contre la detection
+sur l'en-tete avec handle reutilise.
+Usage : python -m benchmarks.bench_filetypes [--files 3000]
+
+"""
+
+import argparse
+import os
+import tempfile
+import magic
+from benchmarks import measure
+
+KINDS = ('pdf', 'docx', 'pptx', 'txt')
+
+
+def legacy_get_file_type(file_path):
+    """Ancienne implementation : un handle libmagic par appel, type MIME complet"""
+
+    return magic.Magic(mime=True).from_file(file_path)
+
+
+def build_files(directory, count):
+    from apps.documents.testing import make_docx, make_pdf, make_pptx, random_text
+
+    samples = {
+        'pdf': make_pdf([random_text(400, seed=page) for page in range(5)]),
+        'docx': make_docx(random_text(2000)),
+        'pptx': make_pptx([random_text(100, seed=slide) for slide in range(5)]),
+        'txt': random_text(2000).encode(),
+    }
+    paths = []
+    for index in range(count):
+        kind = KINDS[index % len(KINDS)]
+        # sans extension : la detection ne peut s'appuyer que sur le contenu
+        path = os.path.join(directory, f'fichier{index}')
+        with open(path, 'wb') as f:
+            f.write(samples[kind])
+        paths.append((path, kind))
+    return paths
+
+
+def run(files=3000, repeat=3):
+    from apps.documents.filetypes import MIME_TYPES, get_file_type
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_files(directory, files)
+
+        for path, kind in paths[:len(KINDS)]:
+            expected = 'unknown' if kind == 'txt' else kind
+            assert get_file_type(path) == expected, (path, kind)
+            assert MIME_TYPES.get(legacy_get_file_type(path), 'unknown') == expected, (path, kind)
+
+        legacy = measure(lambda: [legacy_get_file_type(path) for path, _ in paths], repeat=repeat)
+        sniffed = measure(lambda: [get_file_type(path) for path, _ in paths], repeat=repeat)
+    return {
+        'files': files,
+        'legacy_seconds': legacy['best'],
+        'sniffed_seconds': sniffed['best'],
+        'speedup': legacy['best'] / sniffed['best'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=3000)
+    args = parser.parse_args()
+
+    result = run(args.files)
+    print(f"{result['files']} fichiers (pdf, docx, pptx, texte)")
+    print(f"  magic.Magic() par appel : {result['legacy_seconds'] * 1000:.0f} ms "
+          f"({result['legacy_seconds'] / result['files'] * 1e6:.0f} us/fichier)")
+    print(f"  en-tete + handle reutilise : {result['sniffed_seconds'] * 1000:.0f} ms "
+          f"({result['sniffed_seconds'] / result['files'] * 1e6:.0f} us/fichier)")
+    print(f"  acceleration : x{result['speedup']:.1f}")
@@ -0,0 +1,89 @@
+"""
+
+Benchmark des requetes par mot-cle : parcours des listes JSON en Python contre le
+filtre keywords @> (index GIN jsonb_path_ops) et l'agregation des comptes par
+mot-cle en SQL.
+Usage : python -m benchmarks.bench_keywords [--documents 200000]
+
+"""
+
+import argparse
+import random
+from collections import Counter
+from benchmarks import measure, setup_django, test_database
+
+KEYWORD = 'algorithme'
+
+
+def create_documents(user, count, batch_size=10000):
+    from apps.documents.models import Document
+    from apps.documents.taxonomy import get_taxonomy
+
+    rng = random.Random(0)
+    taxonomy = [(category, keywords) for category, keywords in get_taxonomy().categories.items() if keywords]
+    for start in range(0, count, batch_size):
+        documents = []
+        for index in range(start, min(start + batch_size, count)):
+            category, keywords = rng.choice(taxonomy)
+            documents.append(Document(
+                title       = f'Document {index}',
+                file        = f'documents/{category}/doc{index}.pdf',
+                category    = category,
+                keywords    = rng.sample(keywords, rng.randint(1, 3)),
+                file_type   = 'pdf',
+                file_size   = 1000,
+                status      = Document.STATUS_DONE,
+                user        = user,
+            ))
+        Document.objects.bulk_create(documents)
+
+
+def run(documents=200000, repeat=3):
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from apps.documents.models import Document
+    from apps.documents.stats import keyword_facets
+
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+    create_documents(user, documents)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    def scan_filter():
+        return [pk for pk, keywords in Document.objects.filter(user=user).values_list('pk', 'keywords') if KEYWORD in keywords]
+
+    def index_filter():
+        return list(Document.objects.filter(user=user, keywords__contains=[KEYWORD]).values_list('pk', flat=True))
+
+    def scan_facets():
+        counts = Counter()
+        for keywords in Document.objects.filter(user=user).values_list('keywords', flat=True):
+            counts.update(keywords)
+        return counts
+
+    assert sorted(scan_filter()) == sorted(index_filter())
+    assert {row['keyword']: row['count'] for row in keyword_facets(user.pk)} == scan_facets()
+    return {
+        'documents': documents,
+        'matches': len(index_filter()),
+        'scan_filter_seconds': measure(scan_filter, repeat=repeat)['best'],
+        'index_filter_seconds': measure(index_filter, repeat=repeat)['best'],
+        'scan_facets_seconds': measure(scan_facets, repeat=repeat)['best'],
+        'sql_facets_seconds': measure(lambda: keyword_facets(user.pk), repeat=repeat)['best'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=200000)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        result = run(args.documents)
+
+    print(f"{result['documents']} documents, {result['matches']} contiennent '{KEYWORD}'")
+    print(f"  filtre   : parcours Python {result['scan_filter_seconds'] * 1000:8.1f} ms"
+          f" | keywords @> (GIN) {result['index_filter_seconds'] * 1000:7.1f} ms")
+    print(f"  facettes : parcours Python {result['scan_facets_seconds'] * 1000:8.1f} ms"
+          f" | agregation SQL    {result['sql_facets_seconds'] * 1000:7.1f} ms")
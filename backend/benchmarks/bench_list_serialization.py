@@ -0,0 +1,89 @@
+"""
+
+Benchmark de la serialisation de la liste des documents : instances et DocumentListSerializer
+rendus par le JSONRenderer de DRF, contre les colonnes lues avec .values(),
+serialize_document_rows et FastJSONRenderer (orjson s'il est installe), puis l'endpoint complet.
+Usage : python -m benchmarks.bench_list_serialization [--documents 2000] [--page-sizes 100 500 1000]
+
+"""
+
+import argparse
+from benchmarks import measure, setup_django, test_database
+from benchmarks.bench_pagination import create_documents
+
+
+def run(documents=2000, page_sizes=(100, 500, 1000), repeat=10):
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from apps.documents.models import Document
+    from apps.documents.renderers import FastJSONRenderer, orjson
+    from apps.documents.serializers import DOCUMENT_LIST_COLUMNS, DocumentListSerializer, serialize_document_rows
+    from apps.documents.views import DocumentListView
+
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+    create_documents(user, documents)
+    queryset = Document.objects.filter(user=user)
+
+    factory = APIRequestFactory()
+    view = DocumentListView.as_view()
+
+    def fetch(limit):
+        request = factory.get('/api/documents/', {'limit': limit})
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        assert response.status_code == 200, response.status_code
+
+    results = []
+    for page_size in page_sizes:
+        instances = list(queryset[:page_size])
+        rows = list(queryset.values(*DOCUMENT_LIST_COLUMNS)[:page_size])
+        assert serialize_document_rows(rows) == DocumentListSerializer(instances, many=True).data
+
+        serializer = measure(lambda: DocumentListSerializer(instances, many=True).data, repeat=repeat)
+        lean = measure(lambda: serialize_document_rows(rows), repeat=repeat)
+        data = serialize_document_rows(rows)
+        json_render = measure(lambda: JSONRenderer().render(data), repeat=repeat)
+        fast_render = measure(lambda: FastJSONRenderer().render(data), repeat=repeat)
+        # chemin complet : lecture en base comprise
+        before = measure(
+            lambda: JSONRenderer().render(DocumentListSerializer(queryset[:page_size], many=True).data), repeat=repeat,
+        )
+        after = measure(
+            lambda: FastJSONRenderer().render(serialize_document_rows(queryset.values(*DOCUMENT_LIST_COLUMNS)[:page_size])),
+            repeat=repeat,
+        )
+        endpoint = measure(lambda: fetch(page_size), repeat=repeat)
+        results.append({
+            'page_size': page_size,
+            'serializer_seconds': serializer['best'],
+            'rows_seconds': lean['best'],
+            'json_render_seconds': json_render['best'],
+            'fast_render_seconds': fast_render['best'],
+            'before_seconds': before['best'],
+            'after_seconds': after['best'],
+            'endpoint_seconds': endpoint['best'],
+        })
+    return results, orjson is not None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=2000)
+    parser.add_argument('--page-sizes', type=int, nargs='+', default=[100, 500, 1000])
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results, has_orjson = run(args.documents, args.page_sizes)
+
+    print(f"{args.documents} documents, orjson {'installe' if has_orjson else 'absent'}")
+    for result in results:
+        print(f"  page de {result['page_size']:>4} :")
+        print(f"    serialisation : DocumentListSerializer {result['serializer_seconds'] * 1000:7.2f} ms"
+              f" | serialize_document_rows {result['rows_seconds'] * 1000:6.2f} ms")
+        print(f"    rendu JSON    : JSONRenderer           {result['json_render_seconds'] * 1000:7.2f} ms"
+              f" | FastJSONRenderer        {result['fast_render_seconds'] * 1000:6.2f} ms")
+        print(f"    requete, serialisation et rendu : {result['before_seconds'] * 1000:7.2f} ms"
+              f" -> {result['after_seconds'] * 1000:6.2f} ms | endpoint {result['endpoint_seconds'] * 1000:6.2f} ms")
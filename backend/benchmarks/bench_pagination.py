@@ -0,0 +1,102 @@
+"""
+
+Benchmark de DocumentListView : pagination limit/offset contre pagination par curseur
+a differentes profondeurs, sur une base de test remplie de documents synthetiques.
+Usage : python -m benchmarks.bench_pagination [--documents 110000]
+
+"""
+
+import argparse
+import random
+from urllib.parse import parse_qsl, urlsplit
+from benchmarks import measure, setup_django, test_database
+
+OFFSETS = [0, 1000, 10000, 100000]
+PAGE_SIZE = 10
+
+
+def create_documents(user, count, batch_size=5000):
+    from apps.documents.models import Document
+    from apps.documents.taxonomy import get_taxonomy
+
+    rng = random.Random(0)
+    categories = list(get_taxonomy().categories)
+    for start in range(0, count, batch_size):
+        Document.objects.bulk_create([
+            Document(
+                title       = f'Document {index}',
+                file        = f'documents/autres/doc{index}.pdf',
+                category    = rng.choice(categories),
+                file_type   = 'pdf',
+                file_size   = rng.randint(1000, 10 ** 7),
+                status      = Document.STATUS_DONE,
+                user        = user,
+            )
+            for index in range(start, min(start + batch_size, count))
+        ])
+
+
+def run(documents=110000, repeat=5):
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework.pagination import Cursor
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from apps.documents.models import Document
+    from apps.documents.pagination import DocumentCursorPagination
+    from apps.documents.views import DocumentListView
+
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+    create_documents(user, documents)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    factory = APIRequestFactory()
+    view = DocumentListView.as_view()
+
+    def fetch(params):
+        request = factory.get('/api/documents/', params)
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        assert response.status_code == 200, response.status_code
+
+    paginator = DocumentCursorPagination()
+    paginator.base_url = 'http://testserver/api/documents/'
+    ordered = Document.objects.filter(user=user).order_by(*paginator.ordering)
+
+    results = []
+    for offset in OFFSETS:
+        if offset >= documents:
+            break
+        offset_timing = measure(lambda: fetch({'limit': PAGE_SIZE, 'offset': offset}), repeat=repeat)
+
+        # curseur equivalent a la page commencant a `offset`
+        instance = ordered[offset]
+        position = paginator._get_position_from_instance(instance, paginator.ordering)
+        cursor_url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+        cursor_query = dict(parse_qsl(urlsplit(cursor_url).query))
+        cursor_query['limit'] = PAGE_SIZE
+        cursor_timing = measure(lambda: fetch(cursor_query), repeat=repeat)
+
+        results.append({
+            'offset': offset,
+            'limit_offset_seconds': offset_timing['best'],
+            'cursor_seconds': cursor_timing['best'],
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=110000)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args.documents)
+
+    print(f"{args.documents} documents, pages de {PAGE_SIZE}")
+    for result in results:
+        print(f"  offset {result['offset']:>7} : limit/offset {result['limit_offset_seconds'] * 1000:7.1f} ms"
+              f" | curseur {result['cursor_seconds'] * 1000:6.1f} ms")
@@ -0,0 +1,99 @@
+"""
+
+Benchmark de la recherche dans le contenu des documents : filtre ILIKE sur le texte
+(sans index) contre la recherche plein texte sur le tsvector indexe en GIN, page de
+resultats classee et extraits surlignes compris.
+Usage : python -m benchmarks.bench_search [--documents 1000000] [--words 60]
+
+"""
+
+import argparse
+import random
+from benchmarks import measure, setup_django, test_database
+
+QUERIES = ['algorithme', 'révolution', 'équation calcul', '"guerre mondiale"']
+PAGE_SIZE = 10
+
+
+def create_documents(user, count, words, batch_size=10000):
+    from apps.documents.models import Document, DocumentContent
+    from apps.documents.testing import FILLER_WORDS
+
+    rng = random.Random(0)
+    vocabulary = FILLER_WORDS + [
+        'algorithme', 'programmation', 'révolution', 'siècle', 'équation', 'calcul', 'géométrie',
+        'guerre', 'mondiale', 'empire', 'théorème', 'fonction', 'données', 'réseau', 'histoire',
+    ] + [f'terme{index}' for index in range(5000)]
+    for start in range(0, count, batch_size):
+        documents = Document.objects.bulk_create([
+            Document(
+                title       = f'Document {index}',
+                file        = f'documents/autres/doc{index}.pdf',
+                file_type   = 'pdf',
+                file_size   = 1000,
+                status      = Document.STATUS_DONE,
+                user        = user,
+            )
+            for index in range(start, min(start + batch_size, count))
+        ])
+        DocumentContent.objects.bulk_create([
+            DocumentContent(document=document, text=' '.join(rng.choices(vocabulary, k=words)))
+            for document in documents
+        ])
+
+
+def run(documents=1000000, words=60, repeat=3):
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from apps.documents.models import Document
+    from apps.documents.views import DocumentListView
+
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+    create_documents(user, documents, words)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    factory = APIRequestFactory()
+    view = DocumentListView.as_view()
+
+    def search(query):
+        request = factory.get('/api/documents/', {'q': query, 'limit': PAGE_SIZE})
+        force_authenticate(request, user=user)
+        response = view(request)
+        response.render()
+        assert response.status_code == 200, response.status_code
+        return response.data['count']
+
+    def scan(query):
+        # premier terme seulement : l'equivalent naif d'une recherche par sous-chaine
+        term = query.strip('"').split()[0]
+        page = Document.objects.filter(user=user, content__text__icontains=term).order_by('-created_at', '-id')
+        return page.count(), list(page[:PAGE_SIZE].values_list('pk', flat=True))
+
+    results = []
+    for query in QUERIES:
+        count = search(query)
+        results.append({
+            'query': query,
+            'count': count,
+            'ilike_seconds': measure(lambda: scan(query), repeat=repeat)['best'],
+            'search_seconds': measure(lambda: search(query), repeat=repeat)['best'],
+        })
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=1000000)
+    parser.add_argument('--words', type=int, default=60)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        results = run(args.documents, args.words)
+
+    print(f"{args.documents} documents de {args.words} mots, page de {PAGE_SIZE} resultats")
+    for result in results:
+        print(f"  {result['query']:<18} {result['count']:>8} resultats : ILIKE {result['ilike_seconds'] * 1000:8.1f} ms"
+              f" | plein texte (GIN) {result['search_seconds'] * 1000:7.1f} ms")
@@ -0,0 +1,87 @@
+"""
+
+Benchmark du classifieur TF-IDF : entrainement, chargement du modele (tableaux projetes
+en memoire) et classement d'un lot texte par texte contre un seul produit matriciel.
+Usage : python -m benchmarks.bench_tfidf [--documents 20000] [--vocabulary 50000] [--batch 2000]
+
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+from benchmarks import measure, setup_django
+
+
+def word(index):
+    """Mot distinct pour chaque indice (lettres seulement : les chiffres ne sont pas des mots)"""
+
+    letters = ''
+    while True:
+        index, rest = divmod(index, 26)
+        letters += 'abcdefghijklmnopqrstuvwxyz'[rest]
+        if not index:
+            return 'mot' + letters
+
+
+def build_corpus(documents, vocabulary_size, words=300, categories=8, seed=0):
+    """Textes synthetiques : chaque categorie tire ses mots dans une zone du vocabulaire"""
+
+    rng = random.Random(seed)
+    vocabulary = [word(index) for index in range(vocabulary_size)]
+    zone = vocabulary_size // categories
+    corpus = []
+    for index in range(documents):
+        category = index % categories
+        own = vocabulary[category * zone:(category + 1) * zone]
+        text = ' '.join(rng.choice(own) if rng.random() < 0.3 else rng.choice(vocabulary) for _ in range(words))
+        corpus.append((text, f'categorie{category}'))
+    return corpus
+
+
+def run(documents=20000, vocabulary=50000, batch=2000, repeat=3):
+    from apps.documents.tfidf import TfidfClassifier, train
+
+    corpus = build_corpus(documents, vocabulary)
+    texts = [text for text, _ in corpus[:batch]]
+    model_dir = os.path.join(tempfile.mkdtemp(), 'model')
+    try:
+        train_seconds = measure(lambda: train(lambda: iter(corpus), max_features=vocabulary), repeat=1)['best']
+        model = train(lambda: iter(corpus), max_features=vocabulary)
+        model.save(model_dir)
+
+        model = TfidfClassifier.load(model_dir)
+        one_by_one = measure(lambda: [model.predict([text]) for text in texts], repeat=repeat)
+        batched = measure(lambda: model.predict(texts), repeat=repeat)
+        accuracy = sum(p == c for p, (_, c) in zip(model.predict(texts), corpus)) / batch
+        return {
+            'documents': documents,
+            'vocabulary': len(model.vocabulary),
+            'categories': len(model.categories),
+            'batch': batch,
+            'accuracy': accuracy,
+            'train_seconds': train_seconds,
+            'load_seconds': measure(lambda: TfidfClassifier.load(model_dir), repeat=repeat)['best'],
+            'single_seconds': one_by_one['best'],
+            'batch_seconds': batched['best'],
+        }
+    finally:
+        shutil.rmtree(os.path.dirname(model_dir), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--vocabulary', type=int, default=50000)
+    parser.add_argument('--batch', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    result = run(args.documents, args.vocabulary, args.batch)
+    print(f"{result['documents']} documents, {result['vocabulary']} mots, {result['categories']} categories")
+    print(f"  entrainement         : {result['train_seconds']:.1f} s")
+    print(f"  chargement           : {result['load_seconds'] * 1000:.1f} ms")
+    print(f"  {result['batch']} textes          : un par un {result['single_seconds'] * 1000:.0f} ms"
+          f" | un produit matriciel {result['batch_seconds'] * 1000:.0f} ms"
+          f" (precision {result['accuracy']:.1%})")
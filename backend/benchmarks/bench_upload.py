@@ -0,0 +1,93 @@
+"""
+
+Benchmark de debit d'ingestion : un fichier par requete (/api/documents/upload/)
+contre l'upload par lot (/api/documents/upload/batch/), authentification JWT et
+pile de middlewares comprises. Le traitement est mis en file (backend 'database')
+et n'est pas mesure.
+Usage : python -m benchmarks.bench_upload [--files 400] [--batch-size 50]
+
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from benchmarks import setup_django, test_database
+
+
+def build_files(count):
+    from apps.documents.testing import make_docx, random_text
+
+    # contenus distincts : la deduplication ne doit pas fausser la mesure
+    return [(f'doc{index}.docx', make_docx(random_text(300, seed=index))) for index in range(count)]
+
+
+def run(files=400, batch_size=50):
+    from django.contrib.auth import get_user_model
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from apps.documents.models import Document
+
+    content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    samples = build_files(files)
+
+    def upload_single(prefix):
+        for name, data in samples:
+            response = client.post(
+                '/api/documents/upload/',
+                {'title': name, 'file': SimpleUploadedFile(f'{prefix}{name}', data, content_type=content_type)},
+                format='multipart',
+            )
+            assert response.status_code == 202, response.status_code
+
+    def upload_batch(prefix):
+        for start in range(0, len(samples), batch_size):
+            batch = [
+                SimpleUploadedFile(f'{prefix}{name}', data, content_type=content_type)
+                for name, data in samples[start:start + batch_size]
+            ]
+            response = client.post('/api/documents/upload/batch/', {'files': batch}, format='multipart')
+            assert response.status_code == 202 and response.data['rejected'] == 0, response.data
+
+    media_root = tempfile.mkdtemp()
+    timings = {}
+    try:
+        with override_settings(MEDIA_ROOT=media_root, DOCUMENT_PROCESSING_BACKEND='database', ALLOWED_HOSTS=['*']):
+            for label, upload in (('single', upload_single), ('batch', upload_batch)):
+                # chaque passe repart d'une base sans documents (pas de deduplication entre passes)
+                Document.objects.all().delete()
+                start = time.perf_counter()
+                upload(label)
+                timings[label] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+    return {
+        'files': files,
+        'batch_size': batch_size,
+        'single_seconds': timings['single'],
+        'batch_seconds': timings['batch'],
+        'single_rate': files / timings['single'],
+        'batch_rate': files / timings['batch'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--files', type=int, default=400)
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        result = run(args.files, args.batch_size)
+
+    print(f"{result['files']} fichiers DOCX, lots de {result['batch_size']}")
+    print(f"  un fichier par requete : {result['single_seconds']:.2f} s ({result['single_rate']:.0f} fichiers/s)")
+    print(f"  upload par lot         : {result['batch_seconds']:.2f} s ({result['batch_rate']:.0f} fichiers/s)")
+    print(f"  acceleration           : x{result['single_seconds'] / result['batch_seconds']:.1f}")
@@ -0,0 +1,234 @@
+"""
+
+Suite de benchmarks de bout en bout : upload -> extraction -> classification -> liste.
+Mesure, sur des fixtures PDF/DOCX/PPTX synthetiques de taille configurable :
+    - l'extraction du texte par format (extract_text_from_pdf/docx/pptx)
+    - la classification du texte extrait (classify_document)
+    - le traitement complet d'un document deja enregistre (process_document), par format
+    - les endpoints upload, liste, statistiques et zip via le client de test DRF
+      (authentification JWT et middlewares compris)
+Les resultats (meilleur temps de chaque mesure) sont ecrits en JSON et compares a une
+reference : le code de sortie vaut 1 si une mesure depasse la reference de plus du seuil.
+La base est une base PostgreSQL de test temporaire (index GIN, jsonb et DISTINCT ON ne
+sont pas disponibles sous SQLite). La reference depend de la machine : la regenerer avec
+--update-baseline sur la machine qui execute la comparaison.
+Usage : python -m benchmarks.suite [--pages 20] [--words 400] [--documents 500] [--repeat 10]
+                                   [--output resultats.json] [--baseline benchmarks/baseline.json]
+                                   [--threshold 0.5] [--update-baseline]
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timezone
+from benchmarks import measure, setup_django, test_database
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# documents reels (fixtures) inclus dans le zip, par format
+ZIP_FILES_PER_TYPE = 10
+
+
+def build_fixtures(directory, pages, words):
+    """Ecrit un fichier par format (pages PDF, diapositives PPTX, paragraphes DOCX) : {type: chemin}"""
+
+    from apps.documents.taxonomy import get_taxonomy
+    from apps.documents.testing import make_docx, make_pdf, make_pptx, random_text
+
+    vocabulary = [keyword for keywords in get_taxonomy().categories.values() for keyword in keywords]
+    texts = [random_text(words, vocabulary, seed=page) for page in range(pages)]
+    contents = {'pdf': make_pdf(texts), 'docx': make_docx('\n'.join(texts)), 'pptx': make_pptx(texts)}
+    paths = {}
+    for file_type, data in contents.items():
+        paths[file_type] = os.path.join(directory, 'documents', f'fixture.{file_type}')
+        os.makedirs(os.path.dirname(paths[file_type]), exist_ok=True)
+        with open(paths[file_type], 'wb') as f:
+            f.write(data)
+    return paths
+
+
+def create_documents(user, count, batch_size=5000):
+    """Documents sans fichier pour les endpoints liste et statistiques"""
+
+    from apps.documents.models import Document
+    from apps.documents.taxonomy import get_taxonomy
+
+    categories = list(get_taxonomy().categories)
+    for start in range(0, count, batch_size):
+        Document.objects.bulk_create([
+            Document(
+                title       = f'Document {index}',
+                file        = f'documents/{categories[index % len(categories)]}/absent{index}.pdf',
+                category    = categories[index % len(categories)],
+                keywords    = [],
+                file_type   = 'pdf',
+                file_size   = 1000,
+                status      = Document.STATUS_DONE,
+                user        = user,
+            )
+            for index in range(start, min(start + batch_size, count))
+        ])
+
+
+def run(pages=20, words=400, documents=500, repeat=10):
+    from django.contrib.auth import get_user_model
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from apps.documents.models import Document
+    from apps.documents.services import DocumentProcessingService
+    from apps.documents.testing import make_docx, random_text
+    from apps.documents.utils import (
+        classify_document, extract_text_from_docx, extract_text_from_pdf, extract_text_from_pptx,
+    )
+
+    extractors = {'pdf': extract_text_from_pdf, 'docx': extract_text_from_docx, 'pptx': extract_text_from_pptx}
+    content_type = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+    media_root = tempfile.mkdtemp()
+    results = {}
+
+    def record(name, func):
+        func()  # premier appel hors mesure (chargement des modules, processus d'extraction)
+        results[name] = measure(func, repeat=repeat)
+
+    try:
+        with override_settings(
+            MEDIA_ROOT                  = media_root,
+            DOCUMENT_EXTRACTION_CACHE   = {'BACKEND': 'none'},
+            DOCUMENT_PROCESSING_BACKEND = 'database',
+            ALLOWED_HOSTS               = ['*'],
+        ):
+            paths = build_fixtures(media_root, pages, words)
+            for file_type, path in paths.items():
+                record(f'extract_text.{file_type}', lambda: extractors[file_type](path))
+            text = extract_text_from_pdf(paths['pdf'])
+            record('classify_document', lambda: classify_document(text))
+
+            user = get_user_model().objects.create_user(username='bench', email='bench@example.com', password='bench-pass-123')
+            for file_type, path in paths.items():
+                document = Document.objects.create(
+                    user=user, title=f'Fixture {file_type}', file=os.path.relpath(path, media_root),
+                    file_size=os.path.getsize(path), status=Document.STATUS_PENDING,
+                )
+                record(f'process_document.{file_type}', lambda: DocumentProcessingService.process_document(document))
+                copies = []
+                for index in range(ZIP_FILES_PER_TYPE - 1):
+                    copy = os.path.join(os.path.dirname(path), f'copie{index}.{file_type}')
+                    shutil.copyfile(path, copy)
+                    copies.append(Document(
+                        user=user, title=f'Copie {index}', file=os.path.relpath(copy, media_root),
+                        file_size=document.file_size, file_type=file_type, category=document.category,
+                        status=Document.STATUS_DONE,
+                    ))
+                Document.objects.bulk_create(copies)
+            create_documents(user, documents)
+
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+            # contenus distincts : un fichier deja connu ne serait pas stocke a nouveau
+            uploads = iter([make_docx(random_text(words, seed=-index)) for index in range(repeat + 1)])
+
+            def upload():
+                data = next(uploads)
+                response = client.post(
+                    '/api/documents/upload/',
+                    {'title': 'Upload', 'file': SimpleUploadedFile('upload.docx', data, content_type=content_type)},
+                    format='multipart',
+                )
+                assert response.status_code == 202, response.status_code
+
+            def get(url):
+                response = client.get(url)
+                assert response.status_code == 200, response.status_code
+                return response
+
+            record('endpoint.upload', upload)
+            record('endpoint.list', lambda: get('/api/documents/'))
+            record('endpoint.stats', lambda: get('/api/documents/stats/'))
+            record('endpoint.download_zip', lambda: b''.join(get('/api/documents/download-zip/').streaming_content))
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Compare chaque mesure a la reference : [(nom, reference, mesure, rapport, regression)]"""
+
+    rows = []
+    for name, timing in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            rows.append((name, None, timing['best'], None, False))
+            continue
+        ratio = timing['best'] / reference['best']
+        rows.append((name, reference['best'], timing['best'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def report(parameters, results):
+    from django.db import connection
+
+    return {
+        'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': f'{connection.vendor} {connection.pg_version if connection.vendor == "postgresql" else ""}'.strip(),
+        },
+        'parameters': parameters,
+        'results': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20, help="pages, diapositives ou paragraphes par fixture")
+    parser.add_argument('--words', type=int, default=400, help="mots par page")
+    parser.add_argument('--documents', type=int, default=500, help="documents en base pour la liste et les statistiques")
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--output', help="fichier JSON des resultats")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--threshold', type=float, default=0.5, help="ralentissement tolere (0.5 : +50%%)")
+    parser.add_argument('--update-baseline', action='store_true', help="enregistre les resultats comme reference")
+    args = parser.parse_args()
+
+    parameters = {'pages': args.pages, 'words': args.words, 'documents': args.documents, 'repeat': args.repeat}
+    setup_django()
+    with test_database():
+        output = report(parameters, run(args.pages, args.words, args.documents, args.repeat))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(output, f, indent=2)
+            f.write('\n')
+        print(f"Reference enregistree dans {args.baseline}")
+
+    baseline = {}
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get('parameters') != parameters:
+            print(f"Attention : parametres differents de la reference {stored.get('parameters')}")
+        baseline = stored['results']
+
+    rows = compare(output['results'], baseline, args.threshold)
+    print(f"{args.pages} pages de {args.words} mots, {args.documents} documents, meilleur de {args.repeat}")
+    for name, reference, current, ratio, regressed in rows:
+        line = f"  {name:<28} {current * 1000:9.2f} ms"
+        if ratio is not None:
+            line += f" | reference {reference * 1000:9.2f} ms ({ratio - 1:+.0%})"
+        print(line + ("  REGRESSION" if regressed else ""))
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} mesure(s) au-dela du seuil de {args.threshold:.0%} : {', '.join(regressions)}")
+        sys.exit(1)
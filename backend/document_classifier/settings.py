@@ -43,6 +43,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -61,6 +62,8 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # en tete : compte aussi les requetes SQL des middlewares suivants (session, utilisateur)
+    'apps.documents.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -100,9 +103,29 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # connexions persistantes : duree de vie en secondes (0 : une connexion par requete),
+        # verifiees avant reutilisation au debut de chaque requete
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': os.getenv('DB_CONN_HEALTH_CHECKS', 'True').lower() == 'true',
+        'OPTIONS': {},
     }
 }
 
+# Pool de connexions psycopg (optionnel, necessite psycopg 3 : pip install "psycopg[binary,pool]").
+# Partage par les threads d'un processus ; remplace les connexions persistantes
+if os.getenv('DB_POOL', 'False').lower() == 'true':
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+    }
+
+# Budget de requetes SQL par requete HTTP (voir apps/documents/middleware.py) : les requetes
+# qui le depassent sont journalisees (0 : pas de limite)
+DB_QUERY_BUDGET = int(os.getenv('DB_QUERY_BUDGET', '50'))
+DB_QUERY_TIME_BUDGET = float(os.getenv('DB_QUERY_TIME_BUDGET', '0.5'))  # secondes cumulees
+
 # Validation des variables d'environnement requises
 required_db_vars = ['DB_NAME', 'DB_USER', 'DB_PASSWORD', 'DB_HOST', 'DB_PORT']
 missing_vars = [var for var in required_db_vars if not os.getenv(var)]
@@ -111,6 +134,27 @@ if missing_vars:
     raise ValueError(f"Variables d'environnement manquantes pour la base de données: {', '.join(missing_vars)}")
 
 
+# Cache
+# CACHE_BACKEND : 'locmem' (propre a chaque processus : developpement et tests), 'file'
+# (CACHE_LOCATION = repertoire, partage par les processus d'une machine) ou 'redis'
+# (CACHE_LOCATION = redis://hote:6379/0, partage par toutes les machines ; paquet redis requis)
+cache_backend = os.getenv('CACHE_BACKEND', 'locmem')
+cache_backends = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+if cache_backend not in cache_backends:
+    raise ValueError(f"CACHE_BACKEND inconnu : {cache_backend} ({', '.join(cache_backends)})")
+
+CACHES = {
+    'default': {
+        'BACKEND': cache_backends[cache_backend],
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'django') if cache_backend == 'file' else ''),
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -209,13 +253,98 @@ LOGGING = {
 
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# au-dela de FILE_UPLOAD_MAX_MEMORY_SIZE, Django ecrit l'upload dans un fichier temporaire
+# qui est ensuite deplace (pas copie) dans MEDIA_ROOT : FILE_UPLOAD_TEMP_DIR doit etre sur
+# le meme systeme de fichiers que MEDIA_ROOT pour que chaque upload ne soit ecrit qu'une fois
+DOCUMENT_MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.getenv('FILE_UPLOAD_MAX_MEMORY_SIZE', 2621440))  # 2.5MB
+FILE_UPLOAD_TEMP_DIR = os.getenv('FILE_UPLOAD_TEMP_DIR')
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024   # 10MB
+# upload par lot (/api/documents/upload/batch/) : fichiers par requete, archive zip comprise
+DOCUMENT_BATCH_MAX_FILES = 100
+DATA_UPLOAD_MAX_NUMBER_FILES = DOCUMENT_BATCH_MAX_FILES
+# upload en morceaux reprenable (/api/documents/upload/sessions/) pour les documents volumineux :
+# les morceaux sont assembles dans DOCUMENT_CHUNKED_UPLOAD_DIR (par defaut MEDIA_ROOT/uploads,
+# a garder sur le meme systeme de fichiers que MEDIA_ROOT pour deplacer le fichier sans copie)
+DOCUMENT_CHUNKED_UPLOAD_MAX_SIZE = int(os.getenv('DOCUMENT_CHUNKED_UPLOAD_MAX_SIZE', 500 * 1024 * 1024))  # 500MB
+DOCUMENT_UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024  # 8MB par requete
+DOCUMENT_CHUNKED_UPLOAD_DIR = os.getenv('DOCUMENT_CHUNKED_UPLOAD_DIR')
+DOCUMENT_CHUNKED_UPLOAD_EXPIRY = 24 * 3600  # secondes d'inactivite avant purge d'un upload inacheve
+
+# Traitement asynchrone des documents (voir apps/documents/tasks.py)
+# 'thread' : pool de threads dans le processus web
+# 'database' : file en base consommee par `python manage.py process_documents_queue`
+# 'immediate' : traitement synchrone dans la requete
+DOCUMENT_PROCESSING_BACKEND = os.getenv('DOCUMENT_PROCESSING_BACKEND', 'thread')
+DOCUMENT_PROCESSING_WORKERS = int(os.getenv('DOCUMENT_PROCESSING_WORKERS', '4'))
+DOCUMENT_PROCESSING_JOB_TIMEOUT = 600  # secondes avant de reprendre une tache abandonnee
+# executions interrompues (worker tue ou bloque) au-dela desquelles une tache n'est plus reprise :
+# la tache et son document passent en echec
+DOCUMENT_PROCESSING_JOB_MAX_ATTEMPTS = int(os.getenv('DOCUMENT_PROCESSING_JOB_MAX_ATTEMPTS', '3'))
+
+# Export zip : stocker sans recompression les formats deja compresses (PDF, DOCX, PPTX)
+DOCUMENT_ZIP_STORE_COMPRESSED = os.getenv('DOCUMENT_ZIP_STORE_COMPRESSED', 'True').lower() == 'true'
+
+# Export zip construit en arriere-plan et mis a jour par increments (voir apps/documents/export.py),
+# archives conservees dans DOCUMENT_EXPORT_DIR (par defaut MEDIA_ROOT/exports)
+DOCUMENT_EXPORT_DIR = os.getenv('DOCUMENT_EXPORT_DIR')
+
+# Statistiques : compteurs materialises par utilisateur/categorie (sinon une agregation GROUP BY)
+# apres activation, initialiser les compteurs avec `python manage.py rebuild_document_stats`
+DOCUMENT_STATS_USE_COUNTERS = os.getenv('DOCUMENT_STATS_USE_COUNTERS', 'True').lower() == 'true'
+
+# Cache des reponses de la liste, du detail et des statistiques, invalide par utilisateur a chaque
+# ecriture (voir apps/documents/response_cache.py). Le cache doit etre partage par le serveur web
+# et les workers : active par defaut seulement avec un CACHE_BACKEND autre que 'locmem'
+DOCUMENT_RESPONSE_CACHE = {
+    'ENABLED': os.getenv('DOCUMENT_RESPONSE_CACHE_ENABLED', str(cache_backend != 'locmem')).lower() == 'true',
+    'ALIAS': 'default',
+    'TIMEOUT': int(os.getenv('DOCUMENT_RESPONSE_CACHE_TIMEOUT', '300')),
+}
+
+# Cache du texte extrait, indexe par empreinte du contenu (voir apps/documents/extraction_cache.py)
+# BACKEND : 'disk', 'django' (LOCATION = alias de CACHES) ou 'none'
+DOCUMENT_EXTRACTION_CACHE = {
+    'BACKEND': os.getenv('DOCUMENT_EXTRACTION_CACHE_BACKEND', 'disk'),
+    'LOCATION': os.getenv('DOCUMENT_EXTRACTION_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'extraction')),
+    'MAX_SIZE': int(os.getenv('DOCUMENT_EXTRACTION_CACHE_MAX_SIZE', 512 * 1024 * 1024)),
+    'TIMEOUT': None,
+}
+
+# Budget de lecture pour la classification (None : pas de limite). La lecture s'arrete aussi
+# des que la categorie en tete a DECISIVE_MARGIN occurrences de mots-cles d'avance
+DOCUMENT_CLASSIFICATION_MAX_PAGES = 50
+DOCUMENT_CLASSIFICATION_MAX_CHARS = 200000
+DOCUMENT_CLASSIFICATION_DECISIVE_MARGIN = 25
+
+# Extraction du texte dans des processus isoles (voir apps/documents/extraction.py)
+# WORKERS = 0 : extraction dans le processus appelant, sans delai ni limite memoire
+DOCUMENT_EXTRACTION_WORKERS = int(os.getenv('DOCUMENT_EXTRACTION_WORKERS', '2'))
+DOCUMENT_EXTRACTION_TIMEOUT = int(os.getenv('DOCUMENT_EXTRACTION_TIMEOUT', '60'))  # secondes par fichier
+DOCUMENT_EXTRACTION_MAX_MEMORY = int(os.getenv('DOCUMENT_EXTRACTION_MAX_MEMORY', 1024 * 1024 * 1024))  # octets par processus
+DOCUMENT_EXTRACTION_MAX_JOBS_PER_WORKER = 200
+
+# Recherche plein texte (?q= sur /api/documents/) : texte extrait conserve jusqu'a MAX_CHARS
+# caracteres (un tsvector PostgreSQL est limite a 1MB), indexe en arriere-plan apres le classement
+DOCUMENT_SEARCH_MAX_CHARS = int(os.getenv('DOCUMENT_SEARCH_MAX_CHARS', '500000'))
+
+# Moteur de classification (voir apps/documents/classifier.py)
+# BACKEND : 'keyword' (mots-cles de la taxonomie) ou 'tfidf' (modele entraine par
+# `python manage.py train_classifier` et enregistre dans MODEL_DIR)
+DOCUMENT_CLASSIFIER = {
+    'BACKEND': os.getenv('DOCUMENT_CLASSIFIER_BACKEND', 'keyword'),
+    'MODEL_DIR': os.getenv('DOCUMENT_CLASSIFIER_MODEL_DIR', os.path.join(BASE_DIR, 'classifier_model')),
+}
+
+# Classification de textes bruts par lot (POST /api/documents/classify/)
+DOCUMENT_CLASSIFY_MAX_TEXTS = 1000
+
+# Taxonomie de classification : categories et mots-cles en base (voir apps/documents/taxonomy.py),
+# version relue au plus toutes les CHECK_INTERVAL secondes par chaque processus
+DOCUMENT_TAXONOMY_CHECK_INTERVAL = float(os.getenv('DOCUMENT_TAXONOMY_CHECK_INTERVAL', '5'))
 
-# Document classification categories
-DOCUMENT_CATEGORIES = {
-    'math': ['mathématiques', 'calcul', 'équation', 'algèbre', 'géométrie', 'statistiques'],
-    'algo': ['algorithme', 'programmation', 'code', 'python', 'javascript', 'développement'],
-    'histoire': ['histoire', 'historique', 'guerre', 'révolution', 'siècle', 'chronologie'],
-    'autres': []  # Catégorie par défaut
-}
\ No newline at end of file
+# Metriques du traitement au format Prometheus sur /metrics (voir apps/documents/metrics.py)
+# METRICS_TOKEN : jeton du collecteur (Authorization: Bearer), sinon acces reserve au staff
+# SLOW_PROCESSING_SECONDS : journalise les documents plus lents avec leurs etapes (0 : desactive)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+DOCUMENT_SLOW_PROCESSING_SECONDS = float(os.getenv('DOCUMENT_SLOW_PROCESSING_SECONDS', '0'))